@@ -0,0 +1,681 @@
+"""
+The assembler module exports the AssemblyContext class and the assemble and assemble_file functions.
+
+AssemblyContext class: Holds all of the state for assembling one XHAL program.
+assemble: Assembles XHAL source text in memory and returns the words, symbol table, and diagnostics.
+assemble_file: Assembles one XHAL file and writes the .hack file, symbol tables, and error log where main.py puts them.
+assemble_object_file: Assembles one XHAL file as a relocatable module and writes its object file for linker.py.
+"""
+import contextlib
+import os
+import sys
+from array import array
+
+import config
+from code_module import Code
+from encoder_module import check_a_addresses, pack_words
+from error_checker import DIAGNOSTIC_LEVELS, ErrorChecker, TooManyErrorsError, create_error_file
+from output_module import assembler_dir, format_hack_text, write_hack_text, write_rom_image
+from parser_module import c_command_cache_info, represents_int
+from preprocessor_module import Preprocessor, include_cache_info, include_dependencies, line_from_json, line_to_json
+from symbol_table_module import SymbolTable
+
+
+# ************************************************************************************************
+# Assembly context
+
+
+class AssemblyContext:
+    """
+    The AssemblyContext class holds everything needed to assemble one XHAL program: the error checker, the code
+    translator, the symbol table, the translated words, and the current ROM and RAM addresses. Nothing is kept at the
+    module level, so any number of programs can be assembled one after another, or at the same time from several
+    threads, in a single process.
+
+    Methods:
+    __init__: Constructs the context with a fresh symbol table and code translator.
+    phase: Returns a context manager that times a phase of the assembly, if stats are being collected.
+    handle_equ: Adds an EQU directive's symbol to the symbol table.
+    handle_label: Adds an L-command's label to the symbol table.
+    allocate_ram_variables: Allocates the RAM variables of the program before it was optimized, in order of first use.
+    encode_a_address: Translates an A-command address into a binary word.
+    encode_c_command: Translates a C-command's fields into a binary word.
+    first_pass: Builds the symbol table from the parsed program.
+    second_pass: Resolves symbols and translates the parsed program.
+    encode_program: Resolves symbols and translates a parsed program with no errors all at once.
+    single_pass: Builds the symbol table and translates in one pass, backpatching forward references.
+    assemble_program: Runs the passes, and optionally the optimizer, over a parsed program and returns the words.
+    build_object: Runs the passes over a parsed program as a relocatable module and returns an ObjectModule.
+    """
+
+    def __init__(self, error_checker=None, stats=None):
+        """Construct the AssemblyContext object.
+
+        Arguments:
+        error_checker: The ErrorChecker that errors are recorded with. A new one is made if none is given.
+        stats: An optional AssemblyStats that phase timings and symbol table counters are collected in.
+        """
+        self.error_checker = error_checker if error_checker is not None else ErrorChecker()
+        self.stats = stats
+        self.code_translator = Code()  # Responsible for translation from XHAL mnemonics to binary codes.
+        self.symbol_table = SymbolTable()  # Starts out filled in with only the predefined symbols.
+        self.words = array('H')
+        self.ROM_address = 0
+        self.RAM_address = 16
+        self.optimization_report = None  # The optimizer's report, if the program was optimized.
+        self.program = None  # The Instruction records the words were translated from, after any optimization.
+        # The (symbol, line) of each RAM variable of the program before it was optimized, in order of first use, which
+        # are allocated in that order, or None if the program was not optimized.
+        self.ram_variables = None
+
+    def phase(self, name):
+        """Return a context manager that adds the time spent inside it to the named phase of the stats, or does
+        nothing if no stats are being collected."""
+        if self.stats is None:
+            return contextlib.nullcontext()
+        return self.stats.phase(name)
+
+    def handle_equ(self, instruction):
+        """Handle an EQU directive, adding its symbol to the symbol table if no errors are found. Return true if the
+        symbol was added and false otherwise."""
+        # If the EQU symbol name is illegal, record the error and skip the current line.
+        if self.error_checker.check_illegal_symbol_error(instruction.equ_label, instruction.line):
+            return False
+
+        # If the EQU symbol redefines a previously defined symbol, record either an error or a warning, and skip the
+        # current line if it is an error.
+        if self.error_checker.check_equ_redefinition(self.symbol_table, instruction.equ_label, instruction.operand,
+                                                     instruction.text, instruction.line):
+            return False
+
+        # If no label-related errors, add the EQU symbol to the symbol table. A value that is not a number has already
+        # been reported as a badly-formatted EQU directive, and is kept as written so that each use of it is reported
+        # too.
+        address = int(instruction.operand) if represents_int(instruction.operand) else instruction.operand
+        self.symbol_table.add_entry(instruction.equ_label, address, "EQU", instruction.line)
+        return True
+
+    def handle_label(self, instruction):
+        """Handle an L-command, adding its label to the symbol table at the current ROM address if no errors are
+        found. Return true if the label was added and false otherwise."""
+        # If the label name is illegal, record the error and skip the current line.
+        if self.error_checker.check_illegal_symbol_error(instruction.operand, instruction.line):
+            return False
+
+        # If the label redefines a previously defined symbol, record either an error or a warning, and skip the
+        # current line if it is an error.
+        if self.error_checker.check_label_redefinition(self.symbol_table, instruction.operand, self.ROM_address,
+                                                       instruction.line):
+            return False
+
+        # If no label-related errors, add the label to the symbol table.
+        self.symbol_table.add_entry(instruction.operand, self.ROM_address, "ROM", instruction.line)
+        return True
+
+    def allocate_ram_variables(self):
+        """Allocate a RAM address to each variable of the program as it was before it was optimized, in the order they
+        were first used, so that they have the same addresses as they would without optimizing. Does nothing if the
+        program was not optimized."""
+        for symbol, line in self.ram_variables or ():
+            if not self.symbol_table.contains(symbol):
+                self.symbol_table.add_entry(symbol, self.RAM_address, "RAM", line)
+                self.RAM_address += 1
+                if self.stats is not None:
+                    self.stats.count("ram_variables_allocated")
+
+    def encode_a_address(self, address, line):
+        """Translate an A-command address into a 16-bit integer word. Return None if the address is not a valid
+        non-negative 15-bit integer, in which case the error has already been recorded."""
+        # If an error is found with translating the address field into binary or the binary code is too long,
+        # record the error and skip the line.
+        if self.error_checker.check_a_type_bin_command(address, line):
+            return None
+        # The top bit of an A-command is 0, so the word is just the address itself.
+        return int(address)
+
+    def encode_c_command(self, instruction):
+        """Translate the parsed fields of a C-command into a 16-bit integer word. Return None if any of the fields are
+        not supported mnemonics, in which case the error has already been recorded."""
+        # The parser has usually encoded the command already.
+        if instruction.word is not None:
+            return instruction.word
+        try:
+            return self.code_translator.encode_c(instruction.dest, instruction.comp, instruction.jump)
+        except KeyError:
+            # Look the fields up one at a time to find out which one to report.
+            if instruction.dest not in self.code_translator.dest_dict:
+                self.error_checker.record_c_type_dest_error(instruction.line)
+            elif instruction.comp not in self.code_translator.comp_dict:
+                self.error_checker.record_c_type_comp_error(instruction.line)
+            else:
+                self.error_checker.record_c_type_jump_error(instruction.line)
+            return None
+
+    def first_pass(self, program):
+        """Conduct the first pass through the parsed program, adding EQU symbols and labels to the symbol table."""
+        for instruction in program:
+            if instruction.kind == "EQU":
+                self.handle_equ(instruction)
+            elif instruction.kind == "L":
+                self.handle_label(instruction)
+            else:
+                self.ROM_address += 1
+                if self.error_checker.tracing:
+                    self.error_checker.trace(f"CURRENT ROM ADDRESS: {self.ROM_address}, instr: {instruction.text}",
+                                             instruction.line)
+
+    def second_pass(self, program):
+        """Conduct the second pass through the parsed program, resolving symbols and translating commands."""
+        # Translate the whole program at once, unless a line-by-line trace is wanted. If it has any errors, it is
+        # translated again one instruction at a time below, which reports each error in order.
+        if not self.error_checker.tracing and self.encode_program(program):
+            return
+        for instruction in program:
+            if self.error_checker.tracing:
+                self.error_checker.trace(f"Current command: {instruction.text}", instruction.line)
+            if instruction.kind == "A":
+                # If the current A-command content is not a positive integer, it is a symbol, so check the symbol
+                # table.
+                if not represents_int(instruction.operand):
+                    # If the symbol table contains the A-command symbol, retrieve the integer address associated
+                    # with that symbol and make it the address.
+                    if self.symbol_table.contains(instruction.operand):
+                        address = self.symbol_table.get_address(instruction.operand)
+                        if self.stats is not None:
+                            self.stats.count("symbol_table_hits")
+                    # Otherwise the symbol table does not yet contain the current symbol, so add it and make it the
+                    # address.
+                    else:
+                        self.symbol_table.add_entry(instruction.operand, self.RAM_address, "RAM", instruction.line)
+                        self.RAM_address += 1
+                        address = self.symbol_table.get_address(instruction.operand)
+                        if self.stats is not None:
+                            self.stats.count("ram_variables_allocated")
+
+                # If an error is found with the current non-symbolic A-Type command, record the error and skip the
+                # line.
+                elif self.error_checker.check_a_type_int_command(instruction.operand, instruction.line):
+                    continue
+                else:
+                    address = instruction.operand
+                current_word = self.encode_a_address(address, instruction.line)
+
+            elif instruction.kind == "C":
+                current_word = self.encode_c_command(instruction)
+
+            # EQU directives and labels produce no code.
+            else:
+                continue
+
+            # If no errors have occurred thus far, keep the current binary word.
+            if current_word is not None:
+                if self.error_checker.tracing:
+                    self.error_checker.trace(f"Current word: {current_word:016b}", instruction.line)
+                self.words.append(current_word)
+
+    def encode_program(self, program):
+        """Resolve the symbols of a parsed program and translate it in bulk, appending the words to self.words. Every
+        resolved A-command address is collected into one list and range-checked at once, and the words are packed in
+        one go, with NumPy if it is available. Return false if the program has anything that would be an error, in
+        which case no words are added, and the RAM variables allocated so far are the same ones the second pass would
+        allocate up to that point.
+        """
+        symbol_table = self.symbol_table
+        # Every symbol's address, leaving out any symbol that would be read as a number instead. An EQU symbol with no
+        # numeric value is an error wherever it is used.
+        addresses = {symbol: address for symbol, address in symbol_table.addresses().items()
+                     if not represents_int(symbol)}
+        if not all(type(address) is int for address in addresses.values()):
+            return False
+
+        words = []
+        a_addresses = []
+        symbol_count = 0
+        ram_count = 0
+        for instruction in program:
+            if instruction.kind == "C":
+                if instruction.word is None:
+                    return False
+                words.append(instruction.word)
+            elif instruction.kind == "A":
+                operand = instruction.operand
+                if operand.isdecimal():
+                    address = int(operand)
+                else:
+                    address = addresses.get(operand)
+                    if address is None:
+                        # Numbers such as "+5" or "-5" take the slow path, which checks them and reports errors.
+                        if represents_int(operand):
+                            return False
+                        symbol_table.add_entry(operand, self.RAM_address, "RAM", instruction.line)
+                        address = addresses[operand] = self.RAM_address
+                        self.RAM_address += 1
+                        ram_count += 1
+                    symbol_count += 1
+                a_addresses.append(address)
+                words.append(address)
+
+        if not check_a_addresses(a_addresses):
+            return False
+        self.words.extend(pack_words(words))
+        if self.stats is not None:
+            self.stats.count("symbol_table_hits", symbol_count - ram_count)
+            self.stats.count("ram_variables_allocated", ram_count)
+        return True
+
+    def single_pass(self, program, words=None):
+        """Conduct a single pass through the parsed program, translating commands as they are reached. A-command
+        symbols that are not yet in the symbol table are recorded in a fixup list and backpatched once their label is
+        defined. Any symbols still unresolved at the end of the program are allocated as RAM variables, in order of
+        first use. Return the translated words, with None in place of any word that had an error.
+
+        Arguments:
+        program: An iterable of Instruction records. It is only iterated once, so it may be a generator.
+        words: The list-like object that words are appended to and backpatched in. A new list is used if none is given.
+        """
+        if words is None:
+            words = []
+        # Maps each unresolved symbol to a list of (word index, line) pairs that reference it. Dictionaries keep
+        # insertion order, so the leftover symbols are allocated RAM addresses in the same order the two-pass assembler
+        # would use.
+        fixups = {}
+        for instruction in program:
+            if instruction.kind == "EQU":
+                self.handle_equ(instruction)
+
+            elif instruction.kind == "L":
+                # Once a label is defined, backpatch every earlier reference to it.
+                if self.handle_label(instruction):
+                    for word_idx, ref_line in fixups.pop(instruction.operand, ()):
+                        words[word_idx] = self.encode_a_address(self.ROM_address, ref_line)
+
+            elif instruction.kind == "A":
+                self.ROM_address += 1
+                if not represents_int(instruction.operand):
+                    if self.symbol_table.contains(instruction.operand):
+                        words.append(self.encode_a_address(self.symbol_table.get_address(instruction.operand),
+                                                           instruction.line))
+                        if self.stats is not None:
+                            self.stats.count("symbol_table_hits")
+                    # Otherwise the symbol may be a label defined further on, so leave a placeholder word to patch
+                    # later.
+                    else:
+                        fixups.setdefault(instruction.operand, []).append((len(words), instruction.line))
+                        words.append(None)
+                        if self.stats is not None:
+                            self.stats.count("forward_references")
+                elif self.error_checker.check_a_type_int_command(instruction.operand, instruction.line):
+                    words.append(None)
+                else:
+                    words.append(self.encode_a_address(instruction.operand, instruction.line))
+
+            elif instruction.kind == "C":
+                self.ROM_address += 1
+                words.append(self.encode_c_command(instruction))
+
+        # Resolve any remaining references, either to EQU symbols defined after their use or to new RAM variables.
+        self.allocate_ram_variables()
+        for symbol, references in fixups.items():
+            if not self.symbol_table.contains(symbol):
+                self.symbol_table.add_entry(symbol, self.RAM_address, "RAM", references[0][1])
+                self.RAM_address += 1
+                if self.stats is not None:
+                    self.stats.count("ram_variables_allocated")
+            address = self.symbol_table.get_address(symbol)
+            for word_idx, ref_line in references:
+                words[word_idx] = self.encode_a_address(address, ref_line)
+
+        return words
+
+    def assemble_program(self, program, single_pass=False, optimize=False):
+        """Run the assembler passes over a parsed program and return the translated words as an array('H'). If
+        optimize is true, the program is run through the peephole optimizer first, as long as it has no errors so far,
+        and the optimizer's report is kept in optimization_report. The program that was translated is kept in
+        program."""
+        if optimize:
+            # The optimizer, like the build cache, stats, and object files below, is only imported when it is used,
+            # so that assembling a small file starts quickly.
+            from optimizer_module import format_optimization_report, optimize_program, ram_variables
+            self.error_checker.trace("Optimizing the assembly program....")
+            with self.phase("optimize"):
+                if self.error_checker.error_count():
+                    self.optimization_report = {"skipped": "it has errors"}
+                else:
+                    original_program = program
+                    program, self.optimization_report = optimize_program(program)
+                    if self.optimization_report["skipped"] is None:
+                        self.ram_variables = ram_variables(original_program)
+            self.error_checker.trace(format_optimization_report(self.optimization_report))
+        self.program = program
+        if single_pass:
+            # Conduct one pass through the parsed program, translating as it goes and backpatching forward
+            # references.
+            self.error_checker.trace("Beginning the single pass of the assembly program....")
+            # Keep every successfully translated word. Words that had errors were left as None.
+            with self.phase("single_pass"):
+                self.words.extend(word for word in self.single_pass(program) if word is not None)
+        else:
+            # Conduct the first pass through the parsed program and build the symbol table without generating any
+            # code.
+            self.error_checker.trace("Beginning the first pass of the assembly program....")
+            with self.phase("first_pass"):
+                self.first_pass(program)
+                self.allocate_ram_variables()
+
+            # Trace the symbol table at this point for reference.
+            if self.error_checker.tracing:
+                self.error_checker.trace(f"Symbol Table:\n{self.symbol_table.addresses()}")
+
+            # Conduct the second pass through the parsed program, resolving symbols and generating the binary code.
+            self.error_checker.trace("Beginning the second pass of the assembly program....")
+            with self.phase("second_pass"):
+                self.second_pass(program)
+        return self.words
+
+    def build_object(self, program, name):
+        """Run the first pass over a parsed program, then translate it as a relocatable module named name, starting at
+        ROM address 0. References to the module's own labels are recorded as relocations, and references to symbols it
+        does not define are recorded as imports instead of being allocated RAM variables. Return the ObjectModule, or
+        None if the program has any errors."""
+        self.error_checker.trace("Beginning the first pass of the assembly program....")
+        with self.phase("first_pass"):
+            self.first_pass(program)
+
+        self.error_checker.trace("Beginning the second pass of the assembly program as a relocatable module....")
+        words = []
+        imports = {}
+        relocations = []
+        with self.phase("second_pass"):
+            for instruction in program:
+                if instruction.kind == "C":
+                    words.append(self.encode_c_command(instruction))
+                elif instruction.kind == "A":
+                    operand = instruction.operand
+                    if represents_int(operand):
+                        if self.error_checker.check_a_type_int_command(operand, instruction.line):
+                            continue
+                        words.append(self.encode_a_address(operand, instruction.line))
+                        continue
+                    entry = self.symbol_table.get_entry(operand)
+                    # A symbol defined in another module, or a RAM variable, is left for the linker.
+                    if entry is None:
+                        imports.setdefault(operand, (instruction.line, []))[1].append(len(words))
+                        words.append(0)
+                    # A label's address is relative to the start of the module. It is range-checked once it is
+                    # relocated.
+                    elif entry[1] == "ROM":
+                        relocations.append(len(words))
+                        words.append(entry[0])
+                    else:
+                        words.append(self.encode_a_address(entry[0], instruction.line))
+
+        if self.error_checker.error_count():
+            return None
+        from object_module import ObjectModule
+        exports = {symbol: entry for symbol, entry in self.symbol_table.symbols.items() if entry[1] != "RAM"}
+        return ObjectModule(name, words, exports, imports, relocations)
+
+# ************************************************************************************************
+# Public functions
+
+
+def assemble(source, single_pass=False, log_filename=None, level=None, max_errors=None, optimize=False):
+    """Assemble an XHAL program held in memory and return a (words, symbol_table, diagnostics) tuple, where words is
+    an array('H') of 16-bit integer words, symbol_table is the final SymbolTable, and diagnostics is the list of
+    (severity, line, message) tuples recorded along the way. All state lives in a new AssemblyContext, so it is safe to
+    call from several threads at once. If the assembly is stopped for having too many errors, the words translated so
+    far are returned.
+
+    Arguments:
+    source: The XHAL source, either as one string or as an iterable of lines.
+    single_pass: Assemble in one pass with forward-reference backpatching instead of two passes.
+    log_filename: An optional error log file to append errors and warnings to.
+    level: The console diagnostic level. Defaults to the config setting.
+    max_errors: The number of errors to stop after, or 0 for no limit. Defaults to config.MAX_ERRORS.
+    optimize: Run the peephole optimizer over the program before translating it.
+    """
+    if isinstance(source, str):
+        source = source.splitlines()
+    context = AssemblyContext(ErrorChecker(log_filename, level, max_errors))
+    try:
+        program = Preprocessor(None, context.error_checker, lines=source).parse()
+        context.assemble_program(program, single_pass, optimize)
+    except TooManyErrorsError:
+        pass
+    context.error_checker.flush()
+    return context.words, context.symbol_table, context.error_checker.diagnostics
+
+
+def assemble_file(input_file, output_name, single_pass=False, output_format=None, byte_order=None, level=None,
+                  max_errors=None, json_diagnostics=None, use_cache=None, collect_stats=None, profile=False,
+                  optimize=None, debug_map=None):
+    """Assemble one XHAL .asm file, writing binary_output/<output_name>.hack and/or binary_output/<output_name>.rom,
+    and, depending on the config settings, an error log in error_logs/, the symbol tables in symbol_tables/, and the
+    debug map, binary_output/<output_name>.dbg. Return
+    the same tuple as assemble(). If the assembly is stopped for having too many errors, no output files are written.
+
+    Arguments:
+    input_file: The XHAL .asm file to assemble.
+    output_name: The name of the output files, minus their extensions.
+    single_pass: Assemble in one pass with forward-reference backpatching instead of two passes.
+    output_format: "hack" for .hack text, "rom" for a raw ROM image, or "both". Defaults to config.OUTPUT_FORMAT.
+    byte_order: "little" or "big", the byte order of a ROM image. Defaults to config.ROM_BYTE_ORDER.
+    level: The console diagnostic level. Defaults to the config setting.
+    max_errors: The number of errors to stop after, or 0 for no limit. Defaults to config.MAX_ERRORS.
+    json_diagnostics: Whether to also write the diagnostics to a .json file next to the error log. Defaults to
+        config.WRITE_DIAGNOSTICS_JSON.
+    use_cache: Whether to restore the outputs from the build cache if the same source was assembled with the same
+        settings before, and to save them there otherwise. Defaults to config.USE_BUILD_CACHE.
+    collect_stats: Whether to time each phase, count commands and symbol table lookups, measure peak memory, and save
+        it all to binary_output/<output_name>.stats.json. Defaults to config.WRITE_STATS_FILE.
+    profile: Whether to also profile the assembly with cProfile and dump the profile to
+        binary_output/<output_name>.prof. Implies collect_stats.
+    optimize: Whether to run the peephole optimizer over the program before translating it, and print how many
+        words it saved. Defaults to config.OPTIMIZE.
+    debug_map: Whether to write the source line of every ROM address to binary_output/<output_name>.dbg (see
+        debug_map_module.py), if the program has no errors. Defaults to config.WRITE_DEBUG_MAP.
+    """
+    if output_format is None:
+        output_format = config.OUTPUT_FORMAT
+    if byte_order is None:
+        byte_order = config.ROM_BYTE_ORDER
+    if json_diagnostics is None:
+        json_diagnostics = config.WRITE_DIAGNOSTICS_JSON
+    if use_cache is None:
+        use_cache = config.USE_BUILD_CACHE
+    if collect_stats is None:
+        collect_stats = config.WRITE_STATS_FILE
+    if optimize is None:
+        optimize = config.OPTIMIZE
+    if debug_map is None:
+        debug_map = config.WRITE_DEBUG_MAP
+    # Relative file location code from
+    # https://stackoverflow.com/questions/7165749/open-file-in-a-relative-location-in-python
+    file_dir = assembler_dir()
+    output_file_path = os.path.join(file_dir, "binary_output", output_name)
+    symbol_tables_path = os.path.join(file_dir, "symbol_tables", output_name + "_sym_tables.txt")
+    symbol_file_path = os.path.join(file_dir, "symbol_tables", output_name + "_symbols.json")
+    error_file_name = create_error_file(output_name)
+    json_filename = os.path.splitext(error_file_name)[0] + ".json" if json_diagnostics else None
+
+    stats = None
+    if collect_stats or profile:
+        from stats_module import AssemblyStats
+        stats = AssemblyStats(profile_filename=output_file_path + ".prof" if profile else None)
+        stats.start()
+    try:
+        source_lines = None
+        if use_cache:
+            with open(input_file, "rb") as source_file:
+                source_bytes = source_file.read()
+            source_lines = source_bytes.decode().splitlines()
+            from build_cache import BuildCache
+            cache = BuildCache()
+            # Included files are part of the key too, by their modification times.
+            dependencies = include_dependencies(input_file, source_lines) if b".INCLUDE" in source_bytes else []
+            optimizer_version = None
+            if optimize:
+                # Changes to the optimizer change only optimized outputs, so only their keys include its version.
+                from optimizer_module import OPTIMIZER_VERSION as optimizer_version
+            cache_key = cache.make_key(source_bytes, single_pass=single_pass, max_errors=max_errors,
+                                       optimize=optimize, optimizer_version=optimizer_version, debug_map=debug_map,
+                                       includes=dependencies)
+            cached = cache.load(cache_key)
+            if stats is not None:
+                stats.count("build_cache_hits" if cached is not None else "build_cache_misses")
+            if cached is not None:
+                return restore_cached_outputs(cached, output_file_path, symbol_tables_path, symbol_file_path,
+                                              output_format, byte_order, level, json_filename)
+
+        # Create an empty error file if the option to is set.
+        log_filename = None
+        if config.WRITE_ERRORS_TO_LOG:
+            log_filename = error_file_name
+            open(log_filename, "w").close()
+
+        context = AssemblyContext(ErrorChecker(log_filename, level, max_errors), stats)
+        context.error_checker.trace(output_file_path)
+        try:
+            # Parse the assembly program once into a list of instruction records that every pass works from.
+            context.error_checker.trace("Parsing the assembly program....")
+            c_cache_before = c_command_cache_info()
+            include_cache_before = include_cache_info()
+            with context.phase("parse"):
+                program = Preprocessor(input_file, context.error_checker, lines=source_lines, stats=stats).parse()
+            if stats is not None:
+                c_cache_after = c_command_cache_info()
+                stats.count("c_command_cache_hits", c_cache_after.hits - c_cache_before.hits)
+                stats.count("c_command_cache_misses", c_cache_after.misses - c_cache_before.misses)
+                include_cache_after = include_cache_info()
+                stats.count("include_cache_hits", include_cache_after["hits"] - include_cache_before["hits"])
+                stats.count("include_cache_misses", include_cache_after["misses"] - include_cache_before["misses"])
+            words = context.assemble_program(program, single_pass, optimize)
+        except TooManyErrorsError:
+            context.error_checker.flush(json_filename)
+            return context.words, context.symbol_table, context.error_checker.diagnostics
+
+        # Write the words to the .hack text file and/or the raw ROM image.
+        with context.phase("write_output"):
+            if output_format in ("hack", "both"):
+                write_hack_text(words, output_file_path + ".hack")
+            if output_format in ("rom", "both"):
+                write_rom_image(words, output_file_path + ".rom", byte_order)
+
+        # Write the source line of every word, unless words with errors were left out, which would misalign them.
+        debug_map_data = None
+        if debug_map and not context.error_checker.error_count():
+            from debug_map_module import DEBUG_MAP_EXTENSION, DebugMap
+            with context.phase("write_debug_map"):
+                program_map = DebugMap.from_program(context.program, input_file)
+                program_map.write(output_file_path + DEBUG_MAP_EXTENSION)
+            if use_cache:
+                debug_map_data = program_map.to_dict()
+
+        # Trace the final symbol table and the C-command memo's hit rate for reference.
+        if context.error_checker.tracing:
+            context.error_checker.trace(f"Symbol Table:\n{context.symbol_table.addresses()}")
+            context.error_checker.trace(f"C-command cache: {c_command_cache_info()}")
+
+        # Export symbol tables.
+        symbol_tables_text = None
+        if config.EXPORT_SYMBOL_TABLES:
+            with context.phase("export_symbol_tables"):
+                context.symbol_table.export_symbol_tables(output_name)
+            if config.SYMBOL_TABLE_FORMAT in ("text", "both"):
+                with open(symbol_tables_path, "rb") as symbol_tables_file:
+                    symbol_tables_text = symbol_tables_file.read()
+
+        if use_cache:
+            # The lines of included files and macros keep their file and macro use, so they are reported the same way.
+            diagnostics = [(severity, line_to_json(line), message)
+                           for severity, line, message in context.error_checker.diagnostics]
+            cache.store(cache_key, words, symbol_tables_text, {"diagnostics": diagnostics,
+                                                               "symbol_table": context.symbol_table.to_dict(),
+                                                               "optimization": context.optimization_report,
+                                                               "debug_map": debug_map_data})
+
+        report = context.optimization_report
+        if report is not None and context.error_checker.level >= DIAGNOSTIC_LEVELS["warnings"]:
+            from optimizer_module import format_optimization_report
+            print(f"{output_name}: {format_optimization_report(report)}")
+
+        if stats is not None:
+            stats.count("words", len(words))
+            stats.count("instructions", len(program))
+            stats.count("errors", context.error_checker.error_count())
+            if report is not None and report["skipped"] is None:
+                stats.count("words_saved", report["words_before"] - report["words_after"])
+        with context.phase("report_diagnostics"):
+            context.error_checker.flush(json_filename)
+        return words, context.symbol_table, context.error_checker.diagnostics
+    finally:
+        if stats is not None:
+            stats.stop()
+            stats.write(output_file_path + ".stats.json")
+
+
+def assemble_object_file(input_file, output_name, level=None, max_errors=None, object_file=None):
+    """Assemble one XHAL .asm file as a relocatable module for linker.py, writing binary_output/<output_name>.xobj
+    and, if the config option is set, an error log in error_logs/. Return a (module, diagnostics) tuple, where module
+    is the ObjectModule, or None if the file had errors, in which case no object file is written.
+
+    Arguments:
+    input_file: The XHAL .asm file to assemble.
+    output_name: The name of the object file, minus its extension. It is also the module's name.
+    level: The console diagnostic level. Defaults to the config setting.
+    max_errors: The number of errors to stop after, or 0 for no limit. Defaults to config.MAX_ERRORS.
+    object_file: The path to write the object file to instead of binary_output/<output_name>.xobj.
+    """
+    from object_module import OBJECT_FILE_EXTENSION
+    if object_file is None:
+        object_file = os.path.join(assembler_dir(), "binary_output", output_name + OBJECT_FILE_EXTENSION)
+    log_filename = None
+    if config.WRITE_ERRORS_TO_LOG:
+        log_filename = create_error_file(output_name)
+        open(log_filename, "w").close()
+
+    context = AssemblyContext(ErrorChecker(log_filename, level, max_errors))
+    module = None
+    try:
+        program = Preprocessor(input_file, context.error_checker).parse()
+        module = context.build_object(program, output_name)
+    except TooManyErrorsError:
+        pass
+    if module is not None:
+        module.write(object_file)
+    context.error_checker.flush()
+    return module, context.error_checker.diagnostics
+
+
+def restore_cached_outputs(cached, output_file_path, symbol_tables_path, symbol_file_path, output_format, byte_order,
+                           level, json_filename):
+    """Restore the outputs of assemble_file() from a build cache entry, only rewriting files whose contents changed,
+    and report the cached diagnostics. No error log is written. Return the same tuple as assemble()."""
+    from build_cache import write_if_changed
+    words, symbol_tables_text, result = cached
+    if output_format in ("hack", "both"):
+        write_if_changed(output_file_path + ".hack", format_hack_text(words).encode())
+    if output_format in ("rom", "both"):
+        rom_words = array('H', words)
+        if byte_order != sys.byteorder:
+            rom_words.byteswap()
+        write_if_changed(output_file_path + ".rom", rom_words.tobytes())
+    if result.get("debug_map") is not None:
+        from debug_map_module import DEBUG_MAP_EXTENSION, DebugMap
+        write_if_changed(output_file_path + DEBUG_MAP_EXTENSION, DebugMap.from_dict(result["debug_map"]).to_bytes())
+    symbol_table = SymbolTable.from_dict(result["symbol_table"])
+    if config.EXPORT_SYMBOL_TABLES:
+        if symbol_tables_text is not None:
+            write_if_changed(symbol_tables_path, symbol_tables_text)
+        if config.SYMBOL_TABLE_FORMAT in ("json", "both"):
+            write_if_changed(symbol_file_path, symbol_table.to_json().encode())
+
+    error_checker = ErrorChecker(None, level)
+    error_checker.trace(f"Restored {output_file_path} from the build cache.")
+    if result.get("optimization") is not None and error_checker.level >= DIAGNOSTIC_LEVELS["warnings"]:
+        from optimizer_module import format_optimization_report
+        print(f"{os.path.basename(output_file_path)}: {format_optimization_report(result['optimization'])}")
+    error_checker.diagnostics = [(severity, line_from_json(line), message)
+                                 for severity, line, message in result["diagnostics"]]
+    error_checker.flush(json_filename)
+    return words, symbol_table, error_checker.diagnostics
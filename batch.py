@@ -0,0 +1,118 @@
+"""
+The batch module assembles many XHAL files in one run, spreading them over a pool of worker processes.
+
+Each file is assembled exactly as main.py would assemble it: its .hack file goes to binary_output/, its symbol tables
+to symbol_tables/, and its error log to error_logs/, all named after the input file. Once every file is done, one
+summary with each file's status and timing is printed.
+
+Usage: python batch.py <directory or glob> [<directory or glob> ...] [--workers N] [--single-pass]
+                       [--format hack|rom|both] [--byte-order little|big] [--cache]
+"""
+import argparse
+import contextlib
+import glob
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import config
+from assembler_module import assemble_file
+
+
+def find_input_files(paths):
+    """Expand the given directories and glob patterns into a sorted list of .asm files, without duplicates."""
+    input_files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            input_files.update(glob.glob(os.path.join(path, "*.asm")))
+        else:
+            input_files.update(match for match in glob.glob(path) if os.path.isfile(match))
+    return sorted(input_files)
+
+
+def assemble_one(input_file, single_pass=False, output_format=None, byte_order=None, use_cache=None):
+    """Assemble one file in a worker process and return an (input file, error count, warning count, seconds, failure)
+    tuple, where failure is None unless the assembler raised an exception. The assembler's console output is
+    suppressed so that the workers' output does not interleave."""
+    output_name = os.path.splitext(os.path.basename(input_file))[0]
+    start_time = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            words, symbol_table, diagnostics = assemble_file(input_file, output_name, single_pass=single_pass,
+                                                             output_format=output_format, byte_order=byte_order,
+                                                             use_cache=use_cache)
+    except Exception as exc:
+        return input_file, 0, 0, time.perf_counter() - start_time, f"{type(exc).__name__}: {exc}"
+    error_count = sum(1 for severity, line, message in diagnostics if severity == "ERROR")
+    warning_count = len(diagnostics) - error_count
+    return input_file, error_count, warning_count, time.perf_counter() - start_time, None
+
+
+def assemble_batch(input_files, workers=None, single_pass=False, output_format=None, byte_order=None,
+                   use_cache=None):
+    """Assemble every given file on a process pool with the given number of workers (the CPU count if None) and
+    return the list of results from assemble_one(), in the same order as input_files."""
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(assemble_one, input_file, single_pass, output_format, byte_order, use_cache)
+                   for input_file in input_files]
+        for future in as_completed(futures):
+            result = future.result()
+            results[result[0]] = result
+    return [results[input_file] for input_file in input_files]
+
+
+def print_summary(results, elapsed):
+    """Print one line of status and timing per file, followed by the totals for the whole batch."""
+    print(f"{'File':<50}{'Status':<30}{'Time (s)':>10}")
+    print("-" * 90)
+    for input_file, error_count, warning_count, seconds, failure in results:
+        if failure is not None:
+            status = "FAILED"
+        elif error_count:
+            status = f"{error_count} error(s), {warning_count} warning(s)"
+        elif warning_count:
+            status = f"OK, {warning_count} warning(s)"
+        else:
+            status = "OK"
+        print(f"{input_file:<50}{status:<30}{seconds:>10.3f}")
+        if failure is not None:
+            print(f"    {failure}")
+    print("-" * 90)
+    failed = sum(1 for result in results if result[4] is not None)
+    with_errors = sum(1 for result in results if result[4] is None and result[1])
+    print(f"{len(results)} file(s) assembled in {elapsed:.3f} s: {len(results) - failed - with_errors} clean, "
+          f"{with_errors} with errors, {failed} failed.")
+
+
+def main(args=None):
+    """Parse the command-line arguments, assemble every matching file, and print the summary. Return 1 if any file
+    failed or had errors, and 0 otherwise."""
+    arg_parser = argparse.ArgumentParser(description="Assemble whole directories of XHAL files in parallel.")
+    arg_parser.add_argument("paths", nargs="+", help="directories of .asm files or glob patterns")
+    arg_parser.add_argument("-w", "--workers", type=int, default=None,
+                            help="number of worker processes (default: the number of CPUs)")
+    arg_parser.add_argument("--single-pass", action="store_true", help="assemble in one pass with backpatching")
+    arg_parser.add_argument("--format", choices=("hack", "rom", "both"), default=config.OUTPUT_FORMAT,
+                            help="write .hack text, a raw .rom image, or both")
+    arg_parser.add_argument("--byte-order", choices=("little", "big"), default=config.ROM_BYTE_ORDER,
+                            help="byte order of the words in a .rom image")
+    arg_parser.add_argument("--cache", action="store_true", default=config.USE_BUILD_CACHE,
+                            help="reuse the outputs from the build cache for files that have not changed")
+    options = arg_parser.parse_args(args)
+
+    input_files = find_input_files(options.paths)
+    if not input_files:
+        print("No .asm files found.")
+        return 1
+
+    start_time = time.perf_counter()
+    results = assemble_batch(input_files, options.workers, options.single_pass or config.SINGLE_PASS_ASSEMBLY,
+                             options.format, options.byte_order, options.cache)
+    print_summary(results, time.perf_counter() - start_time)
+    return 1 if any(result[1] or result[4] is not None for result in results) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
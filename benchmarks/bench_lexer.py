@@ -0,0 +1,115 @@
+"""
+The bench_lexer module is a micro-benchmark of the parser's lexer, Parser.command_type().
+
+It classifies every line of a corpus, made of the files in HAL_input/ and XHAL_input/ plus a generated program, with
+the lexer, and with the six-regex cascade it replaced, kept here for comparison. It also times Parser.parse() over the
+same corpus. The two classifiers are checked against each other before timing.
+
+Usage: python benchmarks/bench_lexer.py [--lines N] [--repeat N] [--output results.json]
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+BENCHMARKS_DIR = os.path.split(os.path.abspath(__file__))[0]
+REPO_DIR = os.path.split(BENCHMARKS_DIR)[0]
+sys.path.insert(0, REPO_DIR)
+
+from error_checker import ErrorChecker  # noqa: E402
+from generate_xhal import generate_program  # noqa: E402
+from parser_module import Parser  # noqa: E402
+
+# The regular expressions of the cascade that command_type() used before the lexer, in the order they were tried.
+CASCADE_EQU = re.compile(r'^.EQU\s.*\s.*')
+CASCADE = (
+    ("COMMENT", None, re.compile(r'//.*')),
+    ("A", None, re.compile(r'^@', flags=re.MULTILINE)),
+    ("C", "COMP", re.compile(r'^.+=')),
+    ("C", "JUMP", re.compile(r'(^.*;)')),
+    ("L", None, re.compile(r'(^\().*(\))'))
+)
+
+
+def cascade_command_type(command):
+    """Return the (command type, C-command subtype) of a stripped command using the old regex cascade."""
+    if not command.strip():
+        return "BLANK", None
+    if CASCADE_EQU.match(command):
+        return "EQU", None
+    command = command.replace(" ", "")
+    for command_type, subtype, regex in CASCADE:
+        if regex.match(command):
+            return command_type, subtype
+    return "COMMAND TYPE NOT DETECTED", None
+
+
+def lexer_command_type(parser, command):
+    """Return the (command type, C-command subtype) of a stripped command using the parser's lexer."""
+    parser.current_command = command
+    parser.command_type()
+    if parser.current_command_type == "C":
+        return "C", parser.current_command_subtype
+    return parser.current_command_type, None
+
+
+def load_corpus(generated_lines):
+    """Return the stripped lines of every input file, followed by a generated program of the given length."""
+    lines = []
+    for input_file in sorted(glob.glob(os.path.join(REPO_DIR, "HAL_input", "*.asm"))
+                             + glob.glob(os.path.join(REPO_DIR, "XHAL_input", "*.asm"))):
+        with open(input_file, "r") as source_file:
+            lines.extend(line.strip() for line in source_file)
+    lines.extend(line.strip() for line in generate_program(generated_lines))
+    return lines
+
+
+def best_time(function, repeat):
+    """Return the fastest of repeat runs of function(), in seconds."""
+    best = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(args=None):
+    """Parse the command-line arguments, check the lexer against the cascade, and time both."""
+    arg_parser = argparse.ArgumentParser(description="Micro-benchmark Parser.command_type() and Parser.parse().")
+    arg_parser.add_argument("--lines", type=int, default=200000, help="lines of generated program to add to the corpus")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="runs of each benchmark; the fastest is kept")
+    arg_parser.add_argument("--output", default=None, help="also save the results to this JSON file")
+    options = arg_parser.parse_args(args)
+
+    lines = load_corpus(options.lines)
+    parser = Parser(None, ErrorChecker(None, "silent"), lines=())
+    mismatches = [line for line in lines if lexer_command_type(parser, line) != cascade_command_type(line)]
+    if mismatches:
+        print(f"The lexer and the cascade disagree on {len(mismatches)} line(s), such as {mismatches[0]!r}.")
+        return 1
+
+    results = {
+        "lines": len(lines),
+        "cascade_seconds": best_time(lambda: [cascade_command_type(line) for line in lines], options.repeat),
+        "lexer_seconds": best_time(lambda: [lexer_command_type(parser, line) for line in lines], options.repeat),
+        "parse_seconds": best_time(lambda: Parser(None, ErrorChecker(None, "silent"), lines=lines).parse(),
+                                   options.repeat)
+    }
+    for name in ("cascade", "lexer", "parse"):
+        seconds = results[f"{name}_seconds"]
+        print(f"{name:<8} {seconds:8.4f}s  {len(lines) / seconds:>12,.0f} lines/s")
+    print(f"The lexer classifies lines {results['cascade_seconds'] / results['lexer_seconds']:.2f}x as fast as the "
+          f"cascade.")
+    if options.output is not None:
+        with open(options.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,64 @@
+"""
+The bench_simulator module measures how many cycles per second the simulator runs.
+
+It loads a program, binary_output/Pong.hack by default, and runs it from reset for a number of cycles several times,
+keeping the fastest run. Loading, which decodes every word into the dispatch table, is timed separately.
+
+Usage: python benchmarks/bench_simulator.py [--program FILE] [--cycles N] [--repeat N] [--output results.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+BENCHMARKS_DIR = os.path.split(os.path.abspath(__file__))[0]
+REPO_DIR = os.path.split(BENCHMARKS_DIR)[0]
+sys.path.insert(0, REPO_DIR)
+
+from output_module import read_program  # noqa: E402
+from simulator import Simulator  # noqa: E402
+
+DEFAULT_PROGRAM = os.path.join(REPO_DIR, "binary_output", "Pong.hack")
+
+
+def main(args=None):
+    """Parse the command-line arguments, load the program, and time the simulator running it."""
+    arg_parser = argparse.ArgumentParser(description="Measure the simulator's cycles per second.")
+    arg_parser.add_argument("--program", default=DEFAULT_PROGRAM, help="the .hack or .rom file to run")
+    arg_parser.add_argument("--cycles", type=int, default=5000000, help="cycles per run")
+    arg_parser.add_argument("--repeat", type=int, default=3, help="runs; the fastest is kept")
+    arg_parser.add_argument("--output", default=None, help="also save the results to this JSON file")
+    options = arg_parser.parse_args(args)
+
+    words = read_program(options.program)
+    start_time = time.perf_counter()
+    simulator = Simulator(words)
+    load_seconds = time.perf_counter() - start_time
+
+    best = None
+    for _ in range(options.repeat):
+        simulator.reset()
+        start_time = time.perf_counter()
+        simulator.run(options.cycles)
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+
+    results = {
+        "program": os.path.basename(options.program),
+        "words": len(words),
+        "load_seconds": load_seconds,
+        "cycles": options.cycles,
+        "run_seconds": best,
+        "cycles_per_second": options.cycles / best
+    }
+    print(f"{results['program']}: {len(words):,} words loaded in {load_seconds * 1000:.1f} ms, "
+          f"{options.cycles:,} cycles in {best:.3f}s ({results['cycles_per_second']:,.0f} cycles/s)")
+    if options.output is not None:
+        with open(options.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
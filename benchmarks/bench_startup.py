@@ -0,0 +1,93 @@
+"""
+The bench_startup module measures how long the assembler takes to start and assemble a trivial file, and fails if it
+is over budget.
+
+Each run is a fresh interpreter, as on the command line: python main.py on XHAL_input/a.asm (20 lines) by default,
+and the same with the xhasm.pyz archive from build_zipapp.py, if it has been built. A bare python -c pass is timed
+too, and the budget is for the time on top of it, so that the result does not depend on how fast the machine starts
+Python itself. The fastest of several runs is kept. The exit status is 1 if main.py, or the archive, takes longer than
+the budget, so CI can run this as a check.
+
+Usage: python benchmarks/bench_startup.py [--program FILE] [--repeat N] [--budget-ms MS] [--output results.json]
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+BENCHMARKS_DIR = os.path.split(os.path.abspath(__file__))[0]
+REPO_DIR = os.path.split(BENCHMARKS_DIR)[0]
+
+DEFAULT_PROGRAM = os.path.join(REPO_DIR, "XHAL_input", "a.asm")
+ZIPAPP_FILE = os.path.join(REPO_DIR, "xhasm.pyz")
+# The output name the timed runs write under, whose files are removed afterward.
+OUTPUT_NAME = "bench_startup"
+# The startup budget, in milliseconds on top of the bare interpreter's startup.
+DEFAULT_BUDGET_MS = 75
+
+
+def best_time(command, repeat):
+    """Run the command the given number of times and return the fastest wall time, in seconds. Raises
+    CalledProcessError if it fails."""
+    best = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, cwd=REPO_DIR)
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def remove_outputs():
+    """Remove the files the timed runs wrote."""
+    patterns = [os.path.join(REPO_DIR, "binary_output", OUTPUT_NAME + ".*"),
+                os.path.join(REPO_DIR, "symbol_tables", OUTPUT_NAME + "_*"),
+                os.path.join(REPO_DIR, "error_logs", f"error_log_{OUTPUT_NAME}_*")]
+    for pattern in patterns:
+        for path in glob.glob(pattern):
+            os.remove(path)
+
+
+def main(args=None):
+    """Parse the command-line arguments, time the interpreter, main.py, and the archive, and return 1 if either is over
+    budget, and 0 otherwise."""
+    arg_parser = argparse.ArgumentParser(description="Measure the assembler's startup time against a budget.")
+    arg_parser.add_argument("--program", default=DEFAULT_PROGRAM, help="the .asm file to assemble")
+    arg_parser.add_argument("--repeat", type=int, default=10, help="runs of each command; the fastest is kept")
+    arg_parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                            help="milliseconds allowed on top of the bare interpreter's startup")
+    arg_parser.add_argument("--output", default=None, help="also save the results to this JSON file")
+    options = arg_parser.parse_args(args)
+
+    assemble_args = [os.path.abspath(options.program), OUTPUT_NAME, "--level", "silent"]
+    commands = {"python": [sys.executable, "-c", "pass"],
+                "main.py": [sys.executable, os.path.join(REPO_DIR, "main.py")] + assemble_args}
+    if os.path.isfile(ZIPAPP_FILE):
+        commands["xhasm.pyz"] = [sys.executable, ZIPAPP_FILE] + assemble_args
+    try:
+        times = {name: best_time(command, options.repeat) for name, command in commands.items()}
+    finally:
+        remove_outputs()
+
+    results = {"program": os.path.basename(options.program), "budget_ms": options.budget_ms, "runs": {}}
+    over_budget = False
+    for name, seconds in times.items():
+        overhead_ms = (seconds - times["python"]) * 1000
+        results["runs"][name] = {"seconds": seconds, "overhead_ms": overhead_ms}
+        if name == "python":
+            print(f"{name:<12}{seconds * 1000:8.1f} ms")
+            continue
+        status = "OK" if overhead_ms <= options.budget_ms else "OVER BUDGET"
+        over_budget = over_budget or overhead_ms > options.budget_ms
+        print(f"{name:<12}{seconds * 1000:8.1f} ms  (+{overhead_ms:.1f} ms, budget {options.budget_ms:g} ms)  {status}")
+    if options.output is not None:
+        with open(options.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
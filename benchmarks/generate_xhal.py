@@ -0,0 +1,120 @@
+"""
+The generate_xhal module writes synthetic XHAL programs of any size for benchmarking the assembler.
+
+generate_program: Yields the lines of a random but error-free XHAL program with a configurable mix of commands.
+write_program: Writes a generated program to a file.
+
+Programs are reproducible from their seed. Every label is referenced only after it is defined at a ROM address that
+fits in an A-command, so programs far bigger than the 32K ROM still assemble without errors and time the normal path
+through the assembler.
+
+Usage: python benchmarks/generate_xhal.py <output .asm file> [--lines N] [--seed N] [--a-ratio R] [--c-ratio R]
+                                          [--label-ratio R] [--equ-ratio R] [--literal-ratio R] [--comment-ratio R]
+                                          [--symbols N]
+"""
+import argparse
+import random
+
+# C-commands used in generated programs, a mix of computations with a dest field and jumps without one.
+C_COMMANDS = (
+    "D=M", "D=A", "M=D", "AM=M-1", "MD=M+1", "D=D+A", "D=D-M", "M=D|M", "A=A-1", "D=!D", "M=-1", "M=0", "AMD=D&M",
+    "D;JGT", "D;JEQ", "D;JNE", "D;JLT", "0;JMP", "D-1;JGE", "M+1;JLE"
+)
+
+# Comments added after a command or on their own line.
+COMMENTS = ("// push the result", "// loop back", "// save D", "// restore the frame", "// TODO: unroll")
+
+# The highest ROM address a label may be defined at and still be referenced, since A-commands hold 15 bits.
+MAX_LABEL_ADDRESS = 32767
+
+
+def generate_program(line_count, seed=0, a_ratio=0.45, c_ratio=0.45, label_ratio=0.05, equ_ratio=0.01,
+                     literal_ratio=0.2, comment_ratio=0.1, symbol_count=100):
+    """Yield the lines of a synthetic XHAL program with no errors.
+
+    Arguments:
+    line_count: The number of lines to generate.
+    seed: The random seed. The same seed and settings always give the same program.
+    a_ratio, c_ratio, label_ratio, equ_ratio: The relative frequencies of A-commands, C-commands, labels, and EQU
+        directives among the lines that are not comments.
+    literal_ratio: The fraction of A-commands with a numeric address, written in decimal, binary, or hexadecimal.
+    comment_ratio: The fraction of lines that are comments or blank, and of commands with an inline comment.
+    symbol_count: The number of distinct variable names A-commands refer to.
+    """
+    rng = random.Random(seed)
+    kinds = ("A", "C", "L", "EQU")
+    weights = (a_ratio, c_ratio, label_ratio, equ_ratio)
+    variables = [f"var_{idx}" for idx in range(symbol_count)]
+    labels = []
+    constants = []
+    rom_address = 0
+
+    for line_idx in range(line_count):
+        if rng.random() < comment_ratio:
+            yield rng.choice(COMMENTS) if rng.random() < 0.8 else ""
+            continue
+
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "L":
+            label = f"LABEL_{line_idx}"
+            if rom_address <= MAX_LABEL_ADDRESS:
+                labels.append(label)
+            yield f"({label})"
+            continue
+        if kind == "EQU":
+            constant = f"CONST_{line_idx}"
+            constants.append(constant)
+            yield f".EQU {constant} {rng.randrange(32768)}"
+            continue
+
+        rom_address += 1
+        if kind == "A":
+            choice = rng.random()
+            if choice < literal_ratio:
+                value = rng.randrange(32768)
+                command = rng.choice((f"@{value}", f"@0b{value:b}", f"@0x{value:X}"))
+            elif choice < literal_ratio + 0.3 and labels:
+                command = f"@{rng.choice(labels)}"
+            elif choice < literal_ratio + 0.4 and constants:
+                command = f"@{rng.choice(constants)}"
+            else:
+                command = f"@{rng.choice(variables)}"
+        else:
+            command = rng.choice(C_COMMANDS)
+        if rng.random() < comment_ratio:
+            command = f"{command} {rng.choice(COMMENTS)}"
+        yield command
+
+
+def write_program(file_path, line_count, **options):
+    """Write a program from generate_program() to the given file, passing the keyword options along."""
+    with open(file_path, "w") as output_file:
+        for line in generate_program(line_count, **options):
+            output_file.write(line + "\n")
+
+
+def main(args=None):
+    """Parse the command-line arguments and write one generated program."""
+    arg_parser = argparse.ArgumentParser(description="Write a synthetic XHAL program for benchmarking.")
+    arg_parser.add_argument("output_file", help="the .asm file to write")
+    arg_parser.add_argument("--lines", type=int, default=10000, help="number of lines to generate")
+    arg_parser.add_argument("--seed", type=int, default=0, help="random seed")
+    arg_parser.add_argument("--a-ratio", type=float, default=0.45, help="relative frequency of A-commands")
+    arg_parser.add_argument("--c-ratio", type=float, default=0.45, help="relative frequency of C-commands")
+    arg_parser.add_argument("--label-ratio", type=float, default=0.05, help="relative frequency of labels")
+    arg_parser.add_argument("--equ-ratio", type=float, default=0.01, help="relative frequency of EQU directives")
+    arg_parser.add_argument("--literal-ratio", type=float, default=0.2,
+                            help="fraction of A-commands with a decimal, binary, or hexadecimal address")
+    arg_parser.add_argument("--comment-ratio", type=float, default=0.1,
+                            help="fraction of comment lines, and of commands with an inline comment")
+    arg_parser.add_argument("--symbols", type=int, default=100, help="number of distinct variables")
+    options = arg_parser.parse_args(args)
+    write_program(options.output_file, options.lines, seed=options.seed, a_ratio=options.a_ratio,
+                  c_ratio=options.c_ratio, label_ratio=options.label_ratio, equ_ratio=options.equ_ratio,
+                  literal_ratio=options.literal_ratio, comment_ratio=options.comment_ratio,
+                  symbol_count=options.symbols)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
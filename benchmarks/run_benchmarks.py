@@ -0,0 +1,168 @@
+"""
+The run_benchmarks module times each phase of the assembler on synthetic programs of increasing size and compares the
+results against a saved baseline.
+
+The phases timed are parse (Parser.parse()), first_pass and second_pass (AssemblyContext.first_pass() and
+second_pass(), which resolves symbols and encodes the words), encode (rendering the words as .hack text), and write
+(writing that text to a file). Each size is run a number of times and the fastest time of each phase is kept.
+
+Results are saved as JSON. With --check, every phase that takes at least MIN_COMPARED_SECONDS in the baseline is
+compared against it, and the run fails if any is slower by more than the threshold. Baselines depend on the machine, so
+--save-baseline should be run again on each machine the benchmarks are checked on.
+
+Usage: python benchmarks/run_benchmarks.py [--sizes N,N,...] [--repeat N] [--output results.json]
+                                           [--save-baseline] [--check] [--threshold FRACTION] [--baseline FILE]
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.split(os.path.abspath(__file__))[0]
+sys.path.insert(0, os.path.split(BENCHMARKS_DIR)[0])
+
+from assembler_module import AssemblyContext  # noqa: E402
+from error_checker import ErrorChecker  # noqa: E402
+from generate_xhal import write_program  # noqa: E402
+from output_module import format_hack_text  # noqa: E402
+from parser_module import Parser  # noqa: E402
+
+# Program sizes, in lines, run by default. 10,000,000 lines needs several gigabytes of memory, so ask for it with
+# --sizes.
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+
+PHASES = ("parse", "first_pass", "second_pass", "encode", "write")
+
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, "baseline.json")
+
+# A phase is only slower than its baseline if it is slower by more than this fraction.
+DEFAULT_THRESHOLD = 0.25
+
+# Phases faster than this in the baseline are too noisy to compare.
+MIN_COMPARED_SECONDS = 0.005
+
+
+def time_phases(input_file, output_file):
+    """Assemble input_file once, writing the .hack text to output_file, and return a dict of the seconds each phase
+    took. The garbage collector is turned off while timing, as the timeit module does."""
+    timings = {}
+    gc.collect()
+    gc.disable()
+    try:
+        context = AssemblyContext(ErrorChecker(None, "silent"))
+        start_time = time.perf_counter()
+        program = Parser(input_file, context.error_checker).parse()
+        timings["parse"] = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        context.first_pass(program)
+        timings["first_pass"] = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        context.second_pass(program)
+        timings["second_pass"] = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        hack_text = format_hack_text(context.words)
+        timings["encode"] = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        with open(output_file, "w") as hack_file:
+            hack_file.write(hack_text)
+        timings["write"] = time.perf_counter() - start_time
+    finally:
+        gc.enable()
+    if context.error_checker.error_count():
+        raise RuntimeError(f"The generated program {input_file} has assembly errors.")
+    return timings
+
+
+def run_benchmarks(sizes, repeat=5, seed=0):
+    """Generate a program of each size, time its phases repeat times, and return the results as a dict holding the
+    fastest time of each phase, the total, and the lines per second, keyed by size."""
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for size in sizes:
+            input_file = os.path.join(temp_dir, f"bench_{size}.asm")
+            write_program(input_file, size, seed=seed)
+            # Big programs take long enough that one run is already steady.
+            runs = [time_phases(input_file, os.path.join(temp_dir, "bench.hack"))
+                    for _ in range(repeat if size <= 100000 else 1)]
+            os.remove(input_file)
+            best = {phase: min(run[phase] for run in runs) for phase in PHASES}
+            best["total"] = sum(best[phase] for phase in PHASES)
+            best["lines_per_second"] = size / best["total"]
+            results[str(size)] = best
+            print(f"{size:>10} lines  " + "  ".join(f"{phase} {best[phase]:.4f}s" for phase in PHASES)
+                  + f"  total {best['total']:.3f}s  ({best['lines_per_second']:,.0f} lines/s)")
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold):
+    """Return a list of messages, one for each phase of each size that is slower than the baseline by more than the
+    threshold fraction. Sizes that are not in the baseline are skipped."""
+    regressions = []
+    for size, timings in results.items():
+        baseline_timings = baseline["results"].get(size)
+        if baseline_timings is None:
+            continue
+        for phase in PHASES + ("total",):
+            baseline_seconds = baseline_timings[phase]
+            if baseline_seconds < MIN_COMPARED_SECONDS:
+                continue
+            slowdown = timings[phase] / baseline_seconds - 1
+            if slowdown > threshold:
+                regressions.append(f"{size} lines, {phase}: {timings[phase]:.4f}s against a baseline of "
+                                   f"{baseline_seconds:.4f}s ({slowdown:+.0%})")
+    return regressions
+
+
+def main(args=None):
+    """Parse the command-line arguments, run the benchmarks, and save or check the results. Return 1 if --check found
+    a regression, and 0 otherwise."""
+    arg_parser = argparse.ArgumentParser(description="Time each phase of the assembler on synthetic programs.")
+    arg_parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                            help="comma-separated program sizes in lines (up to 10000000)")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="runs per size of 100000 lines or fewer")
+    arg_parser.add_argument("--seed", type=int, default=0, help="random seed for the generated programs")
+    arg_parser.add_argument("--output", default=None, help="also save the results to this JSON file")
+    arg_parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="the baseline JSON file")
+    arg_parser.add_argument("--save-baseline", action="store_true", help="save the results as the new baseline")
+    arg_parser.add_argument("--check", action="store_true", help="fail if any phase is slower than the baseline")
+    arg_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                            help="fraction a phase may be slower than the baseline before --check fails")
+    options = arg_parser.parse_args(args)
+
+    sizes = [int(size) for size in options.sizes.split(",")]
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": options.seed,
+        "results": run_benchmarks(sizes, options.repeat, options.seed)
+    }
+    if options.output is not None:
+        with open(options.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+    if options.save_baseline:
+        with open(options.baseline, "w") as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+        print(f"Saved the baseline to {options.baseline}.")
+
+    if options.check:
+        with open(options.baseline, "r") as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare_to_baseline(report["results"], baseline, options.threshold)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            return 1
+        print(f"No phase is more than {options.threshold:.0%} slower than the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
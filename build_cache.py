@@ -0,0 +1,207 @@
+"""
+The build cache module exports the BuildCache class, a content-addressed, on-disk cache of assembled programs.
+
+BuildCache class: Stores and restores the words, symbol tables, and diagnostics of assembled programs.
+
+Each entry is keyed by a SHA-256 hash of the source bytes, the assembler version, every config setting, and the
+options that change the result. On a hit, assemble_file() restores the outputs without parsing. Output files are only
+rewritten if their contents differ, and no new error log is created. Once the cache is bigger than
+config.BUILD_CACHE_MAX_BYTES, the least recently used entries are evicted.
+
+Usage: python build_cache.py stats|list|purge
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from array import array
+
+import config
+from output_module import assembler_dir
+
+# Bump this whenever a change to the assembler could change its output, so that old cache entries are never reused.
+ASSEMBLER_VERSION = "2.3"
+
+# File names inside each cache entry directory.
+WORDS_FILE = "words.bin"
+SYMBOL_TABLES_FILE = "sym_tables.txt"
+RESULT_FILE = "result.json"
+
+
+def write_if_changed(file_path, data):
+    """Write the given bytes to a file unless it already holds exactly those bytes. Return true if it was written."""
+    try:
+        with open(file_path, "rb") as existing_file:
+            if existing_file.read() == data:
+                return False
+    except OSError:
+        pass
+    with open(file_path, "wb") as output_file:
+        output_file.write(data)
+    return True
+
+
+class BuildCache:
+    """
+    The BuildCache class manages a directory of cache entries, one subdirectory per key. An entry holds the words as a
+    little-endian ROM image, the exported symbol tables text (if any), and a JSON file with the diagnostics and the
+    symbol table contents.
+
+    Methods:
+    __init__: Constructs the BuildCache object for a cache directory.
+    make_key: Returns the cache key for some source bytes and assembly options.
+    load: Returns the cached result for a key, or None on a miss.
+    store: Saves a result under a key and evicts old entries if the cache is too big.
+    entries: Returns (key, size in bytes, last used time) for every entry, most recently used first.
+    total_size: Returns the size of the whole cache in bytes.
+    evict: Removes least recently used entries until the cache fits in its maximum size.
+    purge: Removes every entry.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        """Construct the BuildCache object.
+
+        Arguments:
+        cache_dir: The cache directory. Defaults to config.BUILD_CACHE_DIR, relative to the assembler's directory.
+        max_bytes: The size the cache is trimmed to after each store. Defaults to config.BUILD_CACHE_MAX_BYTES.
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(assembler_dir(), config.BUILD_CACHE_DIR)
+        self.cache_dir = cache_dir
+        self.max_bytes = config.BUILD_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+
+    @staticmethod
+    def make_key(source_bytes, **options):
+        """Return the hex cache key for the given source bytes and keyword options. The assembler version and every
+        config setting, except the cache's own, are part of the key."""
+        key_hash = hashlib.sha256()
+        key_hash.update(source_bytes)
+        settings = {name: repr(value) for name, value in vars(config).items()
+                    if name.isupper() and not name.startswith("BUILD_CACHE")}
+        settings.update({name: repr(value) for name, value in options.items()})
+        key_hash.update(json.dumps([ASSEMBLER_VERSION, settings], sort_keys=True).encode())
+        return key_hash.hexdigest()
+
+    def load(self, key):
+        """Return a (words, symbol_tables_text, result) tuple for the given key, or None if it is not cached. words is
+        an array('H'), symbol_tables_text is the exported symbol tables as bytes (or None), and result is the dict
+        that was passed to store(). A hit marks the entry as recently used."""
+        entry_dir = os.path.join(self.cache_dir, key)
+        try:
+            with open(os.path.join(entry_dir, RESULT_FILE), "r") as result_file:
+                result = json.load(result_file)
+            words = array('H')
+            with open(os.path.join(entry_dir, WORDS_FILE), "rb") as words_file:
+                words.frombytes(words_file.read())
+            symbol_tables_text = None
+            if os.path.exists(os.path.join(entry_dir, SYMBOL_TABLES_FILE)):
+                with open(os.path.join(entry_dir, SYMBOL_TABLES_FILE), "rb") as symbol_tables_file:
+                    symbol_tables_text = symbol_tables_file.read()
+        except (OSError, ValueError):
+            return None
+        if sys.byteorder != "little":
+            words.byteswap()
+        os.utime(entry_dir)
+        return words, symbol_tables_text, result
+
+    def store(self, key, words, symbol_tables_text, result):
+        """Save a result under the given key, then evict old entries if the cache has grown too big.
+
+        Arguments:
+        key: The key from make_key().
+        words: The assembled words, as an array('H').
+        symbol_tables_text: The exported symbol tables file contents as bytes, or None.
+        result: A JSON-serializable dict holding anything else to restore, such as the diagnostics.
+        """
+        entry_dir = os.path.join(self.cache_dir, key)
+        # Write the entry to a temporary directory first and rename it into place, so that an entry is never seen
+        # half-written, even with several processes sharing the cache.
+        temp_dir = f"{entry_dir}.{os.getpid()}.tmp"
+        os.makedirs(temp_dir, exist_ok=True)
+        if sys.byteorder != "little":
+            words = array('H', words)
+            words.byteswap()
+        with open(os.path.join(temp_dir, WORDS_FILE), "wb") as words_file:
+            words.tofile(words_file)
+        if symbol_tables_text is not None:
+            with open(os.path.join(temp_dir, SYMBOL_TABLES_FILE), "wb") as symbol_tables_file:
+                symbol_tables_file.write(symbol_tables_text)
+        with open(os.path.join(temp_dir, RESULT_FILE), "w") as result_file:
+            json.dump(result, result_file)
+        try:
+            os.replace(temp_dir, entry_dir)
+        except OSError:
+            # Another process stored the same entry first.
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        self.evict()
+
+    def entries(self):
+        """Return a list of (key, size in bytes, last used time) tuples, most recently used first."""
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for key in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, key)
+            if key.endswith(".tmp") or not os.path.isdir(entry_dir):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(entry_dir, name)) for name in os.listdir(entry_dir))
+                entries.append((key, size, os.path.getmtime(entry_dir)))
+            except OSError:
+                continue
+        entries.sort(key=lambda entry: entry[2], reverse=True)
+        return entries
+
+    def total_size(self):
+        """Return the size of every entry in the cache, in bytes."""
+        return sum(size for key, size, last_used in self.entries())
+
+    def evict(self):
+        """Remove the least recently used entries until the cache is no bigger than its maximum size. Return the
+        number of entries removed."""
+        entries = self.entries()
+        total_size = sum(size for key, size, last_used in entries)
+        removed = 0
+        while entries and total_size > self.max_bytes:
+            key, size, last_used = entries.pop()
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+            total_size -= size
+            removed += 1
+        return removed
+
+    def purge(self):
+        """Remove every entry from the cache. Return the number of entries removed."""
+        entries = self.entries()
+        for key, size, last_used in entries:
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+        return len(entries)
+
+
+def main(args=None):
+    """Inspect or purge the build cache from the command line."""
+    arg_parser = argparse.ArgumentParser(description="Inspect or purge the assembler's build cache.")
+    arg_parser.add_argument("command", choices=("stats", "list", "purge"),
+                            help="stats: show the cache's size; list: show every entry; purge: remove every entry")
+    arg_parser.add_argument("--cache-dir", default=None, help="the cache directory (default: config.BUILD_CACHE_DIR)")
+    options = arg_parser.parse_args(args)
+
+    cache = BuildCache(options.cache_dir)
+    if options.command == "purge":
+        print(f"Removed {cache.purge()} entries from {cache.cache_dir}.")
+        return 0
+
+    entries = cache.entries()
+    if options.command == "list":
+        print(f"{'Key':<66}{'Size (bytes)':>14}  Last used")
+        for key, size, last_used in entries:
+            print(f"{key:<66}{size:>14}  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last_used))}")
+    total_size = sum(size for key, size, last_used in entries)
+    print(f"{len(entries)} entries, {total_size} of {cache.max_bytes} bytes, in {cache.cache_dir}.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
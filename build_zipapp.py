@@ -0,0 +1,74 @@
+"""
+The build_zipapp module packs the assembler into one executable file, xhasm.pyz by default, that runs like main.py.
+
+Every module in the assembler's directory is put in the archive, along with its bytecode, compiled ahead of time.
+The bytecode is marked as not needing to be checked against the source, so starting the archive never compiles
+anything, even where Python cannot write __pycache__ directories. Nothing is compressed, so modules are read straight
+out of the archive.
+
+The archive writes its outputs to binary_output/, symbol_tables/, and error_logs/ next to itself, as main.py does
+next to itself, so it is built into the assembler's directory by default. The config is built into it, so the archive
+has to be built again after the config is changed. With --lint or --disassemble as the first argument, the archive
+runs lint.py or disassembler.py instead, as client.py does.
+
+Usage: python build_zipapp.py [-o <output .pyz file>] [--python <interpreter>]
+Then:  python xhasm.pyz <main.py arguments>
+"""
+import argparse
+import glob
+import os
+import py_compile
+import shutil
+import tempfile
+import zipapp
+
+from output_module import assembler_dir
+
+# The archive's entry point, which runs the tool named by the first argument, or main.py. It takes the same tool flags
+# as client.py, without importing the client's socket code.
+MAIN_SOURCE = '''import sys
+
+TOOL_MODULES = {"--lint": "lint", "--disassemble": "disassembler"}
+
+args = sys.argv[1:]
+module_name = TOOL_MODULES[args.pop(0)] if args[:1] and args[0] in TOOL_MODULES else "main"
+exit_code = __import__(module_name).main(args)
+raise SystemExit(0 if exit_code is None else exit_code)
+'''
+
+
+def build_zipapp(output_file, interpreter=None):
+    """Build the archive at output_file from the modules in the assembler's directory, with the given interpreter line
+    if any, and return the number of modules in it."""
+    source_dir = assembler_dir()
+    module_files = sorted(path for path in glob.glob(os.path.join(source_dir, "*.py"))
+                          if os.path.basename(path) != os.path.basename(__file__))
+    with tempfile.TemporaryDirectory() as staging_dir:
+        with open(os.path.join(staging_dir, "__main__.py"), "w") as main_file:
+            main_file.write(MAIN_SOURCE)
+        for module_file in module_files + [os.path.join(staging_dir, "__main__.py")]:
+            module_name = os.path.basename(module_file)
+            if os.path.dirname(module_file) != staging_dir:
+                shutil.copyfile(module_file, os.path.join(staging_dir, module_name))
+            py_compile.compile(module_file, cfile=os.path.join(staging_dir, module_name + "c"), doraise=True,
+                               invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+        zipapp.create_archive(staging_dir, output_file, interpreter=interpreter, compressed=False)
+    return len(module_files)
+
+
+def main(args=None):
+    """Parse the command-line arguments and build the archive."""
+    arg_parser = argparse.ArgumentParser(description="Pack the assembler into one executable .pyz file.")
+    arg_parser.add_argument("-o", "--output", default=os.path.join(assembler_dir(), "xhasm.pyz"),
+                            help="the archive to write (default: xhasm.pyz in the assembler's directory)")
+    arg_parser.add_argument("--python", default="/usr/bin/env python3",
+                            help="the interpreter line at the top of the archive (default: /usr/bin/env python3)")
+    options = arg_parser.parse_args(args)
+
+    module_count = build_zipapp(options.output, options.python)
+    print(f"Wrote {options.output} with {module_count} modules ({os.path.getsize(options.output):,} bytes).")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,64 @@
+"""
+The cfg module dumps the control-flow graph of an XHAL program, for looking at how its code is laid out and where the
+optimizer can save words and jumps.
+
+The graph is written either in the Graphviz DOT language, with one box per basic block, or as compact JSON, with each
+block's labels, original ROM addresses, word count, exit kind, successors, and whether it is reachable. With
+--optimize, the graph's jump threading, unreachable-block removal, and dead-label removal are done first, as
+--optimize does in main.py, so the dump shows the threaded jumps, the removed blocks (dashed in DOT), and the dead
+labels. A program that main.py would not optimize, such as one with computed jumps to numeric addresses, is dumped as
+it is, with a warning on stderr saying why.
+
+Usage: python cfg.py <input .asm file> [-o <output file or ->] [--format dot|json] [--optimize]
+"""
+import argparse
+import contextlib
+import sys
+
+from cfg_module import ControlFlowGraph
+from error_checker import ErrorChecker
+from optimizer_module import unoptimizable_reason
+from preprocessor_module import Preprocessor
+
+
+def main(args=None):
+    """Parse the command-line arguments, then build and write the control-flow graph of one program."""
+    arg_parser = argparse.ArgumentParser(description="Dump the control-flow graph of an XHAL program.")
+    arg_parser.add_argument("input_file", help="the .asm file to read")
+    arg_parser.add_argument("-o", "--output", default="-", help="the file to write, or - for stdout (default)")
+    arg_parser.add_argument("--format", choices=("dot", "json"), default="dot", help="Graphviz DOT (default) or JSON")
+    arg_parser.add_argument("--optimize", action="store_true",
+                            help="thread jumps and remove unreachable blocks and dead labels first")
+    options = arg_parser.parse_args(args)
+
+    error_checker = ErrorChecker(None, "errors")
+    program = Preprocessor(options.input_file, error_checker).parse()
+    if error_checker.error_count():
+        error_checker.flush()
+        return 1
+    graph = ControlFlowGraph(program)
+    optimize = options.optimize
+    if optimize:
+        # Rewriting a program that might compute its jump targets could change what it does, as in main.py.
+        reason = unoptimizable_reason(program, {instruction.operand for instruction in program
+                                                if instruction.kind == "L"})
+        if reason is not None:
+            print(f"{options.input_file}: Not optimized, since {reason}.", file=sys.stderr)
+            optimize = False
+    if optimize:
+        graph.thread_jumps()
+        graph.remove_unreachable()
+        graph.remove_fallthrough_jumps()
+        graph.remove_dead_labels()
+
+    with contextlib.ExitStack() as stack:
+        if options.output == "-":
+            output_file = sys.stdout
+        else:
+            output_file = stack.enter_context(open(options.output, "w"))
+        output_file.write(graph.to_dot() if options.format == "dot" else graph.to_json() + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,303 @@
+"""
+The cfg module exports the ControlFlowGraph class.
+
+ControlFlowGraph class: The basic blocks of a parsed program and the jumps between them, with the jump threading,
+    unreachable-block removal, and dead-label removal that the optimizer runs.
+"""
+import json
+
+from instruction_module import Instruction
+
+
+class BasicBlock:
+    """
+    The BasicBlock class is a run of parsed instructions that is only entered at its start and only left at its end.
+
+    Attributes:
+    number: The block's position in the program, from 0.
+    start: The index in the program of the block's first instruction.
+    end: The index in the program just past the block's last instruction.
+    address: The ROM address of the block's first word.
+    labels: The labels defined at the start of the block.
+    code: The indices of the block's A- and C-commands.
+    exit: How the block ends: "fall" into the next block, "jump" unconditionally, "branch" on a condition, or
+        "computed" for a jump to an address that is not loaded just before it.
+    successors: The numbers of the blocks that can run next.
+    fallthrough: The number of the block that runs next if the block does not jump, or None.
+    reachable: Whether the block can be run, starting from ROM address 0.
+    """
+
+    __slots__ = ("number", "start", "end", "address", "labels", "code", "exit", "successors", "fallthrough",
+                 "reachable")
+
+    def __init__(self, number, start, address):
+        self.number = number
+        self.start = start
+        self.end = start
+        self.address = address
+        self.labels = []
+        self.code = []
+        self.exit = "fall"
+        self.successors = []
+        self.fallthrough = None
+        self.reachable = False
+
+
+class ControlFlowGraph:
+    """
+    The ControlFlowGraph class splits a parsed program into basic blocks and works out which blocks can follow which.
+
+    A block starts at each label, at each numeric address that a jump goes to, and after each jump. A jump's target is
+    the label or number loaded by the A-command just before it, with no label between them. A computed jump, such as
+    a return through a stored address, is taken to go to any label whose address the program loads as data, and those
+    blocks are always reachable. The graph is changed by marking instructions removed and by replacing A-command
+    operands, so that every instruction keeps its index and original ROM address until program() rebuilds the
+    instruction list.
+
+    Methods:
+    __init__: Constructs the graph from a parsed program.
+    thread_jumps: Retargets jumps to blocks that only jump on, to the final target.
+    remove_fallthrough_jumps: Removes jumps to the block that would run next anyway.
+    remove_unreachable: Removes the blocks that cannot be reached from ROM address 0.
+    remove_dead_labels: Removes the labels that nothing loads.
+    program: Returns the remaining (index, instruction) pairs, with any replaced operands.
+    to_dict: Returns the graph as a dict of plain values.
+    to_json: Returns the graph as compact JSON.
+    to_dot: Returns the graph in the Graphviz DOT language.
+    """
+
+    def __init__(self, program):
+        """Construct the ControlFlowGraph object from a list of Instruction records from Parser.parse()."""
+        self.instructions = program
+        self.removed = set()  # The indices of removed instructions.
+        self.removed_blocks = set()
+        self.operands = {}  # Replaced A-command operands, by instruction index.
+        self.dead_labels = []
+        self.threaded_jumps = 0
+
+        # Work out the ROM address of every instruction, and which labels and numbers are jumped to or loaded as data.
+        self.addresses = []
+        labels = set()
+        numeric_targets = set()
+        self.taken_labels = set()
+        rom_address = 0
+        previous = None
+        for instruction_idx, instruction in enumerate(program):
+            self.addresses.append(rom_address)
+            if instruction.kind == "L":
+                labels.add(instruction.operand)
+                # A jump after a label can be reached from elsewhere, with anything in A, so it is computed, and an
+                # address loaded just before the label is kept in A for it as data.
+                if previous is not None and previous.kind == "A":
+                    self.taken_labels.add(previous.operand)
+                previous = None
+            elif instruction.kind in ("A", "C"):
+                if previous is not None and previous.kind == "A":
+                    if instruction.kind == "C" and instruction.jump != "null":
+                        if previous.operand.isdecimal():
+                            numeric_targets.add(int(previous.operand))
+                    else:
+                        self.taken_labels.add(previous.operand)
+                previous = instruction
+                rom_address += 1
+        # One more address, just past the last word, ends the last block.
+        self.addresses.append(rom_address)
+        if previous is not None and previous.kind == "A":
+            self.taken_labels.add(previous.operand)
+        self.taken_labels.intersection_update(labels)
+
+        # Split the program into blocks. Labels and EQU directives belong to the block of the code after them.
+        self.blocks = []
+        block = None
+        for instruction_idx, instruction in enumerate(program):
+            starts_block = block is None or (block.code and (
+                instruction.kind == "L" or block.exit != "fall"
+                or (instruction.kind in ("A", "C") and self.addresses[instruction_idx] in numeric_targets)))
+            if starts_block:
+                block = BasicBlock(len(self.blocks), instruction_idx, self.addresses[instruction_idx])
+                self.blocks.append(block)
+            block.end = instruction_idx + 1
+            if instruction.kind == "L":
+                block.labels.append(instruction.operand)
+            elif instruction.kind in ("A", "C"):
+                block.code.append(instruction_idx)
+                if instruction.kind == "C" and instruction.jump != "null":
+                    block.exit = self.jump_kind(block.code)
+        self.label_blocks = {label: block.number for block in self.blocks for label in block.labels}
+        self.address_blocks = {}
+        for block in reversed(self.blocks):
+            self.address_blocks[block.address] = block.number
+        self.find_successors()
+
+    def jump_kind(self, code):
+        """Return the exit kind of a block whose last code instruction, at the end of the given code indices, jumps."""
+        jump = self.instructions[code[-1]]
+        if len(code) < 2 or self.instructions[code[-2]].kind != "A":
+            return "computed"
+        return "jump" if jump.jump == "JMP" else "branch"
+
+    def span(self, block):
+        """Return the (start, end) original ROM addresses of the given block, where end is just past its last word."""
+        return block.address, self.addresses[block.end]
+
+    def operand(self, instruction_idx):
+        """Return the operand of the A-command at the given index, or its replacement."""
+        return self.operands.get(instruction_idx, self.instructions[instruction_idx].operand)
+
+    def target_block(self, block):
+        """Return the number of the block that the given block's direct jump goes to, or None if it is not known."""
+        target = self.operand(block.code[-2])
+        if target in self.label_blocks:
+            return self.label_blocks[target]
+        if target.isdecimal():
+            return self.address_blocks.get(int(target))
+        return None
+
+    def find_successors(self):
+        """Work out every block's successors, then which blocks are reachable from the first block and from the
+        labels loaded as data."""
+        taken_blocks = sorted({self.label_blocks[label] for label in self.taken_labels})
+        live_blocks = self.live_blocks()
+        for position, block in enumerate(live_blocks):
+            successors = []
+            if block.exit in ("jump", "branch"):
+                target = self.target_block(block)
+                successors.extend(taken_blocks if target is None else [target])
+            elif block.exit == "computed":
+                successors.extend(taken_blocks)
+            # Running off the end of the program goes back to ROM address 0, which is always reachable.
+            block.fallthrough = None
+            if block.exit != "jump" and position + 1 < len(live_blocks):
+                block.fallthrough = live_blocks[position + 1].number
+                successors.append(block.fallthrough)
+            block.successors = list(dict.fromkeys(successors))
+
+        for block in self.blocks:
+            block.reachable = False
+        pending = [block.number for block in live_blocks[:1]] + taken_blocks
+        while pending:
+            block = self.blocks[pending.pop()]
+            if not block.reachable:
+                block.reachable = True
+                pending.extend(block.successors)
+
+    def live_blocks(self):
+        """Return the blocks that have not been removed, in order."""
+        return [block for block in self.blocks if block.number not in self.removed_blocks]
+
+    def is_trampoline(self, block):
+        """Return true if the given block does nothing but jump unconditionally to a label or number."""
+        if block.exit != "jump" or len(block.code) != 2:
+            return False
+        return self.instructions[block.code[1]].dest == "null"
+
+    def thread_jumps(self):
+        """Retarget every direct jump to a block that only jumps on, to the block at the end of the chain, and return
+        the number of jumps retargeted."""
+        for block in self.blocks:
+            if block.exit not in ("jump", "branch") or not block.reachable:
+                continue
+            target = self.target_block(block)
+            seen = {block.number}
+            final_operand = None
+            while target is not None and target not in seen and self.is_trampoline(self.blocks[target]):
+                seen.add(target)
+                final_operand = self.operand(self.blocks[target].code[0])
+                target = self.target_block(self.blocks[target])
+            # A chain that loops back on itself never leaves, so it is left as it is.
+            if final_operand is not None and target is not None and target not in seen:
+                self.operands[block.code[-2]] = final_operand
+                self.threaded_jumps += 1
+        self.find_successors()
+        return self.threaded_jumps
+
+    def remove_fallthrough_jumps(self):
+        """Remove each jump, and the A-command loading its target, that goes to the block that runs next anyway, stores
+        nothing, and is followed by an A-command. Return the number of words removed."""
+        removed_words = 0
+        live_blocks = self.live_blocks()
+        for position, block in enumerate(live_blocks[:-1]):
+            next_block = live_blocks[position + 1]
+            # The jump leaves its target in A, so the next block has to load A again before anything can use it.
+            if block.exit in ("jump", "branch") and self.instructions[block.code[-1]].dest == "null" \
+                    and self.target_block(block) == next_block.number and next_block.code \
+                    and self.instructions[next_block.code[0]].kind == "A":
+                self.removed.update(block.code[-2:])
+                del block.code[-2:]
+                block.exit = "fall"
+                removed_words += 2
+        if removed_words:
+            self.find_successors()
+        return removed_words
+
+    def remove_unreachable(self):
+        """Remove every instruction of the blocks that cannot be reached, except EQU directives, and return the number
+        of words removed."""
+        removed_words = 0
+        for block in self.live_blocks():
+            if block.reachable or not block.code:
+                continue
+            self.removed_blocks.add(block.number)
+            self.dead_labels.extend(block.labels)
+            for instruction_idx in range(block.start, block.end):
+                if self.instructions[instruction_idx].kind != "EQU":
+                    self.removed.add(instruction_idx)
+            removed_words += len(block.code)
+        if removed_words:
+            self.find_successors()
+        return removed_words
+
+    def remove_dead_labels(self):
+        """Remove the labels that no remaining A-command loads, and return the names of every label removed, including
+        those of unreachable blocks."""
+        loaded = {self.operand(instruction_idx) for instruction_idx, instruction in enumerate(self.instructions)
+                  if instruction.kind == "A" and instruction_idx not in self.removed}
+        for instruction_idx, instruction in enumerate(self.instructions):
+            if instruction.kind == "L" and instruction_idx not in self.removed and instruction.operand not in loaded:
+                self.removed.add(instruction_idx)
+                self.dead_labels.append(instruction.operand)
+        return self.dead_labels
+
+    def program(self):
+        """Return a list of the remaining (index, instruction) pairs, in order, with replaced operands filled in."""
+        remaining = []
+        for instruction_idx, instruction in enumerate(self.instructions):
+            if instruction_idx in self.removed:
+                continue
+            if instruction_idx in self.operands:
+                operand = self.operands[instruction_idx]
+                instruction = Instruction("A", instruction.line, f"@{operand}", operand=operand)
+            remaining.append((instruction_idx, instruction))
+        return remaining
+
+    def to_dict(self):
+        """Return the graph as a dict of plain values, with each block's labels, original ROM addresses, remaining word
+        count, exit kind, successors, and whether it is reachable, plus the dead labels and the number of threaded
+        jumps."""
+        return {
+            "blocks": [{"id": block.number, "labels": block.labels, "start": self.span(block)[0],
+                        "end": self.span(block)[1], "words": len(block.code), "exit": block.exit,
+                        "successors": block.successors, "reachable": block.reachable} for block in self.blocks],
+            "dead_labels": self.dead_labels,
+            "threaded_jumps": self.threaded_jumps
+        }
+
+    def to_json(self):
+        """Return the graph from to_dict() as compact JSON."""
+        return json.dumps(self.to_dict(), separators=(",", ":"))
+
+    def to_dot(self):
+        """Return the graph in the Graphviz DOT language, with one node per block. Unreachable blocks are dashed,
+        jumps are solid edges, and falling through into the next block is a dotted edge."""
+        lines = ["digraph cfg {", "    node [shape=box, fontname=monospace];"]
+        for block in self.blocks:
+            start, end = self.span(block)
+            span_text = f"{start}-{end - 1}" if end > start else f"{start}"
+            title = "\\n".join([f"({label})" for label in block.labels] + [span_text])
+            style = "" if block.reachable else ", style=dashed"
+            lines.append(f"    b{block.number} [label=\"{title}\"{style}];")
+            for successor in block.successors:
+                edge_style = " [style=dotted]" if successor == block.fallthrough else ""
+                lines.append(f"    b{block.number} -> b{successor}{edge_style};")
+        lines.append("}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,78 @@
+"""
+The client module assembles XHAL files through a running daemon.py, taking the same arguments as main.py.
+
+The arguments are sent to the daemon with the current directory, and what the daemon's assembler prints is printed
+here, with the same exit status. If no daemon is listening, the file is assembled in this process instead, exactly as
+main.py would. Only the standard library and the config are imported until then, so a call answered by the daemon
+starts quickly.
+
+With --lint or --disassemble as the first argument, the rest of the arguments are those of lint.py or disassembler.py
+instead.
+
+Usage: python client.py [--socket <path>] <main.py arguments>
+       python client.py [--socket <path>] --lint <lint.py arguments>
+       python client.py [--socket <path>] --disassemble <disassembler.py arguments>
+"""
+import importlib
+import json
+import os
+import socket
+import sys
+
+import config
+from output_module import assembler_dir
+
+# The daemon method and the module to fall back to for each tool flag, and for none.
+TOOL_FLAGS = {"--lint": ("lint", "lint"), "--disassemble": ("disassemble", "disassembler")}
+DEFAULT_TOOL = ("assemble", "main")
+
+
+def default_socket_path():
+    """Return the path of the daemon's Unix socket from the config, relative to the assembler's directory."""
+    return os.path.join(assembler_dir(), config.DAEMON_SOCKET)
+
+
+def call_daemon(method, params, socket_path=None):
+    """Send one JSON-RPC request to the daemon and return its result. Raises OSError if no daemon is listening, and
+    RuntimeError if the daemon answers with an error."""
+    if not hasattr(socket, "AF_UNIX"):
+        raise OSError("Unix sockets are not supported on this platform.")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client_socket:
+        client_socket.connect(socket_path if socket_path is not None else default_socket_path())
+        request = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+        client_socket.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with client_socket.makefile("rb") as response_file:
+            response_line = response_file.readline()
+    if not response_line:
+        raise OSError("The daemon closed the connection without answering.")
+    response = json.loads(response_line)
+    if "error" in response:
+        raise RuntimeError(response["error"]["message"])
+    return response["result"]
+
+
+def main(args=None):
+    """Run the tool named by the arguments through the daemon, or in this process if no daemon is listening, and
+    return its exit status."""
+    args = list(sys.argv[1:] if args is None else args)
+    socket_path = None
+    if args[:1] == ["--socket"] and len(args) > 1:
+        socket_path = args[1]
+        del args[:2]
+    method, module_name = DEFAULT_TOOL
+    if args[:1] and args[0] in TOOL_FLAGS:
+        method, module_name = TOOL_FLAGS[args.pop(0)]
+
+    try:
+        result = call_daemon(method, {"args": args, "cwd": os.getcwd()}, socket_path)
+    except OSError:
+        # No daemon is running, so run the tool here, importing it only now.
+        exit_code = importlib.import_module(module_name).main(args)
+        return 0 if exit_code is None else exit_code
+    sys.stdout.write(result["stdout"])
+    sys.stderr.write(result["stderr"])
+    return result["exit_code"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,7 +1,7 @@
 """
 The code module exports the Code class.
 
-Code class: Translates XHAL mnemonics into binary codes.
+Code class: Translates XHAL mnemonics into binary codes and integer words.
 """
 
 
@@ -15,10 +15,18 @@ class Code:
     dest: Takes a dest mnemonic string and returns its corresponding 3-bit binary code.
     comp: Takes a comp mnemonic string and returns its corresponding 7-bit binary code.
     jump: Takes a jump mnemonic string and returns its corresponding 3-bit binary code.
+    encode_c: Takes the dest, comp, and jump mnemonics of a C-command and returns its 16-bit integer word.
     """
 
+    # The tables are only ever read, so the first Code object builds them and every later one shares them. A process
+    # that assembles many programs, such as daemon.py, then builds them only once.
+    _shared_tables = None
+
     def __init__(self):
         """Construct the Code object and initialize the dictionaries that map XHAL mnemonics to .hack binary codes."""
+        if Code._shared_tables is not None:
+            self.__dict__.update(Code._shared_tables)
+            return
         self.dest_dict = {
             "null": "000",
             "M": "001",
@@ -70,6 +78,20 @@ class Code:
             "JMP": "111"
         }
 
+        # Integer versions of the codes above, already shifted into their positions in a C-command word, so that
+        # words can be built with bitwise ORs instead of string concatenation.
+        self.dest_bits = {mnemonic: int(code, 2) << 3 for mnemonic, code in self.dest_dict.items()}
+        self.comp_bits = {mnemonic: int(code, 2) << 6 for mnemonic, code in self.comp_dict.items()}
+        self.jump_bits = {mnemonic: int(code, 2) for mnemonic, code in self.jump_dict.items()}
+
+        # Every valid C-command word, precomputed for each dest, comp, and jump combination, so that encoding a
+        # C-command takes a single dictionary lookup.
+        self.c_word_table = {(dest, comp, jump): 0b1110000000000000 | comp_code | dest_code | jump_code
+                             for dest, dest_code in self.dest_bits.items()
+                             for comp, comp_code in self.comp_bits.items()
+                             for jump, jump_code in self.jump_bits.items()}
+        Code._shared_tables = dict(self.__dict__)
+
     def dest(self, dest_mnemonic):
         """Look up the XHAL dest mnemonic in the dest dictionary and return the corresponding binary dest code."""
         return self.dest_dict[dest_mnemonic]
@@ -81,3 +103,8 @@ class Code:
     def jump(self, jump_mnemonic):
         """Look up the XHAL jump mnemonic in the jump dictionary and return the corresponding binary jump code."""
         return self.jump_dict[jump_mnemonic]
+
+    def encode_c(self, dest_mnemonic, comp_mnemonic, jump_mnemonic):
+        """Return the 16-bit integer word for a C-command with the given mnemonics. Raises KeyError if any of them
+        is not a supported mnemonic."""
+        return self.c_word_table[(dest_mnemonic, comp_mnemonic, jump_mnemonic)]
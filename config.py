@@ -1,4 +1,23 @@
 # Settings
 PRINT_ERRORS_TO_CONSOLE = True
 WRITE_ERRORS_TO_LOG = True
-EXPORT_SYMBOL_TABLES = True
\ No newline at end of file
+EXPORT_SYMBOL_TABLES = True
+SYMBOL_TABLE_FORMAT = "both"  # Symbol tables to export: "text" (padded tables), "json" (compact JSON), or "both".
+SINGLE_PASS_ASSEMBLY = False   # Translate in one pass, backpatching forward label references, instead of two passes.
+OUTPUT_FORMAT = "hack"  # "hack" for .hack text, "rom" for a raw ROM image (.rom), or "both".
+ROM_BYTE_ORDER = "little"  # Byte order of the words in a ROM image, "little" or "big".
+DIAGNOSTIC_LEVEL = "warnings"  # Console output: "silent", "errors", "warnings", or "trace" (a line-by-line trace).
+MAX_ERRORS = 0  # Stop assembling after this many errors. 0 means no limit.
+WRITE_DIAGNOSTICS_JSON = False  # Also write the errors and warnings to a .json file next to the error log.
+C_COMMAND_CACHE_SIZE = 4096  # Number of distinct C-command texts whose parsed fields and words are memoized.
+INCLUDE_CACHE_SIZE = 256  # Number of included files whose preprocessed records are kept, least recently used dropped.
+USE_BUILD_CACHE = False  # Reuse the outputs of unchanged programs from the build cache instead of reassembling them.
+BUILD_CACHE_DIR = ".build_cache"  # The build cache directory, relative to the assembler's directory.
+BUILD_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Least recently used build cache entries are evicted beyond this size.
+WATCH_POLL_INTERVAL = 0.25  # Seconds between checks of a watched file's modification time in watch.py.
+WRITE_STATS_FILE = False  # Save phase timings, counters, and peak memory to binary_output/<name>.stats.json.
+WRITE_DEBUG_MAP = False  # Save the source line of every ROM address to binary_output/<name>.dbg (see --debug-map).
+OPTIMIZE = False  # Remove redundant and dead A-command loads and unreachable code before translating (see --optimize).
+USE_NUMPY = True  # Use NumPy, if it is installed, to range-check, pack, and render large programs in bulk.
+LINT_DISABLED_RULES = ()  # Names of lint rules that lint.py does not check (see python lint.py --list-rules).
+DAEMON_SOCKET = ".daemon.sock"  # daemon.py's Unix socket, which client.py connects to, in the assembler's directory.
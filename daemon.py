@@ -0,0 +1,217 @@
+"""
+The daemon module runs the assembler as a long-running process that takes requests over a Unix socket, or over stdin
+and stdout, so that editors and build tools do not pay for starting Python and importing the assembler on every call.
+
+Requests and responses are JSON-RPC 2.0 objects, one per line. The methods are:
+- assemble, lint, and disassemble: Runs main.py, lint.py, or disassembler.py with params {"args": [...], "cwd": dir},
+  where args are the tool's command-line arguments and cwd is the directory relative paths in them are taken from.
+  The result is {"stdout": text, "stderr": text, "exit_code": n}, with what the tool would have printed and the exit
+  status it would have had.
+- status: Returns the number of requests served, the uptime, and the hit and miss counts of the warm caches.
+- shutdown: Stops the daemon once the response is sent.
+
+Requests are served one at a time. Everything the tools keep between runs stays warm from one request to the next:
+the imported modules, the Code tables, the parse_c_command memo, the included-file cache, and the disassembler's
+decode table. The build cache is on disk, and is used as it is by main.py. client.py sends requests with the same
+arguments as main.py.
+
+Usage: python daemon.py [--socket <path>] [--stdio]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import time
+import traceback
+
+import disassembler
+import lint
+import main as assembler_main
+from client import default_socket_path
+from parser_module import c_command_cache_info
+from preprocessor_module import include_cache_info
+
+# JSON-RPC 2.0 error codes.
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+
+# The tool modules each method runs the main() of, by method name.
+TOOLS = {"assemble": assembler_main, "lint": lint, "disassemble": disassembler}
+
+
+class AssemblerDaemon:
+    """
+    The AssemblerDaemon class answers JSON-RPC requests by running the assembler's tools in this process.
+
+    Methods:
+    __init__: Constructs the daemon, with nothing served yet.
+    handle_line: Answers one line holding a JSON-RPC request and returns the response line, or None for a notification.
+    run_tool: Runs a tool module's main() with the given arguments and working directory, capturing its output.
+    status: Returns the request count, uptime, and cache counts.
+    serve_stdio: Answers requests from one stream and writes the responses to another until the input ends.
+    serve_socket: Answers requests from clients of a Unix socket until a shutdown request.
+    """
+
+    def __init__(self):
+        """Construct the AssemblerDaemon object."""
+        self.start_time = time.time()
+        self.requests = 0
+        self.stopping = False
+
+    def handle_line(self, line):
+        """Answer one line holding a JSON-RPC request and return the response as one line of JSON, or None if the
+        request was a notification, without an id."""
+        try:
+            request = json.loads(line)
+        except ValueError as exc:
+            return self.error_response(None, PARSE_ERROR, f"Parse error: {exc}")
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return self.error_response(None, INVALID_REQUEST, "Invalid request: a method name is required.")
+        request_id = request.get("id")
+        method = request["method"]
+        params = request.get("params", {})
+        self.requests += 1
+
+        if method in TOOLS:
+            args = params.get("args") if isinstance(params, dict) else None
+            if not isinstance(args, list) or not all(isinstance(arg, str) for arg in args):
+                return self.error_response(request_id, INVALID_PARAMS, "Invalid params: args must be a list of "
+                                                                       "strings.")
+            result = self.run_tool(TOOLS[method], args, params.get("cwd"))
+        elif method == "status":
+            result = self.status()
+        elif method == "shutdown":
+            self.stopping = True
+            result = None
+        else:
+            return self.error_response(request_id, METHOD_NOT_FOUND, f"Method not found: {method}.")
+        if "id" not in request:
+            return None
+        return json.dumps({"jsonrpc": "2.0", "id": request_id, "result": result}, separators=(",", ":"))
+
+    @staticmethod
+    def error_response(request_id, code, message):
+        """Return a JSON-RPC error response as one line of JSON."""
+        return json.dumps({"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}},
+                          separators=(",", ":"))
+
+    @staticmethod
+    def run_tool(tool, args, cwd=None):
+        """Run a tool module's main() with the given command-line arguments, from the given working directory if any,
+        and return a dict of what it printed to stdout and stderr and its exit status. An exception is reported with
+        its traceback on stderr and exit status 1, as it would be from the command line."""
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        previous_cwd = os.getcwd()
+        previous_argv = sys.argv
+        try:
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                try:
+                    # Usage messages name the tool's script, as they would from the command line.
+                    sys.argv = [os.path.basename(tool.__file__)] + args
+                    if cwd is not None:
+                        os.chdir(cwd)
+                    exit_code = tool.main(args)
+                except SystemExit as exc:
+                    exit_code = exc.code
+                except Exception:
+                    traceback.print_exc()
+                    exit_code = 1
+        finally:
+            sys.argv = previous_argv
+            os.chdir(previous_cwd)
+        # A tool that returns nothing succeeded, and a message as the exit status is printed and means failure.
+        if exit_code is None:
+            exit_code = 0
+        elif not isinstance(exit_code, int):
+            stderr.write(f"{exit_code}\n")
+            exit_code = 1
+        return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue(), "exit_code": exit_code}
+
+    def status(self):
+        """Return a dict of the number of requests served, the seconds since the daemon started, and the hit and miss
+        counts of the C-command memo and the included-file cache."""
+        c_command_cache = c_command_cache_info()
+        return {"requests": self.requests, "uptime": time.time() - self.start_time,
+                "c_command_cache": {"hits": c_command_cache.hits, "misses": c_command_cache.misses},
+                "include_cache": include_cache_info()}
+
+    def serve_stdio(self, input_stream, output_stream):
+        """Answer each line of the input stream as a request, writing each response as a line of the output stream,
+        until the input ends or a shutdown request is answered."""
+        for line in input_stream:
+            if not line.strip():
+                continue
+            response = self.handle_line(line)
+            if response is not None:
+                output_stream.write(response + "\n")
+                output_stream.flush()
+            if self.stopping:
+                break
+
+    def serve_socket(self, socket_path):
+        """Listen on the Unix socket at the given path, answering one client at a time, until a shutdown request is
+        answered. The socket file is removed afterward."""
+        daemon = self
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    response = daemon.handle_line(line.decode("utf-8"))
+                    if response is not None:
+                        self.wfile.write(response.encode("utf-8") + b"\n")
+                        self.wfile.flush()
+                    if daemon.stopping:
+                        break
+
+        # A socket file left behind by a daemon that did not stop cleanly is replaced, but a live daemon is not.
+        if os.path.exists(socket_path):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                try:
+                    probe.connect(socket_path)
+                    raise OSError(f"A daemon is already listening on {socket_path}.")
+                except (ConnectionRefusedError, FileNotFoundError):
+                    os.remove(socket_path)
+        with socketserver.UnixStreamServer(socket_path, RequestHandler) as server:
+            try:
+                while not self.stopping:
+                    server.handle_request()
+            finally:
+                os.remove(socket_path)
+
+
+def main(args=None):
+    """Parse the command-line arguments and serve requests over a Unix socket or stdin and stdout."""
+    arg_parser = argparse.ArgumentParser(description="Serve assembler requests from a long-running process.")
+    arg_parser.add_argument("--socket", default=None,
+                            help="the Unix socket to listen on (default: config.DAEMON_SOCKET in the assembler's "
+                                 "directory)")
+    arg_parser.add_argument("--stdio", action="store_true",
+                            help="read requests from stdin and write responses to stdout instead")
+    options = arg_parser.parse_args(args)
+
+    daemon = AssemblerDaemon()
+    if options.stdio:
+        daemon.serve_stdio(sys.stdin, sys.stdout)
+        return 0
+    socket_path = options.socket if options.socket is not None else default_socket_path()
+    try:
+        daemon.serve_socket(socket_path)
+    except OSError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
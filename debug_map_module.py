@@ -0,0 +1,218 @@
+"""
+The debug map module exports the DebugMap class, which maps ROM addresses to source lines and back.
+
+DebugMap class: The source line of every word of an assembled program, with a sorted index from lines to addresses.
+
+The assembler writes a program's debug map to binary_output/<name>.dbg, next to its .hack file, with --debug-map. The
+file is laid out so that it is read without parsing: after a fixed header and the file names, it is a few flat arrays
+of little-endian integers, each starting on a 4-byte boundary, which a reader maps into memory and indexes directly.
+
+Offset  Contents
+0       Header: b"XDBG", then the format version, word count, file count, index entry count, and size in bytes of the
+        file names, each as a uint32.
+24      File table: for each file, the first and one-past-the-last entries of its part of the line index, as uint32s.
+        File 0 is the program's own file, and the rest are files it included.
+        File names: the path of each file, UTF-8 encoded and NUL-terminated, padded to a multiple of 4 bytes.
+        Lines: the source line of each ROM address, as a uint32.
+        Line files: the file of each ROM address, as an index into the file table, as a uint16, padded to a multiple
+        of 4 bytes.
+        Index lines: every line that produced a word, as a uint32, sorted by file and then line.
+        Index addresses: the first ROM address of each line in the index lines, as a uint32.
+
+A word from a macro is mapped to the line of the macro's body it came from, in the file the macro is defined in, and
+not to the line the macro was used on.
+"""
+import bisect
+import mmap
+import struct
+import sys
+from array import array
+
+# The first bytes of every debug map file.
+DEBUG_MAP_MAGIC = b"XDBG"
+
+# The version of the debug map format, which readers check.
+DEBUG_MAP_VERSION = 1
+
+# The extension of debug map files in binary_output/.
+DEBUG_MAP_EXTENSION = ".dbg"
+
+# The header: the magic bytes, version, word count, file count, index entry count, and file names size.
+HEADER = struct.Struct("<4s5I")
+
+
+def padding(size):
+    """Return the number of bytes needed after size bytes to reach a multiple of 4 bytes."""
+    return -size % 4
+
+
+class DebugMap:
+    """
+    The DebugMap class holds the source line of every ROM address of a program, and the first ROM address of every
+    source line that produced a word. Looking up the line of an address is one array access, and looking up the
+    address of a line is a binary search of that file's part of the line index.
+
+    A DebugMap loaded from a file reads its arrays straight out of the mapped file, so loading one is as fast for a
+    program the size of Pong as for a small one.
+
+    Attributes:
+    files: A list of the path of each source file, starting with the program's own file.
+    lines: The source line of each ROM address, as a sequence of ints.
+    line_files: The index into files of the source file of each ROM address, as a sequence of ints.
+    index_lines: The lines that produced a word, as a sequence of ints, sorted by file and then line.
+    index_addresses: The first ROM address of each line in index_lines, as a sequence of ints.
+    file_ranges: A list of a (start, end) pair for each file, its part of index_lines and index_addresses.
+
+    Methods:
+    __init__: Constructs the DebugMap object from its arrays, building the line index.
+    from_program: Creates a DebugMap from a program's final Instruction records.
+    to_dict: Returns the map as a JSON-serializable dict.
+    from_dict: Creates a DebugMap from a dict made by to_dict().
+    to_bytes: Returns the map in the debug map file format.
+    write: Saves the map to a debug map file.
+    load: Creates a DebugMap that reads a debug map file in place.
+    line_of: Returns the (file, line) of a ROM address.
+    address_of: Returns the first ROM address of a source line, or of the next line after it that produced a word.
+    """
+
+    def __init__(self, files, lines, line_files, index=None):
+        """Construct the DebugMap object from the list of file paths, the line and file index of each ROM address,
+        and, if it has already been built, an (index_lines, index_addresses, file_ranges) tuple."""
+        self.files = files
+        self.lines = lines
+        self.line_files = line_files
+        if index is None:
+            index = self.build_index(len(files), lines, line_files)
+        self.index_lines, self.index_addresses, self.file_ranges = index
+
+    @staticmethod
+    def build_index(file_count, lines, line_files):
+        """Return the (index_lines, index_addresses, file_ranges) of the given lines and line files, with the first
+        address of each distinct (file, line) pair, sorted by file and then line."""
+        first_addresses = {}
+        for address, key in enumerate(zip(line_files, lines)):
+            first_addresses.setdefault(key, address)
+        index_lines = array('I')
+        index_addresses = array('I')
+        file_ranges = [(0, 0)] * file_count
+        previous_file = None
+        for (file_idx, line), address in sorted(first_addresses.items()):
+            if file_idx != previous_file:
+                file_ranges[file_idx] = (len(index_lines), len(index_lines))
+                previous_file = file_idx
+            index_lines.append(line)
+            index_addresses.append(address)
+            file_ranges[file_idx] = (file_ranges[file_idx][0], len(index_lines))
+        return index_lines, index_addresses, file_ranges
+
+    @classmethod
+    def from_program(cls, program, input_file):
+        """Create a DebugMap from the Instruction records a program was translated from, after any optimization, as
+        long as none of its words had errors, so that its A- and C-commands are its ROM words in order. input_file
+        is the path of the program's own file."""
+        files = [input_file]
+        file_indices = {None: 0}
+        lines = array('I')
+        line_files = array('H')
+        for instruction in program:
+            if instruction.kind != "A" and instruction.kind != "C":
+                continue
+            line = instruction.line
+            file = getattr(line, "file", None)
+            file_idx = file_indices.get(file)
+            if file_idx is None:
+                file_idx = file_indices[file] = len(files)
+                files.append(file)
+            lines.append(line)
+            line_files.append(file_idx)
+        return cls(files, lines, line_files)
+
+    def to_dict(self):
+        """Return the map as a dict that can be saved as JSON."""
+        return {"version": DEBUG_MAP_VERSION, "files": self.files, "lines": list(self.lines),
+                "line_files": list(self.line_files)}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create a DebugMap from a dict made by to_dict(). Raises ValueError if it is from another format version."""
+        if data.get("version") != DEBUG_MAP_VERSION:
+            raise ValueError(f"Unsupported debug map version {data.get('version')}.")
+        return cls(data["files"], array('I', data["lines"]), array('H', data["line_files"]))
+
+    def to_bytes(self):
+        """Return the map in the debug map file format, as bytes."""
+        names = b"".join(file.encode("utf-8") + b"\0" for file in self.files)
+        names += bytes(padding(len(names)))
+        arrays = [array('I', [bound for file_range in self.file_ranges for bound in file_range]),
+                  array('I', self.lines), array('H', self.line_files), array('I', self.index_lines),
+                  array('I', self.index_addresses)]
+        if sys.byteorder != "little":
+            for values in arrays:
+                values.byteswap()
+        file_table, lines, line_files, index_lines, index_addresses = (values.tobytes() for values in arrays)
+        header = HEADER.pack(DEBUG_MAP_MAGIC, DEBUG_MAP_VERSION, len(self.lines), len(self.files),
+                             len(self.index_lines), len(names))
+        return b"".join((header, file_table, names, lines, line_files, bytes(padding(len(line_files))), index_lines,
+                         index_addresses))
+
+    def write(self, file_path):
+        """Save the map to a debug map file at the given path."""
+        with open(file_path, "wb") as debug_map_file:
+            debug_map_file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, file_path):
+        """Create a DebugMap from a debug map file, whose arrays are read in place from the file mapped into memory.
+        Raises ValueError if the file is not a debug map of this format version."""
+        with open(file_path, "rb") as debug_map_file:
+            data = memoryview(mmap.mmap(debug_map_file.fileno(), 0, access=mmap.ACCESS_READ))
+        if len(data) < HEADER.size:
+            raise ValueError(f"{file_path} is not a debug map.")
+        magic, version, word_count, file_count, index_count, names_size = HEADER.unpack_from(data)
+        if magic != DEBUG_MAP_MAGIC:
+            raise ValueError(f"{file_path} is not a debug map.")
+        if version != DEBUG_MAP_VERSION:
+            raise ValueError(f"Unsupported debug map version {version} in {file_path}.")
+
+        offset = HEADER.size
+
+        def take(typecode, count):
+            """Return the next count integers of the given array typecode, and move past them and their padding."""
+            nonlocal offset
+            size = count * array(typecode).itemsize
+            values = data[offset:offset + size]
+            offset += size + padding(size)
+            # Memory views are in the machine's byte order, so a big-endian machine reads a swapped copy instead.
+            if sys.byteorder != "little":
+                values = array(typecode, values.tobytes())
+                values.byteswap()
+                return values
+            return values.cast(typecode)
+
+        bounds = take('I', 2 * file_count)
+        file_ranges = [(bounds[2 * file_idx], bounds[2 * file_idx + 1]) for file_idx in range(file_count)]
+        files = [name.decode("utf-8") for name in data[offset:offset + names_size].tobytes().split(b"\0")[:file_count]]
+        offset += names_size
+        lines = take('I', word_count)
+        line_files = take('H', word_count)
+        index_lines = take('I', index_count)
+        index_addresses = take('I', index_count)
+        if offset > len(data):
+            raise ValueError(f"{file_path} is truncated.")
+        return cls(files, lines, line_files, (index_lines, index_addresses, file_ranges))
+
+    def line_of(self, address):
+        """Return a (file, line) tuple for the given ROM address, where file is the path of the source file. Raises
+        IndexError if the address is past the end of the program."""
+        return self.files[self.line_files[address]], self.lines[address]
+
+    def address_of(self, line, file=None):
+        """Return the first ROM address of the given line of the given source file, the program's own file if None.
+        If the line produced no words, the first address of the next line after it that did is returned, and None if
+        there is none. Raises ValueError if the file is not one of the program's files."""
+        file_idx = 0 if file is None else self.files.index(file)
+        start, end = self.file_ranges[file_idx]
+        position = bisect.bisect_left(self.index_lines, line, start, end)
+        if position == end:
+            return None
+        return self.index_addresses[position]
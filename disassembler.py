@@ -0,0 +1,126 @@
+"""
+The disassembler module translates assembled programs, as .hack text or raw ROM images, back into XHAL.
+
+Every 16-bit word is decoded with one index into a 65536-entry table of XHAL lines, built once from the inverse of the
+Code class's dest, comp, and jump dictionaries. Words with a 0 top bit are A-commands, and words that start with 111
+and have a supported comp code are C-commands. Any other word has no XHAL form, so it is written as a comment holding
+the word in binary.
+
+Given a JSON symbol file exported by the assembler, each label is written as an L-command before the word at its ROM
+address, and the A-command before each jump is written with the name of the label it loads, if there is one. Labels do
+not change the words, so the output assembles back into the same program. Other A-commands keep their numbers, since
+a number could equally be a constant or a RAM variable.
+
+Usage: python disassembler.py <input .hack or .rom file> [-o <output .asm file or ->] [--symbols <symbols .json file>]
+                              [--byte-order little|big]
+"""
+import argparse
+import contextlib
+import functools
+import sys
+
+import config
+from code_module import Code
+from output_module import read_program
+from symbol_table_module import SymbolTable
+
+# The number of lines joined and written out at a time.
+WRITE_CHUNK = 4096
+
+
+@functools.lru_cache(maxsize=1)
+def decode_table():
+    """Return a tuple of the XHAL line, without a newline, for each of the 65536 possible words. The table is built on
+    the first call and shared after that."""
+    code = Code()
+    table = [f"// invalid word: {word:016b}" for word in range(0x8000, 0x10000)]
+    # A C-command is 111accccccdddjjj. The null dest and jump are left out of the text, as they are in XHAL source.
+    for comp, comp_code in code.comp_bits.items():
+        for dest, dest_code in code.dest_bits.items():
+            for jump, jump_code in code.jump_bits.items():
+                text = comp if dest == "null" else f"{dest}={comp}"
+                if jump != "null":
+                    text = f"{text};{jump}"
+                table[(0b1110000000000000 | comp_code | dest_code | jump_code) - 0x8000] = text
+    return tuple([f"@{word}" for word in range(0x8000)] + table)
+
+
+def load_labels(symbol_file):
+    """Return a dict of each ROM address to the list of labels defined at it, in the order they were defined, from a
+    JSON symbol file written by SymbolTable.export_json()."""
+    labels = {}
+    for symbol, address, kind, line in SymbolTable.load(symbol_file).to_dict()["symbols"]:
+        if kind == "ROM":
+            labels.setdefault(address, []).append(symbol)
+    return labels
+
+
+def disassemble(words, labels=None):
+    """Yield the XHAL line for each word of a program, one at a time, without newlines.
+
+    Arguments:
+    words: A sequence of 16-bit integer words, such as the array('H') from output_module.read_program().
+    labels: An optional dict of each ROM address to the list of labels defined at it, from load_labels().
+    """
+    table = decode_table()
+    if not labels:
+        yield from map(table.__getitem__, words)
+        return
+
+    # The jump bits of a C-command word. An A-command word has its top bit clear.
+    jump_mask = 0b111
+    word_count = len(words)
+    for address, word in enumerate(words):
+        for label in labels.get(address, ()):
+            yield f"({label})"
+        # An A-command followed by a jump loads the jump's target, so it is written as the target's label, if any.
+        if word < 0x8000 and word in labels and address + 1 < word_count:
+            next_word = words[address + 1]
+            if next_word >= 0xE000 and next_word & jump_mask:
+                yield f"@{labels[word][0]}"
+                continue
+        yield table[word]
+    # Labels at the end of the program mark the address after its last word.
+    for label in labels.get(word_count, ()):
+        yield f"({label})"
+
+
+def write_disassembly(lines, output_file):
+    """Write the lines from disassemble() to an open text file, a chunk at a time."""
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == WRITE_CHUNK:
+            chunk.append("")
+            output_file.write("\n".join(chunk))
+            chunk = []
+    if chunk:
+        chunk.append("")
+        output_file.write("\n".join(chunk))
+
+
+def main(args=None):
+    """Parse the command-line arguments and disassemble one program."""
+    arg_parser = argparse.ArgumentParser(description="Disassemble a .hack file or ROM image back into XHAL.")
+    arg_parser.add_argument("input_file", help="the .hack or .rom file to disassemble")
+    arg_parser.add_argument("-o", "--output", default="-", help="the .asm file to write, or - for stdout (default)")
+    arg_parser.add_argument("--symbols", default=None,
+                            help="a JSON symbol file from the assembler (symbol_tables/<name>_symbols.json) to take "
+                                 "label names from")
+    arg_parser.add_argument("--byte-order", choices=("little", "big"), default=config.ROM_BYTE_ORDER,
+                            help="byte order of the words in a .rom image")
+    options = arg_parser.parse_args(args)
+
+    words = read_program(options.input_file, options.byte_order)
+    labels = load_labels(options.symbols) if options.symbols is not None else None
+    with contextlib.ExitStack() as stack:
+        if options.output == "-":
+            output_file = sys.stdout
+        else:
+            output_file = stack.enter_context(open(options.output, "w"))
+        write_disassembly(disassemble(words, labels), output_file)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
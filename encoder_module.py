@@ -0,0 +1,75 @@
+"""
+The encoder module exports the bulk helpers that encode and render whole programs at once.
+
+check_a_addresses: Returns true if every A-command address in a list fits in 15 bits.
+pack_words: Packs a list of integer words into an array('H').
+render_hack_text: Renders an array('H') of words as .hack text.
+load_numpy: Imports NumPy on first use and returns it, or False if it is not installed.
+
+NumPy is optional. When it is installed (and config.USE_NUMPY is on), lists of at least NUMPY_MIN_WORDS words are
+converted to NumPy arrays, range-checked, and rendered with vectorized operations. Otherwise the same work is done in
+pure Python, with the same results. NumPy is only imported once a list that large comes along, since importing it
+takes far longer than assembling a small program.
+"""
+from array import array
+
+import config
+
+# The numpy module once load_numpy() has imported it, or False if it is not installed.
+numpy = None
+
+# The largest address an A-command can hold, since its top bit must be 0.
+MAX_A_ADDRESS = 0x7FFF
+
+# Below this many words, converting to and from NumPy arrays costs more than it saves.
+NUMPY_MIN_WORDS = 1024
+
+
+def load_numpy():
+    """Import NumPy the first time this is called, and return the numpy module, or False if it is not installed."""
+    global numpy
+    if numpy is None:
+        try:
+            import numpy as numpy_module
+        except ImportError:
+            numpy_module = False
+        numpy = numpy_module
+    return numpy
+
+
+def use_numpy(size):
+    """Return true if NumPy should be used for a list or array of the given size."""
+    return config.USE_NUMPY and size >= NUMPY_MIN_WORDS and bool(load_numpy())
+
+
+def check_a_addresses(addresses):
+    """Return true if every integer in the given list is a valid A-command address, from 0 to 32767."""
+    if not addresses:
+        return True
+    if use_numpy(len(addresses)):
+        address_array = numpy.array(addresses, dtype=numpy.int64)
+        return bool(address_array.min() >= 0 and address_array.max() <= MAX_A_ADDRESS)
+    return min(addresses) >= 0 and max(addresses) <= MAX_A_ADDRESS
+
+
+def pack_words(words):
+    """Return the given list of 16-bit integer words as an array('H')."""
+    if use_numpy(len(words)):
+        packed = array('H')
+        packed.frombytes(numpy.array(words, dtype=numpy.uint16).tobytes())
+        return packed
+    return array('H', words)
+
+
+def render_hack_text(words):
+    """Return an array('H') of words as .hack text, one 16-digit binary word per line, or None if NumPy is not being
+    used for an array of its size, in which case the caller formats the words itself."""
+    if not use_numpy(len(words)):
+        return None
+    # Unpack the bits of each word from its big-endian bytes, most significant bit first, and turn them into the
+    # characters '0' and '1', followed by a newline.
+    word_bytes = numpy.frombuffer(words, dtype=numpy.uint16).astype(">u2").view(numpy.uint8).reshape(-1, 2)
+    text = numpy.empty((len(words), 17), dtype=numpy.uint8)
+    text[:, :16] = numpy.unpackbits(word_bytes, axis=1) + ord("0")
+    text[:, 16] = ord("\n")
+    return text.tobytes().decode("ascii")
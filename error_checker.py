@@ -1,43 +1,35 @@
 """
-The error_checker module provides error and warning checking functions and creates an error file for exporting.
+The error_checker module exports the ErrorChecker class and creates error file names for exporting.
+
+ErrorChecker class: Checks for, collects, and reports errors and warnings for one assembly.
+TooManyErrorsError class: Raised to stop an assembly once too many errors have been found.
 """
-import datetime as dt
+import json
 import re
+import time
+
 import config
-import os
-
-# Initialize a global variable to hold the error file name.
-FILENAME = "default_filename.txt"
-
-# Initialize dictionary of illegal (reserved) labels.
-illegal_labels = {
-    "SP": "0",
-    "LCL": "1",
-    "ARG": "2",
-    "THIS": "3",
-    "THAT": "4",
-    "R0": "0",
-    "R1": "1",
-    "R2": "2",
-    "R3": "3",
-    "R4": "4",
-    "R5": "5",
-    "R6": "6",
-    "R7": "7",
-    "R8": "8",
-    "R9": "9",
-    "R10": "10",
-    "R11": "11",
-    "R12": "12",
-    "R13": "13",
-    "R14": "14",
-    "R15": "15",
-    "SCREEN": "16384",
-    "KBD": "24576"
-}
+from output_module import assembler_dir
+from symbol_table_module import PREDEFINED_SYMBOLS
+
+# Console diagnostic levels, from least to most output.
+DIAGNOSTIC_LEVELS = {"silent": 0, "errors": 1, "warnings": 2, "trace": 3}
+
+# Comment syntax from other languages, which is checked for on every line, so it is compiled once here, along with the
+# other patterns the checks use.
+regex_common_comments = re.compile(r'#\s.+|/\*\s.+|\*\\|<!--')
+# Idea for detecting comments from
+# https://stackoverflow.com/questions/904746/how-to-remove-all-characters-after-a-specific-character-in-python
+regex_post_paren = re.compile(r'(\)[\S]+)')
+# Proper format is like .EQU symbol value, with optional whitespace and/or comments afterward.
+regex_proper_equ = re.compile(r'^.EQU\s\S*\s\d*(?:\s+//.*|$|\s+)')
+
+# The illegal (reserved) labels are the predefined symbols.
+illegal_labels = PREDEFINED_SYMBOLS
 
 
 def create_error_file(io_file):
+    """Return a new, timestamped error log file path for the given output file name."""
     # Below lines generate a random error file name based on the current date and time.
     # Date-time formatting idea from
     # https://stackoverflow.com/questions/10501247/best-way-to-generate-random-file-names-in-python
@@ -45,139 +37,253 @@ def create_error_file(io_file):
     # https://stackoverflow.com/questions/7165749/open-file-in-a-relative-location-in-python
 
     base_filename = "error_log"
-    file_name_suffix = dt.datetime.now().strftime("%y%m%d_%H%M%S") + ".txt"
+    # time.strftime() formats the local time the same way datetime would, without importing datetime.
+    file_name_suffix = time.strftime("%y%m%d_%H%M%S") + ".txt"
 
-    file_path = os.path.abspath(__file__)
-    file_dir = os.path.split(file_path)[0] + '/' 'error_logs' + '/' + base_filename + '_' \
+    file_dir = assembler_dir() + '/' 'error_logs' + '/' + base_filename + '_' \
                + io_file + '_' + file_name_suffix
 
-    # Set the module-scope error output filename
-    global FILENAME
-    FILENAME = file_dir
-    return FILENAME
-
-
-def write_error(error_line, error_content):
-    if config.PRINT_ERRORS_TO_CONSOLE:
-        print(f"\n##########\n\nERROR, line {error_line}: {error_content}\n\n##########\n")
-    if config.WRITE_ERRORS_TO_LOG:
-        error_file = open(FILENAME, "a")
-        error_file.write(f"\n##########\n\nERROR, line {error_line}: {error_content}\n\n##########\n")
-
-
-def write_warning(warning_line, warning_content):
-    if config.PRINT_ERRORS_TO_CONSOLE:
-        print(f"\n!!!!!!!!!!\n\nWARNING, line {warning_line}: {warning_content}\n\n!!!!!!!!!!\n")
-    if config.WRITE_ERRORS_TO_LOG:
-        error_file = open(FILENAME, "a")
-        error_file.write(f"\n!!!!!!!!!!\n\nWarning, line {warning_line}: {warning_content}\n\n!!!!!!!!!!\n")
-
-
-def check_a_type_int_command(command, line):
-    print(f"Error=checking address: {command}")
-    if len(command) == 0:
-        write_error(line, "Missing value for address field in A-Type instruction.")
-        return True
-
-    if command[0] == "-":
-        write_error(line, "Address field in A-Type instruction is negative.\nA-Type instructions "
-                          "require non-negative 15-bit integers.")
-        return True
-    # If the function does not find an error, return false.
-    return False
-
-
-def check_a_type_bin_command(command, line):
-    try:
-        # String to binary translation from https://www.geeksforgeeks.org/python-convert-string-to-binary/
-        binary_code = bin(int(command)).replace("0b", "")
-        print(f"Error-checker binary code: {binary_code}")
-
-        if len(binary_code) > 15:
-            write_error(line, "Address field in A-Type instruction is over 15 bits long.\nA-Type instructions "
-                              "require non-negative 15-bit integers.")
+    return file_dir
+
+
+def format_diagnostic(severity, line, content, console=False):
+    """Return the text block used for an error or warning in the console output and error log."""
+    if severity == "ERROR":
+        return f"\n##########\n\nERROR, line {line}: {content}\n\n##########\n"
+    # Warnings have always been capitalized on the console but not in the log file.
+    return f"\n!!!!!!!!!!\n\n{'WARNING' if console else 'Warning'}, line {line}: {content}\n\n!!!!!!!!!!\n"
+
+
+class TooManyErrorsError(Exception):
+    """Raised by an ErrorChecker once as many errors as its max_errors setting have been recorded, to stop the
+    assembly early."""
+
+
+class ErrorChecker:
+    """
+    The ErrorChecker class provides the error and warning checks used while assembling one program. Each assembly owns
+    its own ErrorChecker, so the error log file and the recorded diagnostics are never shared between assemblies that
+    run in the same process.
+
+    Diagnostics are collected in memory while the program is assembled and reported all at once by flush(): to the
+    console, filtered by the diagnostic level, to the error log file, and optionally to a JSON file. The levels are
+    "silent" (nothing is printed), "errors", "warnings" (errors and warnings), and "trace" (everything, including a
+    line-by-line trace of the assembler's progress).
+
+    Methods:
+    __init__: Constructs the ErrorChecker object for an optional error log file.
+    write_error: Records an error, stopping the assembly if there are now too many.
+    write_warning: Records a warning.
+    trace: Records a trace message. Callers check the tracing attribute first so the message is only built if needed.
+    error_count: Returns the number of errors recorded so far.
+    flush: Reports every recorded diagnostic to the console, the error log, and optionally a JSON file.
+    The remaining check_ and record_ methods detect and record specific errors and warnings.
+    """
+
+    def __init__(self, log_filename=None, level=None, max_errors=None):
+        """Construct the ErrorChecker object.
+
+        Arguments:
+        log_filename: The error log file path, usually made by create_error_file(), or None for no log file. Errors and
+            warnings are only written to it if the config option to write them is set.
+        level: The console diagnostic level, one of DIAGNOSTIC_LEVELS. Defaults to config.DIAGNOSTIC_LEVEL, or "silent"
+            if config.PRINT_ERRORS_TO_CONSOLE is off.
+        max_errors: The number of errors after which the assembly is stopped, or 0 for no limit. Defaults to
+            config.MAX_ERRORS.
+        """
+        if level is None:
+            level = config.DIAGNOSTIC_LEVEL if config.PRINT_ERRORS_TO_CONSOLE else "silent"
+        self.log_filename = log_filename
+        self.level = DIAGNOSTIC_LEVELS[level]
+        self.max_errors = config.MAX_ERRORS if max_errors is None else max_errors
+        self.tracing = self.level >= DIAGNOSTIC_LEVELS["trace"]
+        # Each diagnostic is recorded as a (severity, line, message) tuple, in the order it was found. When tracing,
+        # the trace records hold the trace messages interleaved with the errors and warnings.
+        self.diagnostics = []
+        self.trace_records = []
+        self._error_count = 0
+
+    def write_error(self, error_line, error_content):
+        self.diagnostics.append(("ERROR", error_line, error_content))
+        if self.tracing:
+            self.trace_records.append(self.diagnostics[-1])
+        self._error_count += 1
+        if self.max_errors and self._error_count >= self.max_errors:
+            self.diagnostics.append(("ERROR", error_line, f"Too many errors; the assembly was stopped after "
+                                                          f"{self.max_errors}."))
+            raise TooManyErrorsError(f"Stopped after {self.max_errors} errors.")
+
+    def write_warning(self, warning_line, warning_content):
+        self.diagnostics.append(("WARNING", warning_line, warning_content))
+        if self.tracing:
+            self.trace_records.append(self.diagnostics[-1])
+
+    def trace(self, trace_content, trace_line=None):
+        if self.tracing:
+            self.trace_records.append(("TRACE", trace_line, trace_content))
+
+    def error_count(self):
+        """Return the number of errors recorded so far."""
+        return self._error_count
+
+    def flush(self, json_filename=None):
+        """Report every recorded diagnostic, once the assembly is done. Errors and warnings are printed to the console
+        according to the diagnostic level and written to the error log in one write. Trace messages are only printed.
+        If a JSON file name is given, the errors and warnings are also written to it as a list of objects."""
+        if self.tracing:
+            console_text = "".join(f"{'' if line is None else f'line {line}: '}{content}\n" if severity == "TRACE"
+                                   else format_diagnostic(severity, line, content, console=True)
+                                   for severity, line, content in self.trace_records)
+        elif self.level == DIAGNOSTIC_LEVELS["errors"]:
+            console_text = "".join(format_diagnostic(*diagnostic, console=True) for diagnostic in self.diagnostics
+                                   if diagnostic[0] == "ERROR")
+        elif self.level == DIAGNOSTIC_LEVELS["warnings"]:
+            console_text = "".join(format_diagnostic(*diagnostic, console=True) for diagnostic in self.diagnostics)
+        else:
+            console_text = ""
+        if console_text:
+            print(console_text, end="")
+
+        if config.WRITE_ERRORS_TO_LOG and self.log_filename is not None and self.diagnostics:
+            with open(self.log_filename, "a") as error_file:
+                error_file.write("".join(format_diagnostic(*diagnostic) for diagnostic in self.diagnostics))
+
+        if json_filename is not None:
+            with open(json_filename, "w") as json_file:
+                # Lines of included files, from the preprocessor, also name their file.
+                json.dump([{"severity": severity, "line": line, "message": content}
+                           if getattr(line, "file", None) is None else
+                           {"severity": severity, "line": line, "file": line.file, "message": content}
+                           for severity, line, content in self.diagnostics], json_file, indent=1)
+
+    def check_a_type_int_command(self, command, line):
+        if self.tracing:
+            self.trace(f"Error-checking address: {command}", line)
+        if len(command) == 0:
+            self.write_error(line, "Missing value for address field in A-Type instruction.")
             return True
-    except ValueError:
-        write_error(line, "Address field in A-Type instruction is not translatable to binary.\nA-Type "
-                          "instructions require non-negative 15-bit integers.")
-        return True
-
-    # If the function does not find an error, return false.
-    return False
-
 
-def record_c_type_dest_error(line):
-    write_error(line, "A destination for C-Type instruction was detected, but it is not one of the supported "
-                      "mnemonics.")
+        if command[0] == "-":
+            self.write_error(line, "Address field in A-Type instruction is negative.\nA-Type instructions "
+                                   "require non-negative 15-bit integers.")
+            return True
+        # If the function does not find an error, return false.
+        return False
 
+    def check_a_type_bin_command(self, command, line):
+        try:
+            # String to binary translation from https://www.geeksforgeeks.org/python-convert-string-to-binary/
+            binary_code = bin(int(command)).replace("0b", "")
+            if self.tracing:
+                self.trace(f"Error-checker binary code: {binary_code}", line)
+
+            if len(binary_code) > 15:
+                self.write_error(line, "Address field in A-Type instruction is over 15 bits long.\nA-Type "
+                                       "instructions require non-negative 15-bit integers.")
+                return True
+        except ValueError:
+            self.write_error(line, "Address field in A-Type instruction is not translatable to binary.\nA-Type "
+                                   "instructions require non-negative 15-bit integers.")
+            return True
 
-def record_c_type_comp_error(line):
-    write_error(line, "The computation portion of C-Type instruction is either missing or is not one of the "
-                      "supported mnemonics.")
+        # If the function does not find an error, return false.
+        return False
 
+    def record_c_type_dest_error(self, line):
+        self.write_error(line, "A destination for C-Type instruction was detected, but it is not one of the "
+                               "supported mnemonics.")
 
-def record_c_type_jump_error(line):
-    write_error(line, "A jump for C-Type instruction was detected, but it is not one of the supported "
-                      "mnemonics.")
+    def record_c_type_comp_error(self, line):
+        self.write_error(line, "The computation portion of C-Type instruction is either missing or is not one of "
+                               "the supported mnemonics.")
 
+    def record_c_type_jump_error(self, line):
+        self.write_error(line, "A jump for C-Type instruction was detected, but it is not one of the supported "
+                               "mnemonics.")
 
-def check_illegal_symbol_error(label_content, line):
-    if label_content in illegal_labels:
-        write_error(line, f"{label_content} is an illegal symbol name; label is in the reserved labels list.")
-        return True
-    else:
+    def check_illegal_symbol_error(self, label_content, line):
+        if label_content in illegal_labels:
+            self.write_error(line, f"{label_content} is an illegal symbol name; label is in the reserved labels list.")
+            return True
+        else:
+            return False
+
+    def check_l_type_text_after_paren_error(self, label_command, line):
+        post_paren_text = regex_post_paren.search(label_command.replace(" ", ""))
+
+        # If what is matched is anything but '//' to indicate the start of a comment, record the error and return True.
+        if post_paren_text is not None:
+            head, sep, tail = post_paren_text[0].partition('//')
+            if tail == "" and "//" not in post_paren_text[0]:
+                self.write_error(line, f"{label_command} has non-comment, non-blank text after the closing "
+                                       f"parenthesis.")
+                return True
+        else:
+            return False
+
+    def record_symbol_redefinition_error(self, symbol, line, original_label_ROM_add):
+        self.write_error(line, f"{symbol} redefines a previously defined symbol as a different ROM location.\nThe "
+                               f"original symbol's ROM address is '{original_label_ROM_add}'.")
+
+    def record_symbol_redefinition_warning(self, symbol, line, ROM_add):
+        self.write_warning(line, f"{symbol} redefines a previously defined symbol. The ROM locations are the "
+                                 f"same, but this was likely unintended.\nThe ROM address for both symbols is "
+                                 f"{ROM_add}.")
+
+    def check_label_redefinition(self, symbol_table, label, rom_address, line):
+        """Check whether a label at the given ROM address redefines a symbol in the symbol table. Record an error and
+        return true if it redefines a symbol that is not a label, or a label at a different ROM address. Record a
+        warning and return false if it redefines a label at the same ROM address, which does no harm."""
+        previous_entry = symbol_table.get_entry(label)
+        if previous_entry is None:
+            return False
+        prev_label_add, prev_kind, prev_line = previous_entry
+        if prev_kind != "ROM" or prev_label_add != rom_address:
+            self.record_symbol_redefinition_error(label, line, prev_label_add)
+            return True
+        self.record_symbol_redefinition_warning(label, line, rom_address)
         return False
 
-
-def check_l_type_text_after_paren_error(label_command, line):
-    # Idea for detecting comments from
-    # https://stackoverflow.com/questions/904746/how-to-remove-all-characters-after-a-specific-character-in-python
-    regex_post_paren = re.compile(r'(\)[\S]+)')
-    post_paren_text = regex_post_paren.search(label_command.replace(" ", ""))
-
-    # If what is matched is anything but '//' to indicate the start of a comment, record the error and return True.
-    if post_paren_text is not None:
-        head, sep, tail = post_paren_text[0].partition('//')
-        if tail is "" and "//" not in post_paren_text[0]:
-            write_error(line, f"{label_command} has non-comment, non-blank text after the closing parenthesis.")
+    def check_equ_redefinition(self, symbol_table, equ_label, value, command, line):
+        """Check whether an EQU directive that sets equ_label to value redefines a symbol in the symbol table. Record
+        an error and return true if it does with a different address, or a warning and return false if the address is
+        the same."""
+        if not symbol_table.contains(equ_label):
+            return False
+        try:
+            prev_label_add = symbol_table.get_address(value)
+        except KeyError:
+            try:
+                prev_label_add = symbol_table.get_address(equ_label)
+            except KeyError:
+                self.record_symbol_key_error(command, line)
+                return True
+        if prev_label_add != equ_label:
+            self.record_symbol_redefinition_error(value, line, prev_label_add)
             return True
-    else:
+        self.record_symbol_redefinition_warning(value, line, equ_label)
         return False
 
+    def check_comment_formatting_warning(self, content, line):
+        if regex_common_comments.search(content):
+            self.write_warning(line, f"'{content}' contains text that might have been meant as a comment.\nCorrect "
+                                     f"XHAL comment syntax uses two forward slashes (//).")
 
-def record_symbol_redefinition_error(symbol, line, original_label_ROM_add):
-    write_error(line, f"{symbol} redefines a previously defined symbol as a different ROM location.\nThe "
-                      f"original symbol's ROM address is '{original_label_ROM_add}'.")
-
-
-def record_symbol_redefinition_warning(symbol, line, ROM_add):
-    write_warning(line, f"{symbol} redefines a previously defined symbol. The ROM locations are the "
-                        f"same, but this was likely unintended.\nThe ROM address for both symbols is "
-                        f"{ROM_add}.")
-
-
-def check_comment_formatting_warning(content, line):
-    regex_common_comments = re.compile(r'#\s.+|/\*\s.+|\*\\|<!--')
-    if regex_common_comments.search(content):
-        write_warning(line, f"'{content}' contains text that might have been meant as a comment.\nCorrect XHAL comment "
-                            f"syntax uses two forward slashes (//).")
-
-
-def record_symbol_key_error(command, line):
-    write_error(line, f"Symbol not found in symbol table. '{command}' requires a valid entry in the symbol table.")
-
-
-def check_illegal_equ_format_error(command, line):
-    # Proper format is like .EQU symbol value, with optional whitespace and/or comments afterward.
-    regex_proper_equ = re.compile(r'^.EQU\s\S*\s\d*(?:\s+//.*|$|\s+)')
-    if not regex_proper_equ.fullmatch(command):
-        write_error(line, f"'{command}' is not a properly-formatted EQU directive.\nA properly-formatted EQU directive "
-                          f"is like .EQU symbol value, followed by an optional comment.")
+    def record_symbol_key_error(self, command, line):
+        self.write_error(line, f"Symbol not found in symbol table. '{command}' requires a valid entry in the symbol "
+                               f"table.")
 
+    def check_illegal_equ_format_error(self, command, line):
+        if not regex_proper_equ.fullmatch(command):
+            self.write_error(line, f"'{command}' is not a properly-formatted EQU directive.\nA properly-formatted EQU "
+                                   f"directive is like .EQU symbol value, followed by an optional comment.")
 
-def record_invalid_bin_error(content, line):
-    write_error(line, f"'{content}' contains improper binary content.")
+    def record_invalid_bin_error(self, content, line):
+        self.write_error(line, f"'{content}' contains improper binary content.")
 
+    def record_invalid_hex_error(self, content, line):
+        self.write_error(line, f"'{content}' contains improper hexadecimal content.")
 
-def record_invalid_hex_error(content, line):
-    write_error(line, f"'{content}' contains improper hexadecimal content.")
\ No newline at end of file
+    def record_unrecognized_line_warning(self, content, line):
+        self.write_warning(line, f"'{content}' is not an A-command, C-command, L-command, or EQU directive, so it is "
+                                 f"ignored.")
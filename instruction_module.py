@@ -0,0 +1,50 @@
+"""
+The instruction module exports the Instruction class.
+
+Instruction class: An immutable record holding the fields of one parsed XHAL command.
+"""
+
+
+class Instruction:
+    """
+    The Instruction class is the intermediate representation (IR) produced by the Parser. Each XHAL line that matters
+    to the assembler (A, C, and L commands and EQU directives) is parsed exactly once into an Instruction, and the
+    symbol resolution and encoding stages then work on those records instead of re-running the parser's regular
+    expressions. Instructions use __slots__ to stay compact and cannot be modified once constructed.
+
+    Attributes:
+    kind: The command type ("A", "C", "L", or "EQU").
+    line: The line number of the command in the source file, for error reporting.
+    text: The command text with whitespace and inline comments removed (EQU directives keep their whitespace).
+    operand: The symbol or decimal value of an A command, the label of an L command, or the value of an EQU directive.
+    equ_label: The symbol defined by an EQU directive.
+    dest: The dest mnemonic of a C command ("null" if there is none).
+    comp: The comp mnemonic of a C command.
+    jump: The jump mnemonic of a C command ("null" if there is none).
+    word: The 16-bit word of a C command, if it was already encoded while parsing, or None.
+    """
+
+    __slots__ = ("kind", "line", "text", "operand", "equ_label", "dest", "comp", "jump", "word")
+
+    def __init__(self, kind, line, text, operand=None, equ_label=None, dest=None, comp=None, jump=None, word=None):
+        """Construct the Instruction record. Fields are set through object.__setattr__ since the record is otherwise
+        read-only."""
+        set_field = object.__setattr__
+        set_field(self, "kind", kind)
+        set_field(self, "line", line)
+        set_field(self, "text", text)
+        set_field(self, "operand", operand)
+        set_field(self, "equ_label", equ_label)
+        set_field(self, "dest", dest)
+        set_field(self, "comp", comp)
+        set_field(self, "jump", jump)
+        set_field(self, "word", word)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Instruction records are immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError("Instruction records are immutable.")
+
+    def __repr__(self):
+        return f"Instruction({self.kind!r}, line={self.line}, text={self.text!r})"
@@ -0,0 +1,210 @@
+"""
+The linker module links separately assembled XHAL modules into one program.
+
+Each module is assembled on its own into a relocatable object file (see object_module.py), either with
+main.py --object or by this script. The linker places the modules in ROM one after another in the order they are
+given, adds each module's base address to the words that refer to its own labels, resolves the symbols each module
+imports to the labels and EQU symbols the others export, and allocates any symbol nobody defines a RAM variable, from
+address 16 upward in the order they are first used. Linking a list of modules gives the same program as assembling
+the files joined end to end. Modules that .INCLUDE the same file of constants each export its EQU symbols, so an EQU
+symbol exported by several modules with the same value is one symbol, and only differing definitions are errors.
+
+.asm files given on the command line are assembled to binary_output/<name>.<hash>.xobj first, where the hash is of
+the source file's full path, so that modules with the same name in different directories do not share an object file.
+A module is not assembled again if its object file is newer than the source and every file it includes, so after an
+edit only the changed modules are assembled again before the link.
+
+Usage: python linker.py <output name> <.asm or .xobj file> [<.asm or .xobj file> ...] [--format hack|rom|both]
+                        [--byte-order little|big] [--level silent|errors|warnings|trace]
+"""
+import argparse
+import hashlib
+import os
+
+import config
+from assembler_module import assemble_object_file
+from encoder_module import MAX_A_ADDRESS, pack_words
+from error_checker import DIAGNOSTIC_LEVELS, ErrorChecker, create_error_file
+from object_module import OBJECT_FILE_EXTENSION, ObjectModule
+from output_module import assembler_dir, write_hack_text, write_rom_image
+from preprocessor_module import include_dependencies
+from symbol_table_module import SymbolTable
+
+FILE_DIR = assembler_dir()
+
+
+def object_file_path(input_file):
+    """Return the object file path in binary_output/ for the given .asm file, named after the file and a hash of its
+    full path."""
+    output_name = os.path.splitext(os.path.basename(input_file))[0]
+    path_hash = hashlib.sha256(os.path.abspath(input_file).encode()).hexdigest()[:12]
+    return os.path.join(FILE_DIR, "binary_output", f"{output_name}.{path_hash}{OBJECT_FILE_EXTENSION}")
+
+
+def object_file_is_current(input_file, object_file):
+    """Return true if the given object file exists and is at least as new as the given .asm file and every file it
+    includes, directly or not."""
+    if not os.path.exists(object_file):
+        return False
+    # Included files' modification times are in nanoseconds.
+    object_mtime = os.stat(object_file).st_mtime_ns
+    if os.stat(input_file).st_mtime_ns > object_mtime:
+        return False
+    with open(input_file, "r") as source_file:
+        source = source_file.read()
+    if ".INCLUDE" not in source:
+        return True
+    # A missing included file has no modification time, so the module is assembled again to report it.
+    return all(mtime is not None and mtime <= object_mtime
+               for path, mtime in include_dependencies(input_file, source.splitlines()))
+
+
+def load_modules(input_files, level=None):
+    """Return a list of the ObjectModule of each given .asm or object file, in order, assembling each .asm file whose
+    object file is missing or older than it or a file it includes, and a list of the .asm files that were assembled. A
+    module that failed to assemble is None in the list; its errors have already been reported."""
+    modules = []
+    assembled_files = []
+    for input_file in input_files:
+        if input_file.endswith(OBJECT_FILE_EXTENSION):
+            modules.append(ObjectModule.load(input_file))
+            continue
+        object_file = object_file_path(input_file)
+        if object_file_is_current(input_file, object_file):
+            try:
+                modules.append(ObjectModule.load(object_file))
+                continue
+            except ValueError:
+                # The object file is from another version of the assembler, so assemble the module again.
+                pass
+        output_name = os.path.splitext(os.path.basename(input_file))[0]
+        modules.append(assemble_object_file(input_file, output_name, level, object_file=object_file)[0])
+        assembled_files.append(input_file)
+    return modules, assembled_files
+
+
+def link(modules, error_checker=None):
+    """Link a list of ObjectModules, placed in ROM in the given order, into one program. Return a (words,
+    symbol_table, diagnostics) tuple like assemble() does, where the symbol table holds every module's labels at their
+    final addresses. Lines in the symbol table and diagnostics are lines of the module that defines or uses the
+    symbol, and diagnostics name the module.
+
+    Arguments:
+    modules: The ObjectModules to link.
+    error_checker: The ErrorChecker that errors are recorded with. A new one is made if none is given.
+    """
+    if error_checker is None:
+        error_checker = ErrorChecker()
+    symbol_table = SymbolTable()
+    defining_modules = {}
+
+    # Give each module its base address, and add its exports to the symbol table at their final addresses.
+    bases = []
+    base = 0
+    for module in modules:
+        bases.append(base)
+        for symbol, (address, kind, line) in module.exports.items():
+            previous_entry = symbol_table.get_entry(symbol)
+            if previous_entry is not None:
+                # The EQU symbols of a file that several modules include are defined the same way by each of them.
+                if kind == "EQU" and previous_entry[1] == "EQU" and previous_entry[0] == address:
+                    continue
+                error_checker.write_error(line, f"In module {module.name}: {symbol} is already defined in module "
+                                                f"{defining_modules[symbol]}.")
+                continue
+            defining_modules[symbol] = module.name
+            symbol_table.add_entry(symbol, address + base if kind == "ROM" else address, kind, line)
+        base += len(module.words)
+
+    # Relocate each module's words and fill in its imports. Symbols that no module defines become RAM variables.
+    words = []
+    ram_address = 16
+    for module, base in zip(modules, bases):
+        module_words = list(module.words)
+        for word_idx in module.relocations:
+            module_words[word_idx] += base
+            if module_words[word_idx] > MAX_A_ADDRESS:
+                label, line = next((symbol, line) for symbol, (address, kind, line) in module.exports.items()
+                                   if kind == "ROM" and address == module.words[word_idx])
+                error_checker.write_error(line, f"In module {module.name}: the label {label} is linked at ROM "
+                                                f"address {module_words[word_idx]}, which does not fit in an "
+                                                f"A-command.")
+                module_words[word_idx] = 0
+        for symbol, (line, word_indices) in module.imports.items():
+            if not symbol_table.contains(symbol):
+                symbol_table.add_entry(symbol, ram_address, "RAM", line)
+                ram_address += 1
+            address = symbol_table.get_address(symbol)
+            if address > MAX_A_ADDRESS:
+                error_checker.write_error(line, f"In module {module.name}: {symbol} is linked to address {address}, "
+                                                f"which does not fit in an A-command.")
+                continue
+            for word_idx in word_indices:
+                module_words[word_idx] = address
+        words.extend(module_words)
+
+    return pack_words(words), symbol_table, error_checker.diagnostics
+
+
+def link_files(input_files, output_name, output_format=None, byte_order=None, level=None):
+    """Assemble the given .asm files that are out of date, link them with the given object files, and write
+    binary_output/<output_name>.hack and/or .rom and, depending on the config settings, the symbol tables in
+    symbol_tables/ and an error log in error_logs/. Return the same tuple as link(), or None if a module failed to
+    assemble. No output files are written if the link has errors.
+
+    Arguments:
+    input_files: The modules, as .asm or object files, in the order they are placed in ROM.
+    output_name: The name of the output files, minus their extensions.
+    output_format: "hack" for .hack text, "rom" for a raw ROM image, or "both". Defaults to config.OUTPUT_FORMAT.
+    byte_order: "little" or "big", the byte order of a ROM image. Defaults to config.ROM_BYTE_ORDER.
+    level: The console diagnostic level. Defaults to the config setting.
+    """
+    if output_format is None:
+        output_format = config.OUTPUT_FORMAT
+    if byte_order is None:
+        byte_order = config.ROM_BYTE_ORDER
+    modules, assembled_files = load_modules(input_files, level)
+    if None in modules:
+        return None
+
+    log_filename = None
+    if config.WRITE_ERRORS_TO_LOG:
+        log_filename = create_error_file(output_name)
+        open(log_filename, "w").close()
+    error_checker = ErrorChecker(log_filename, level)
+    error_checker.trace(f"Assembled {len(assembled_files)} of {len(input_files)} modules: {assembled_files}")
+    words, symbol_table, diagnostics = link(modules, error_checker)
+    if not error_checker.error_count():
+        output_file_path = os.path.join(FILE_DIR, "binary_output", output_name)
+        if output_format in ("hack", "both"):
+            write_hack_text(words, output_file_path + ".hack")
+        if output_format in ("rom", "both"):
+            write_rom_image(words, output_file_path + ".rom", byte_order)
+        if config.EXPORT_SYMBOL_TABLES:
+            symbol_table.export_symbol_tables(output_name)
+    error_checker.flush()
+    return words, symbol_table, diagnostics
+
+
+def main(args=None):
+    """Parse the command-line arguments, then assemble and link the modules. Return 1 if anything failed and 0
+    otherwise."""
+    arg_parser = argparse.ArgumentParser(description="Link separately assembled XHAL modules into one program.")
+    arg_parser.add_argument("output_name", help="the name of the output files, minus their extensions")
+    arg_parser.add_argument("input_files", nargs="+", help="the modules, as .asm or object files, in ROM order")
+    arg_parser.add_argument("--format", choices=("hack", "rom", "both"), default=config.OUTPUT_FORMAT,
+                            help="write .hack text, a raw .rom image, or both")
+    arg_parser.add_argument("--byte-order", choices=("little", "big"), default=config.ROM_BYTE_ORDER,
+                            help="byte order of the words in a .rom image")
+    arg_parser.add_argument("--level", choices=tuple(DIAGNOSTIC_LEVELS), default=None,
+                            help="how much to print to the console (default: config.DIAGNOSTIC_LEVEL)")
+    options = arg_parser.parse_args(args)
+    result = link_files(options.input_files, options.output_name, options.format, options.byte_order,
+                        options.level)
+    if result is None or any(severity == "ERROR" for severity, line, message in result[2]):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
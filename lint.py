@@ -0,0 +1,104 @@
+"""
+The lint module checks whole directories of XHAL files for errors and warnings without assembling them, for gating
+CI runs.
+
+Each file is linted in one sweep over its lines by a Linter (see lint_module.py), which reports the same errors and
+warnings, with the same messages, as the assembler. Files are spread over a pool of worker processes, unless there is
+only one file or one worker. Every diagnostic is printed on one line as file:line: SEVERITY [rule] message, and the
+exit status is 1 if any file has an error.
+
+Usage: python lint.py <directory or glob> [<directory or glob> ...] [--workers N] [--enable RULE] [--disable RULE]
+                      [--json FILE] [--list-rules]
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from batch import find_input_files
+from lint_module import RULES, Linter
+
+
+def lint_one(input_file, enable=(), disable=None):
+    """Lint one file, in a worker process or in this one, and return an (input file, diagnostics, failure) tuple,
+    where failure is None unless the file could not be read."""
+    try:
+        return input_file, Linter(enable, disable).lint_file(input_file), None
+    except (OSError, UnicodeDecodeError) as exc:
+        return input_file, [], f"{type(exc).__name__}: {exc}"
+
+
+def lint_batch(input_files, workers=None, enable=(), disable=None):
+    """Lint every given file, on a process pool with the given number of workers (the CPU count if None) if there is
+    more than one file and worker, and return the list of results from lint_one(), in the same order as input_files."""
+    if len(input_files) == 1 or workers == 1:
+        return [lint_one(input_file, enable, disable) for input_file in input_files]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lint_one, input_files, [enable] * len(input_files), [disable] * len(input_files)))
+
+
+def list_rules():
+    """Print the name, severity, and default state of every registered rule."""
+    for rule in RULES.values():
+        print(f"{rule.name:<25}{rule.severity:<10}{'on' if rule.enabled else 'off'}")
+
+
+def main(args=None):
+    """Parse the command-line arguments, lint every matching file, and print the diagnostics and a summary. Return 1
+    if any file had errors or could not be read, and 0 otherwise."""
+    arg_parser = argparse.ArgumentParser(description="Check whole directories of XHAL files without assembling them.")
+    arg_parser.add_argument("paths", nargs="*", help="directories of .asm files or glob patterns")
+    arg_parser.add_argument("-w", "--workers", type=int, default=None,
+                            help="number of worker processes (default: the number of CPUs)")
+    arg_parser.add_argument("--enable", action="append", default=[], metavar="RULE",
+                            help="also check a rule that is off by default (may be repeated)")
+    arg_parser.add_argument("--disable", action="append", default=None, metavar="RULE",
+                            help="do not check a rule (may be repeated; default: config.LINT_DISABLED_RULES)")
+    arg_parser.add_argument("--json", default=None, metavar="FILE", help="also write the diagnostics to a JSON file")
+    arg_parser.add_argument("--list-rules", action="store_true", help="list the rules and exit")
+    options = arg_parser.parse_args(args)
+
+    if options.list_rules:
+        list_rules()
+        return 0
+    if not options.paths:
+        arg_parser.error("at least one directory or glob pattern is required")
+    input_files = find_input_files(options.paths)
+    if not input_files:
+        print("No .asm files found.")
+        return 1
+    try:
+        # Check the rule names before starting any workers.
+        Linter(options.enable, options.disable)
+    except ValueError as exc:
+        arg_parser.error(str(exc))
+
+    start_time = time.perf_counter()
+    results = lint_batch(input_files, options.workers, tuple(options.enable),
+                         None if options.disable is None else tuple(options.disable))
+    elapsed = time.perf_counter() - start_time
+
+    error_count = warning_count = 0
+    for input_file, diagnostics, failure in results:
+        if failure is not None:
+            print(f"{input_file}: FAILED {failure}")
+        for severity, line, message, rule_name in diagnostics:
+            print(f"{input_file}:{line}: {severity} [{rule_name}] {message.replace(chr(10), ' ')}")
+            if severity == "ERROR":
+                error_count += 1
+            else:
+                warning_count += 1
+    failed = sum(1 for result in results if result[2] is not None)
+    print(f"{len(results)} file(s) linted in {elapsed * 1000:.0f} ms: {error_count} error(s), "
+          f"{warning_count} warning(s), {failed} failed.")
+
+    if options.json is not None:
+        with open(options.json, "w") as json_file:
+            json.dump([{"file": input_file, "severity": severity, "line": line, "rule": rule_name, "message": message}
+                       for input_file, diagnostics, failure in results
+                       for severity, line, message, rule_name in diagnostics], json_file, indent=1)
+    return 1 if error_count or failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,315 @@
+"""
+The lint module exports the Linter class and the registry of rules it checks XHAL source against.
+
+Rule class: One lint rule: its name, severity, the lines it applies to, and the assembler check it runs.
+register_rule: Adds a rule to the registry.
+Linter class: Checks XHAL source lines against every enabled rule in a single sweep, without assembling them.
+
+The rules do not check anything themselves. Each one runs the same ErrorChecker or Parser check the assembler runs
+for the same problem, on a scratch ErrorChecker, and reports what it records, so the assembler and the linter share
+one implementation of every check and every message, and a program that lints clean of errors assembles clean of them
+too. Linting only classifies each line and runs the rules for its kind of line, and the diagnostics of a line are
+worked out once per distinct line, so whole directories can be checked in milliseconds.
+
+A rule looks at one field of a line, such as its text, its address, or its dest mnemonic. It can also have a pattern
+that must match the start of the field before its check is run at all.
+
+The .INCLUDE, .MACRO, and .ENDM directives, macro bodies, and macro uses are skipped, including uses of the macros that
+included files define. Included files are linted as files of their own.
+"""
+import os
+import re
+
+import config
+from code_module import Code
+from error_checker import ErrorChecker, regex_post_paren
+from parser_module import Parser, parse_c_command, represents_int, translate_number
+from preprocessor_module import Preprocessor, load_include
+from symbol_table_module import SymbolTable
+
+# The rule registry, by rule name, in the order the rules are checked.
+RULES = {}
+
+
+class Rule:
+    """
+    The Rule class is one lint rule. Rules are immutable once registered, so they are shared by every Linter.
+
+    Attributes:
+    name: The rule's name, used to enable or disable it.
+    severity: "ERROR" or "WARNING". The rule reports only the diagnostics of this severity that its check records.
+    kinds: The kinds of line the rule applies to ("EQU", "A", "C", "L", or "UNKNOWN"), or None for every line.
+    field: The field of the line the rule looks at. Lines without the field are skipped.
+    check: A function of (value, linter) that runs the assembler's check on the field value, with Linter.record(), and
+        returns the (severity, message) diagnostics it recorded.
+    pattern: An optional compiled regular expression that must match the start of the field for the check to run.
+    enabled: Whether the rule is checked unless it is disabled by name.
+    """
+
+    __slots__ = ("name", "severity", "kinds", "field", "check", "pattern", "enabled")
+
+    def __init__(self, name, severity, kinds, field, check, pattern=None, enabled=True):
+        """Construct the Rule object."""
+        self.name = name
+        self.severity = severity
+        self.kinds = kinds
+        self.field = field
+        self.check = check
+        self.pattern = pattern
+        self.enabled = enabled
+
+    def apply(self, value, linter):
+        """Return the list of the rule's messages for the given field value, which is empty if the rule is not
+        broken."""
+        if self.pattern is not None and self.pattern.match(value) is None:
+            return []
+        return [message for severity, message in self.check(value, linter) if severity == self.severity]
+
+
+def register_rule(rule):
+    """Add the given rule to the registry, replacing any rule with the same name, and return it."""
+    RULES[rule.name] = rule
+    return rule
+
+
+def error_checker_check(method_name):
+    """Return a rule check that runs the ErrorChecker method of the given name on the field value."""
+    def check(value, linter):
+        return linter.record(getattr(linter.error_checker, method_name), value)
+    return check
+
+
+def check_bin_hex(value, linter):
+    """Translate a binary or hexadecimal symbol as the Parser does, which records an error if its digits are
+    improper."""
+    return linter.record(linter.parser.translate_bin_hex, value)
+
+
+def check_redefinition(value, linter):
+    """Check whether a label or EQU symbol redefines a symbol, as the assembler's first pass does. Reserved symbols
+    are only reported as reserved, as they are by the first pass."""
+    error_checker = linter.error_checker
+    if linter.record(error_checker.check_illegal_symbol_error, value):
+        return []
+    if linter.kind == "L":
+        return linter.record(error_checker.check_label_redefinition, linter.symbol_table, value, linter.rom_address)
+    return linter.record(error_checker.check_equ_redefinition, linter.symbol_table, value, linter.fields["number"],
+                         linter.fields["line"])
+
+
+def check_address_too_large(value, linter):
+    """Range-check an address, as the second pass does once check_a_type_int_command() has accepted it."""
+    error_checker = linter.error_checker
+    if linter.record(error_checker.check_a_type_int_command, value):
+        return []
+    return linter.record(error_checker.check_a_type_bin_command, value)
+
+
+def c_field_check(method_name):
+    """Return a rule check that records the ErrorChecker error of the given name for an unsupported C-command field,
+    which classify() only gives when it is unsupported."""
+    def check(value, linter):
+        return linter.record(getattr(linter.error_checker, method_name))
+    return check
+
+
+_code = Code()
+
+register_rule(Rule("comment-syntax", "WARNING", None, "line", error_checker_check("check_comment_formatting_warning")))
+register_rule(Rule("equ-format", "ERROR", ("EQU",), "line", error_checker_check("check_illegal_equ_format_error")))
+register_rule(Rule("label-text-after-paren", "ERROR", ("L",), "text",
+                   error_checker_check("check_l_type_text_after_paren_error")))
+register_rule(Rule("invalid-binary", "ERROR", ("EQU", "A", "L"), "value", check_bin_hex, Parser.regex_binary))
+register_rule(Rule("invalid-hex", "ERROR", ("EQU", "A", "L"), "value", check_bin_hex, Parser.regex_hex))
+register_rule(Rule("reserved-symbol", "ERROR", ("EQU", "L"), "symbol",
+                   error_checker_check("check_illegal_symbol_error")))
+register_rule(Rule("symbol-redefinition", "ERROR", ("EQU", "L"), "symbol", check_redefinition))
+register_rule(Rule("label-redefinition", "WARNING", ("L",), "symbol", check_redefinition))
+register_rule(Rule("negative-address", "ERROR", ("A",), "number", error_checker_check("check_a_type_int_command")))
+register_rule(Rule("address-too-large", "ERROR", ("A",), "number", check_address_too_large))
+register_rule(Rule("unsupported-dest", "ERROR", ("C",), "dest", c_field_check("record_c_type_dest_error")))
+register_rule(Rule("unsupported-comp", "ERROR", ("C",), "comp", c_field_check("record_c_type_comp_error")))
+register_rule(Rule("unsupported-jump", "ERROR", ("C",), "jump", c_field_check("record_c_type_jump_error")))
+register_rule(Rule("unrecognized-line", "WARNING", ("UNKNOWN",), "line",
+                   error_checker_check("record_unrecognized_line_warning"), enabled=False))
+
+
+class Linter:
+    """
+    The Linter class checks XHAL source against the registered rules, classifying each line the way the Parser does
+    and running only the rules for its kind of line. One Linter can lint any number of files, one after another.
+
+    Methods:
+    __init__: Constructs the linter with the enabled rules grouped by kind of line.
+    lint_file: Lints one .asm file and returns its diagnostics.
+    lint_lines: Lints an iterable of source lines in one sweep and returns their diagnostics.
+    record: Runs one of the assembler's checks and returns the diagnostics it recorded.
+    """
+
+    def __init__(self, enable=(), disable=None):
+        """Construct the Linter object.
+
+        Arguments:
+        enable: The names of rules to check that are off by default.
+        disable: The names of rules not to check. config.LINT_DISABLED_RULES if None.
+        """
+        disable = set(config.LINT_DISABLED_RULES if disable is None else disable)
+        unknown = (set(enable) | disable) - set(RULES)
+        if unknown:
+            raise ValueError(f"Unknown lint rule(s): {', '.join(sorted(unknown))}.")
+        self.rules = [rule for rule in RULES.values()
+                      if (rule.enabled or rule.name in enable) and rule.name not in disable]
+        self.rules_by_kind = {kind: [rule for rule in self.rules if rule.kinds is None or kind in rule.kinds]
+                              for kind in ("BLANK", "COMMENT", "EQU", "A", "C", "L", "UNKNOWN")}
+        # The rules run the assembler's checks with a scratch error checker, and a Parser for binary and hexadecimal.
+        self.error_checker = ErrorChecker(None, "silent", 0)
+        self.parser = Parser(None, self.error_checker, lines=())
+        self.kind = None
+        self.fields = None
+        self.line_number = 0
+        self.base_dir = None
+        self.rom_address = 0
+        self.symbol_table = SymbolTable()
+
+    def lint_file(self, input_file):
+        """Lint the given .asm file and return its diagnostics, as from lint_lines()."""
+        with open(input_file, "r") as file:
+            return self.lint_lines(file, os.path.dirname(os.path.abspath(input_file)))
+
+    def lint_lines(self, lines, base_dir=None):
+        """Lint an iterable of XHAL source lines, numbered from 1, and return a list of (severity, line, message, rule
+        name) tuples, in line order. Files named by .INCLUDE directives are found relative to base_dir, or the current
+        directory if it is None."""
+        diagnostics = []
+        self.rom_address = 0
+        self.symbol_table = SymbolTable()
+        self.base_dir = base_dir if base_dir is not None else os.getcwd()
+        macros = set()
+        macro_count = 0
+        in_macro = False
+        # The diagnostics of A- and C-commands, comments, and blank lines only depend on their text, and real programs
+        # repeat the same few lines thousands of times, so they are worked out once per distinct line.
+        line_results = {}
+        for line_number, line in enumerate(lines, 1):
+            line = line.strip()
+            cached = line_results.get(line)
+            if cached is not None and not in_macro:
+                kind, results = cached
+                for severity, message, rule_name in results:
+                    diagnostics.append((severity, line_number, message, rule_name))
+                if kind is not None:
+                    self.rom_address += 1
+                continue
+
+            fields = self.classify(line, macros)
+            kind = fields["kind"]
+            # A new macro, defined here or in an included file, can change how any line is classified.
+            if len(macros) != macro_count:
+                macro_count = len(macros)
+                line_results.clear()
+            if kind == "MACRO" or kind == "DIRECTIVE":
+                in_macro = fields["line"] == ".MACRO" if kind == "MACRO" else in_macro
+                continue
+            if in_macro:
+                continue
+            self.kind = kind
+            self.fields = fields
+            self.line_number = line_number
+            results = []
+            for rule in self.rules_by_kind[kind]:
+                value = fields.get(rule.field)
+                if value is None:
+                    continue
+                for message in rule.apply(value, self):
+                    results.append((rule.severity, message, rule.name))
+                    diagnostics.append((rule.severity, line_number, message, rule.name))
+            # Keep the ROM address and the symbol definitions up to date for the redefinition rules, as the
+            # assembler's first pass would, counting only the commands the Parser keeps.
+            symbol = fields.get("symbol")
+            if kind in ("A", "C") and fields.get("kept", True):
+                self.rom_address += 1
+                line_results[line] = (kind, results)
+            elif kind in ("A", "BLANK", "COMMENT"):
+                line_results[line] = (None, results)
+            elif symbol is not None and not self.symbol_table.contains(symbol):
+                if kind == "L":
+                    self.symbol_table.add_entry(symbol, self.rom_address, "ROM", line_number)
+                else:
+                    number = fields["number"]
+                    self.symbol_table.add_entry(symbol, int(number) if represents_int(number) else number, "EQU",
+                                                line_number)
+        return diagnostics
+
+    def record(self, check, *args):
+        """Run one of the assembler's check or record methods with the given arguments and the current line number,
+        and return the list of (severity, message) diagnostics it recorded."""
+        diagnostics = self.error_checker.diagnostics
+        check(*args, self.line_number)
+        recorded = [(severity, message) for severity, line, message in diagnostics]
+        diagnostics.clear()
+        return recorded
+
+    def classify(self, line, macros):
+        """Return a dict of the kind and fields of a stripped source line, as the Parser would take it apart. The
+        .MACRO and .ENDM directives are of kind "MACRO", and .INCLUDE directives and macro uses of kind
+        "DIRECTIVE"."""
+        if not line:
+            return {"kind": "BLANK", "line": line}
+        if line.startswith("."):
+            directive = Preprocessor.regex_directive.match(line)
+            if directive is not None:
+                if directive["name"] != "INCLUDE":
+                    if directive["name"] == "MACRO" and directive["args"]:
+                        macros.add(directive["args"].replace(",", " ").split()[0])
+                    return {"kind": "MACRO", "line": "." + directive["name"]}
+                # Uses of the macros the included file defines are skipped too. Its errors are reported when it is
+                # linted itself.
+                path_match = Preprocessor.regex_include_path.fullmatch(directive["args"])
+                if path_match is not None:
+                    included = load_include(os.path.abspath(os.path.join(self.base_dir, path_match["path"])))
+                    if included is not None:
+                        macros.update(included.macros)
+                return {"kind": "DIRECTIVE", "line": line}
+        if line[1:4] == "EQU" and Parser.regex_equ.match(line):
+            stripped_of_equ = line.replace(".EQU ", "")
+            value = re.sub(Parser.regex_pre_equ_address, "", stripped_of_equ)
+            number = translate_number(value)[0]
+            return {"kind": "EQU", "line": line, "value": value, "number": number,
+                    "symbol": None if number is None else re.sub(Parser.regex_post_equ_symbol, "", stripped_of_equ)}
+        if macros:
+            macro_use = Preprocessor.regex_macro_use.match(line)
+            if macro_use is not None and macro_use["name"] in macros:
+                return {"kind": "DIRECTIVE", "line": line}
+
+        text = line.replace(" ", "")
+        match = Parser.regex_lexer.match(text)
+        if match is None:
+            return {"kind": "UNKNOWN", "line": line}
+        kind = match.lastgroup
+        if kind == "COMMENT":
+            return {"kind": "COMMENT", "line": line}
+        if kind == "A":
+            value = match["address"]
+            if match["address_tail"]:
+                value = Parser.regex_comment.sub("", text).replace("@", "")
+            number = translate_number(value)[0]
+            return {"kind": "A", "line": line, "text": text, "value": value, "kept": number is not None,
+                    "number": number if number is not None and represents_int(number) else None}
+        if kind == "L":
+            value = match["label"]
+            after_paren = regex_post_paren.search(text)
+            if value is None or match["label_tail"]:
+                if after_paren is not None and "//" not in after_paren[0]:
+                    return {"kind": "L", "line": line, "text": text}
+                value = Parser.regex_comment.sub("", text).replace("(", "").replace(")", "")
+            return {"kind": "L", "line": line, "text": text, "value": value, "symbol": translate_number(value)[0]}
+        command, dest, comp, jump, word = parse_c_command(text, kind)
+        if word is not None:
+            return {"kind": "C", "line": line}
+        # Only the first unsupported field is reported, as the assembler does.
+        if dest not in _code.dest_dict:
+            return {"kind": "C", "line": line, "dest": dest}
+        if comp not in _code.comp_dict:
+            return {"kind": "C", "line": line, "comp": comp}
+        return {"kind": "C", "line": line, "jump": jump}
+
@@ -0,0 +1,84 @@
+"""
+The object module exports the ObjectModule class.
+
+ObjectModule class: A relocatable module, the output of assembling one XHAL file on its own for linker.py.
+"""
+import json
+
+# The version of the object file format, which readers check.
+OBJECT_FILE_VERSION = 1
+
+# The extension of object files in binary_output/.
+OBJECT_FILE_EXTENSION = ".xobj"
+
+
+class ObjectModule:
+    """
+    The ObjectModule class holds one separately assembled module. Its words are assembled as if the module started at
+    ROM address 0, and the linker places it after the modules before it.
+
+    A-commands that refer to one of the module's own labels hold the label's address within the module and are listed
+    in the relocations, so the linker adds the module's base address to them. A-commands that refer to a symbol the
+    module does not define hold 0 and are listed under that symbol in the imports. The linker resolves each import to
+    another module's label or EQU symbol, or else allocates it a RAM variable, from address 16 upward in the order
+    variables are first used, just as the second pass does for a whole program. Every label and EQU symbol the module
+    defines is exported.
+
+    Object files are JSON, so they can be read by other tools.
+
+    Attributes:
+    name: The module's name, used in linker diagnostics.
+    words: A list of the module's 16-bit integer words.
+    exports: A dict of each symbol the module defines to its (address, kind, line), where kind is "ROM" for a label,
+        whose address is relative to the module, or "EQU" for an EQU symbol, whose address is absolute.
+    imports: A dict of each symbol the module uses but does not define to a (line, word indices) pair, holding the line
+        it is first used on and the index of every word that refers to it, in the order they were first used.
+    relocations: A list of the indices of the words that hold module-relative ROM addresses.
+
+    Methods:
+    __init__: Constructs the ObjectModule object.
+    to_dict: Returns the module as a JSON-serializable dict.
+    from_dict: Creates an ObjectModule from a dict made by to_dict().
+    write: Saves the module to an object file.
+    load: Creates an ObjectModule from an object file.
+    """
+
+    def __init__(self, name, words, exports=None, imports=None, relocations=None):
+        """Construct the ObjectModule object. The arguments are the attributes of the same names."""
+        self.name = name
+        self.words = words
+        self.exports = exports if exports is not None else {}
+        self.imports = imports if imports is not None else {}
+        self.relocations = relocations if relocations is not None else []
+
+    def to_dict(self):
+        """Return the module as a dict that can be saved as JSON."""
+        return {
+            "version": OBJECT_FILE_VERSION,
+            "name": self.name,
+            "words": list(self.words),
+            "exports": [[symbol, address, kind, line] for symbol, (address, kind, line) in self.exports.items()],
+            "imports": [[symbol, line, word_indices] for symbol, (line, word_indices) in self.imports.items()],
+            "relocations": self.relocations
+        }
+
+    @classmethod
+    def from_dict(cls, module):
+        """Create an ObjectModule holding the contents of a dict made by to_dict()."""
+        if module.get("version") != OBJECT_FILE_VERSION:
+            raise ValueError(f"Unsupported object file version {module.get('version')!r}.")
+        return cls(module["name"], module["words"],
+                   {symbol: (address, kind, line) for symbol, address, kind, line in module["exports"]},
+                   {symbol: (line, word_indices) for symbol, line, word_indices in module["imports"]},
+                   module["relocations"])
+
+    def write(self, filename):
+        """Save the module to the given object file."""
+        with open(filename, "w") as object_file:
+            json.dump(self.to_dict(), object_file, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, filename):
+        """Create an ObjectModule from the given object file."""
+        with open(filename, "r") as object_file:
+            return cls.from_dict(json.load(object_file))
@@ -0,0 +1,217 @@
+"""
+The optimizer module exports the peephole optimizer, which removes instructions that cannot change what a program does.
+
+optimize_program: Returns a parsed program with redundant, dead, and unreachable instructions removed, and a report.
+format_optimization_report: Returns a one-line summary of an optimizer report.
+ram_variables: Returns the RAM variables of a parsed program, in the order they are first used.
+
+The optimizer works on the parsed program before the first pass, so label addresses are worked out from the smaller
+program as usual. It first builds the program's control-flow graph (see cfg_module.py) to:
+- thread jumps: a jump to a block that only jumps on is sent straight to the end of the chain,
+- remove unreachable blocks: the blocks that cannot be reached from ROM address 0,
+- remove jumps to the next block, which would run next anyway,
+- remove dead labels: the labels that nothing loads any more, so that the blocks around them can be merged.
+Then one peephole pass over what is left removes:
+- redundant loads: an A-command that loads what A is already known to hold,
+- dead loads: an A-command followed directly by another A-command, which overwrites it before it is used,
+- unreachable code: the commands after an unconditional jump, up to the next place that can be jumped to.
+
+Labels are places that can be jumped to, and so are the numeric addresses that jumps go to. Compiler output such as
+HAL_input/Pong.asm jumps to shared routines by number, with an A-command holding the address just before the jump.
+Those addresses are moved to where their instruction ends up. A numeric ROM address that is stored and jumped to
+later, instead of right away, cannot be told apart from a constant, so programs that do that must use labels. A
+program with computed jumps, such as returns, that never loads a label as data, as in HAL_input/PongL.asm, is taken
+to be jumping to numbers, and is left as it is.
+
+Programs with anything that could be an error, such as a symbol defined twice, or with jumps to EQU symbols or
+variables, are left as they are, so that every error is still reported and every address still means the same thing.
+
+Removing a load can remove the first use of a variable, and variables are allocated RAM in the order they are first
+used, so the assembler allocates the variables of an optimized program in the order of ram_variables() on the program
+as it was before it was optimized. Every variable keeps the address it would have had without optimizing, even if all
+of its uses were removed.
+"""
+from bisect import bisect_left
+
+from cfg_module import ControlFlowGraph
+from instruction_module import Instruction
+from symbol_table_module import PREDEFINED_SYMBOLS
+
+# The version of the optimizer, which is part of the build cache key of optimized programs. Bump this whenever a change
+# to the optimizer or to the control-flow graph's transformations could change the optimized output.
+OPTIMIZER_VERSION = 3
+
+# The largest address an A-command can hold.
+MAX_A_ADDRESS = 0x7FFF
+
+
+def unoptimizable_reason(program, labels):
+    """Return why the given parsed program cannot be optimized safely, or None if it can. labels is the set of labels
+    the program defines."""
+    previous = None
+    computed_jump = False
+    labels_taken = False
+    defined = set(PREDEFINED_SYMBOLS)
+    for instruction in program:
+        # Removing code could hide a label's errors, so labels that might have any are left alone.
+        if instruction.kind in ("L", "EQU"):
+            symbol = instruction.operand if instruction.kind == "L" else instruction.equ_label
+            if symbol in defined:
+                return f"line {instruction.line} defines {symbol} again"
+            defined.add(symbol)
+        # A jump after a label can be reached from elsewhere, with anything in A, so it is a computed jump, as it is in
+        # the control-flow graph, and a label loaded just before the label is kept in A as data.
+        if instruction.kind == "L":
+            if previous is not None and previous.kind == "A" and previous.operand in labels:
+                labels_taken = True
+            previous = None
+        if instruction.kind == "C":
+            if instruction.word is None:
+                return "it has an unsupported C-command"
+            # A jump goes to the address in A, which the A-command just before it loaded, or else was computed.
+            if instruction.jump != "null":
+                if previous is None or previous.kind != "A":
+                    computed_jump = True
+                elif previous.operand not in labels and not previous.operand.isdecimal():
+                    return f"line {instruction.line} jumps to {previous.operand}, which is not a label or a number"
+            # A label loaded for anything but a jump right after it is an address that can be stored and jumped to.
+            if previous is not None and previous.kind == "A" and previous.operand in labels \
+                    and instruction.jump == "null":
+                labels_taken = True
+        elif instruction.kind == "A":
+            operand = instruction.operand
+            if operand.isdecimal() and int(operand) > MAX_A_ADDRESS:
+                return f"line {instruction.line} has an address that is too large"
+            if not operand.isdecimal() and (not operand or operand[0] in "+-" or operand[0].isdigit()):
+                return f"line {instruction.line} has an address that is not a plain number or symbol"
+        elif instruction.kind == "EQU" and not instruction.operand.isdecimal():
+            return f"line {instruction.line} has an EQU value that is not a plain number"
+        if instruction.kind in ("A", "C"):
+            if previous is not None and previous.kind == "A" and previous.operand in labels and instruction.kind == "A":
+                labels_taken = True
+            previous = instruction
+    # Computed jumps in a program that never loads a label as data must go to numeric addresses, which could be moved.
+    if computed_jump and not labels_taken:
+        return "it has computed jumps, and no labels for them to go to"
+    return None
+
+
+def optimize_program(program):
+    """Return an (optimized program, report) tuple for a parsed program with no errors. The report is a dict of the
+    number of words before and after, the number of instructions removed for each reason, and the reason the program
+    was not optimized, or None.
+
+    Arguments:
+    program: A list of Instruction records from Parser.parse().
+    """
+    words_before = sum(1 for instruction in program if instruction.kind in ("A", "C"))
+    report = {"words_before": words_before, "words_after": words_before, "redundant_loads": 0, "dead_loads": 0,
+              "unreachable": 0, "threaded_jumps": 0, "fallthrough_jumps": 0, "dead_labels": 0, "skipped": None}
+    labels = {instruction.operand for instruction in program if instruction.kind == "L"}
+    reason = unoptimizable_reason(program, labels)
+    if reason is not None:
+        report["skipped"] = reason
+        return program, report
+
+    # Thread jumps through blocks that only jump on, remove the blocks that cannot run and the jumps to the next
+    # block, and then the labels that nothing loads any more.
+    graph = ControlFlowGraph(program)
+    report["threaded_jumps"] = graph.thread_jumps()
+    report["unreachable"] = graph.remove_unreachable()
+    report["fallthrough_jumps"] = graph.remove_fallthrough_jumps()
+    report["dead_labels"] = len(graph.remove_dead_labels())
+    entries = graph.program()
+    addresses = graph.addresses
+
+    # A label that is still loaded must still be defined, or the load would become a RAM variable.
+    kept_labels = {instruction.operand for instruction_idx, instruction in entries if instruction.kind == "L"}
+    for instruction_idx, instruction in entries:
+        if instruction.kind == "A" and instruction.operand in labels and instruction.operand not in kept_labels:
+            report["skipped"] = f"line {instruction.line} loads {instruction.operand}, which would be removed"
+            return program, report
+
+    # Find the numeric loads just before jumps, and the original ROM addresses they load.
+    target_loads = set()
+    previous_idx = None
+    for instruction_idx, instruction in entries:
+        if instruction.kind in ("A", "C"):
+            if instruction.kind == "C" and instruction.jump != "null" and previous_idx is not None \
+                    and program[previous_idx].kind == "A" and graph.operand(previous_idx).isdecimal():
+                target_loads.add(previous_idx)
+            previous_idx = instruction_idx
+    targets = {int(graph.operand(instruction_idx)) for instruction_idx in target_loads}
+
+    # Remove instructions in one pass, tracking what A holds. A is only known between places that can be jumped to.
+    # A numeric load just before a jump is a ROM address, so it is kept apart from the same number used as data.
+    kept = []
+    a_holds = None
+    unreachable = False
+    last_code = None
+    for instruction_idx, instruction in entries:
+        kind = instruction.kind
+        if kind == "EQU":
+            kept.append((instruction_idx, instruction))
+            continue
+        if kind == "L" or addresses[instruction_idx] in targets:
+            a_holds = None
+            unreachable = False
+            if kind == "L":
+                kept.append((instruction_idx, instruction))
+                continue
+        if unreachable:
+            report["unreachable"] += 1
+            continue
+
+        if kind == "A":
+            value = ("ROM", instruction.operand) if instruction_idx in target_loads else instruction.operand
+            if value == a_holds:
+                report["redundant_loads"] += 1
+                continue
+            if last_code is not None and kept[last_code][1].kind == "A":
+                del kept[last_code]
+                report["dead_loads"] += 1
+            a_holds = value
+        else:
+            if "A" in instruction.dest:
+                a_holds = None
+            if instruction.jump == "JMP":
+                unreachable = True
+        last_code = len(kept)
+        kept.append((instruction_idx, instruction))
+
+    # Move each numeric jump target to the new address of the first instruction kept at or after it.
+    kept_addresses = [addresses[instruction_idx] for instruction_idx, instruction in kept
+                      if instruction.kind in ("A", "C")]
+    optimized = []
+    for instruction_idx, instruction in kept:
+        if instruction_idx in target_loads:
+            new_address = bisect_left(kept_addresses, int(instruction.operand))
+            instruction = Instruction("A", instruction.line, f"@{new_address}", operand=str(new_address))
+        optimized.append(instruction)
+    report["words_after"] = len(kept_addresses)
+    return optimized, report
+
+
+def ram_variables(program):
+    """Return a list of a (symbol, line) pair for each symbol that the given parsed program loads but does not define,
+    and that is not predefined, in the order they are first used, with the line of the first use. These are the
+    symbols the assembler allocates RAM variables to."""
+    defined = set(PREDEFINED_SYMBOLS)
+    defined.update(instruction.operand if instruction.kind == "L" else instruction.equ_label
+                   for instruction in program if instruction.kind in ("L", "EQU"))
+    variables = {}
+    for instruction in program:
+        if instruction.kind == "A" and instruction.operand not in defined and not instruction.operand.isdecimal():
+            variables.setdefault(instruction.operand, instruction.line)
+    return list(variables.items())
+
+
+def format_optimization_report(report):
+    """Return a one-line summary of a report from optimize_program(), such as how many words were saved."""
+    if report["skipped"] is not None:
+        return f"Not optimized, since {report['skipped']}."
+    saved = report["words_before"] - report["words_after"]
+    return (f"Optimized {report['words_before']} words to {report['words_after']}, saving {saved}: "
+            f"{report['redundant_loads']} redundant loads, {report['dead_loads']} dead loads, "
+            f"{report['unreachable']} unreachable instructions, {report['fallthrough_jumps']} jumps to the next "
+            f"block, and {report['dead_labels']} dead labels removed, and {report['threaded_jumps']} jumps threaded.")
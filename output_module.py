@@ -0,0 +1,91 @@
+"""
+The output module writes and reads assembled programs.
+
+Words are kept as 16-bit integers in an array('H'). They can be written either as .hack text, one 16-character binary
+word per line, or as a raw ROM image, two bytes per word in little- or big-endian order. A ROM image is written with
+one bulk tofile() call, so simulators can mmap it or load it straight back into an array.
+
+assembler_dir: Returns the directory that binary_output/, symbol_tables/, and error_logs/ are in.
+"""
+import os
+import sys
+from array import array
+
+from encoder_module import render_hack_text
+
+
+def assembler_dir():
+    """Return the assembler's directory, which binary_output/, symbol_tables/, and error_logs/ are in. When the
+    assembler is run as a zipapp (see build_zipapp.py), this file is inside the archive, so the archive's directory is
+    returned instead."""
+    directory = os.path.split(os.path.abspath(__file__))[0]
+    if os.path.isfile(directory):
+        directory = os.path.split(directory)[0]
+    return directory
+
+
+# Memo of the .hack text line for each word value seen so far. Programs repeat a small set of words, so formatting each
+# value once and joining the memoized lines is several times faster than formatting every word. It holds at most 65536
+# entries.
+_hack_lines = {}
+
+
+def format_hack_text(words):
+    """Return the given integer words as .hack text, one 16-digit binary word per line."""
+    # Large word arrays are rendered with NumPy when it is available.
+    if isinstance(words, array) and words.typecode == 'H':
+        hack_text = render_hack_text(words)
+        if hack_text is not None:
+            return hack_text
+    hack_lines = _hack_lines
+    # The words may be a generator, and they might have to be gone through twice.
+    if not isinstance(words, (array, list, tuple)):
+        words = list(words)
+    try:
+        return "".join([hack_lines[word] for word in words])
+    except KeyError:
+        for word in set(words).difference(hack_lines):
+            hack_lines[word] = format(word, "016b") + "\n"
+        return "".join([hack_lines[word] for word in words])
+
+
+def write_hack_text(words, file_path):
+    """Write the given integer words to a .hack text file."""
+    with open(file_path, "w") as output_file:
+        output_file.write(format_hack_text(words))
+
+
+def write_rom_image(words, file_path, byte_order="little"):
+    """Write the given integer words to a raw ROM image file, two bytes per word in the given byte order ("little"
+    or "big"), with no header."""
+    if not isinstance(words, array) or words.typecode != 'H':
+        words = array('H', words)
+    if byte_order != sys.byteorder:
+        words = array('H', words)
+        words.byteswap()
+    with open(file_path, "wb") as output_file:
+        words.tofile(output_file)
+
+
+def read_rom_image(file_path, byte_order="little"):
+    """Read a raw ROM image file written by write_rom_image() and return its words as an array('H')."""
+    words = array('H')
+    with open(file_path, "rb") as input_file:
+        words.frombytes(input_file.read())
+    if byte_order != sys.byteorder:
+        words.byteswap()
+    return words
+
+
+def read_hack_text(file_path):
+    """Read a .hack text file and return its words as an array('H'). Blank lines are ignored."""
+    with open(file_path, "r") as input_file:
+        return array('H', (int(line, 2) for line in input_file if line.strip()))
+
+
+def read_program(file_path, byte_order="little"):
+    """Read the words of an assembled program from a .rom image, by its extension, or else from .hack text, and return
+    them as an array('H')."""
+    if file_path.endswith(".rom"):
+        return read_rom_image(file_path, byte_order)
+    return read_hack_text(file_path)
@@ -2,8 +2,50 @@
 The parser module exports the Parser class.
 
 Parser class: Opens XHAL .asm files and breaks XHAL assembly commands into their underlying fields and symbols.
+LazyPattern class: A class-level regular expression that is compiled the first time it is used.
+parse_c_command: Splits a C-command into its fields and encodes it, memoized across every program in the process.
+c_command_cache_info: Returns the hit and miss counts of the parse_c_command memo.
+translate_number: Translates an address, label, or EQU value from binary or hexadecimal to decimal.
+represents_int: Returns true if a string is translatable into an integer.
 """
-from error_checker import *
+import functools
+import re
+import time
+
+import config
+from code_module import Code
+from error_checker import ErrorChecker
+from instruction_module import Instruction
+
+
+class LazyPattern:
+    """
+    The LazyPattern class is a regular expression kept as a class attribute that is only compiled the first time it is
+    used, through the class or any instance of it. The compiled pattern then replaces it on the class, so every later
+    use is an ordinary attribute lookup. Patterns a run never needs, such as those for EQU directives or binary
+    literals in a program with neither, are never compiled, which keeps startup fast for small programs.
+
+    Methods:
+    __init__: Constructs the lazy pattern from a regular expression and flags.
+    __set_name__: Records the name of the class attribute the pattern is assigned to.
+    __get__: Compiles the pattern, replaces this object on the class with it, and returns it.
+    """
+
+    def __init__(self, pattern, flags=0):
+        """Construct the LazyPattern object, without compiling the pattern."""
+        self.pattern = pattern
+        self.flags = flags
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        """Record the name of the class attribute the pattern is assigned to."""
+        self.name = name
+
+    def __get__(self, instance, owner):
+        """Compile the pattern, replace this object on the class with the compiled pattern, and return it."""
+        compiled = re.compile(self.pattern, self.flags)
+        setattr(owner, self.name, compiled)
+        return compiled
 
 
 class Parser:
@@ -24,41 +66,70 @@ class Parser:
     strip_whitespace: Strips all whitespace out of a command.
     command_type: Sets the type of command (comment, blank, illegal, EQU, A, C, or L)
     translate_bin_hex: Translates binary and hexidecimal code and handles relevant errors.
+    parse: Parses every command once and returns the program as a tuple of Instruction records.
+    parse_stream: Lazily parses an iterable of lines, yielding Instruction records one at a time.
     reset_parser: Resets the index of the commands to 0. Used between passes of the assembler.
     strip_comments: Removes comments from commands.
     """
 
     # Initialize all regular expressions for the parser. Done at the class level so they don't have to be initialized
-    # more than once.
-    regex_a_command = re.compile(r'^@', flags=re.MULTILINE)
-    regex_c_command = re.compile(r'^.+=')
-    regex_c_jump_command = re.compile(r'(^.*;)')
-    regex_l_command = re.compile(r'(^\().*(\))')
-    regex_post_dest = re.compile(r'=.*')
-    regex_comp_pre_comp = re.compile(r'.*=')
-    regex_jump_pre_comp = re.compile(r';.*')
-    regex_pre_jump = re.compile(r'.*;')
-    regex_comment = re.compile(r'//.*')
-    regex_binary = re.compile(r'^0b|0B.*')
-    regex_hex = re.compile(r'^0x|0X.*')
-    regex_equ = re.compile(r'^.EQU\s.*\s.*')
-    regex_post_equ_symbol = re.compile(r'\s.*')
-    regex_pre_equ_address = re.compile(r'.*\s')
-
-    def __init__(self, input_file):
+    # more than once, and each is only compiled once it is first used.
+    # The lexer classifies a whitespace-stripped command with one match. Its branches are tried in the order the
+    # command types have always been checked in: a comment, an A-command, a C-command with a dest (any "=" after the
+    # first character), a C-command with a jump (any ";"), and an L-command (a "(" with a ")" after it). The name of
+    # the branch that matched is the command type. Plain A- and L-commands also have their symbol captured; anything
+    # after it, such as an inline comment, is captured separately and handled the slower, general way.
+    regex_lexer = LazyPattern(r"""
+        (?P<COMMENT>//)
+        | (?P<A>@(?P<address>[^/@]*)(?P<address_tail>.*))
+        | (?P<COMP>.+=)
+        | (?P<JUMP>.*;)
+        | (?P<L>\((?P<label>[^()/]*)\)(?P<label_tail>.*) | \(.*\))
+        """, re.VERBOSE)
+    # Split a comment-free C-command into its fields with one match: the dest is everything before the first "=" and
+    # the comp everything after the last one, or the comp is everything before the first ";" and the jump everything
+    # after the last one.
+    regex_comp_fields = LazyPattern(r'(?P<dest>[^=]*)=(?:.*=)?(?P<comp>[^=]*)')
+    regex_jump_fields = LazyPattern(r'(?P<comp>[^;]*);(?:.*;)?(?P<jump>[^;]*)')
+    regex_post_dest = LazyPattern(r'=.*')
+    regex_comp_pre_comp = LazyPattern(r'.*=')
+    regex_jump_pre_comp = LazyPattern(r';.*')
+    regex_pre_jump = LazyPattern(r'.*;')
+    regex_comment = LazyPattern(r'//.*')
+    regex_binary = LazyPattern(r'^0b|0B.*')
+    regex_hex = LazyPattern(r'^0x|0X.*')
+    regex_equ = LazyPattern(r'^.EQU\s.*\s.*')
+    # Symbols starting with one of these are translated from binary or hexadecimal, as regex_binary and regex_hex match.
+    bin_hex_prefixes = ("0b", "0B", "0x", "0X")
+    regex_post_equ_symbol = LazyPattern(r'\s.*')
+    regex_pre_equ_address = LazyPattern(r'.*\s')
+
+    # The number of regular expressions command_type() tests a command against before it finds each command type (and
+    # C-command subtype), for the stats. Only commands that start with any character followed by "EQU" are also tested
+    # against regex_equ.
+    command_type_regex_tests = {"BLANK": 0, "EQU": 1, "COMMENT": 1, "A": 1, "COMP": 1, "JUMP": 1, "L": 1,
+                                "COMMAND TYPE NOT DETECTED": 1}
+
+    def __init__(self, input_file, error_checker=None, lines=None, stats=None):
         """Construct the Parser object and open the given XHAL .asm input file to enable parsing of it. Then save that
         file as a list of commands to easily iterate over.
 
         Arguments:
         input_file: The XHAL .asm file to be parsed and translated into a .hack pseudo-binary machine language file.
+            May be None if the source lines are given directly instead.
+        error_checker: The ErrorChecker that parsing errors are recorded with. A new one is made if none is given.
+        lines: An optional iterable of XHAL source lines to parse instead of reading input_file.
+        stats: An optional AssemblyStats that the time spent in command_type() and the command types are counted in.
         """
-        # Open the file for parsing, and save the text as a list where each element is a line.
-        with open(input_file, 'r') as file:
-            self.command_list = file.readlines()
-
-        # Strip newlines from the command list. Does not remove blank lines at this time
-        # so that line numbers in error-reporting are accurate.
-        self.command_list = [line.strip() for line in self.command_list]
+        # Open the file for parsing, and save the text as a list where each element is a line with its newline
+        # stripped. Does not remove blank lines at this time so that line numbers in error-reporting are accurate.
+        if lines is None:
+            with open(input_file, 'r') as file:
+                self.command_list = [line.strip() for line in file]
+        else:
+            self.command_list = [line.strip() for line in lines]
+        self.error_checker = error_checker if error_checker is not None else ErrorChecker()
+        self.stats = stats
 
         # Initialize variables.
         self.command_idx = 0
@@ -70,6 +141,7 @@ class Parser:
         self.current_command_comp = None
         self.current_command_jump = None
         self.current_command_equ_label = None
+        self.current_command_match = None
 
     def has_more_commands(self):
         """Detect if there are more commands in the XHAL .asm input file. Return true if there are, and false
@@ -99,55 +171,45 @@ class Parser:
         EQU: An equate directive of the form .EQU symbol value
         COMMENT: A line with only a comment in it. Will be skipped over by the assembler.
         """
-        # Detect the current command type and set it based on the class-level compiled regular expressions.
+        # Detect the current command type with the class-level lexer, keeping the match for its captured fields.
         if not self.current_command.strip():    # If command is blank
             self.current_command_type = "BLANK"
             return
 
-        if self.regex_equ.match(self.current_command):
+        if self.current_command[1:4] == "EQU" and self.regex_equ.match(self.current_command):
             self.current_command_type = "EQU"
             return
         else:
-            self.strip_whitespace()     # Strip whitespace if the command type is not EQU, since we won't need it.
+            # Strip whitespace if the command type is not EQU, since we won't need it (strip_whitespace(), inlined).
+            self.current_command = self.current_command.replace(" ", "")
 
-        if self.regex_comment.match(self.current_command):
-            self.current_command_type = "COMMENT"
-        elif self.regex_a_command.match(self.current_command):
-            self.current_command_type = "A"
-        elif self.regex_c_command.match(self.current_command):
-            self.current_command_type = "C"
-            self.current_command_subtype = "COMP"
-        elif self.regex_c_jump_command.match(self.current_command):
+        self.current_command_match = self.regex_lexer.match(self.current_command)
+        if self.current_command_match is None:
+            self.current_command_type = "COMMAND TYPE NOT DETECTED"
+            return
+        command_type = self.current_command_match.lastgroup
+        if command_type == "COMP" or command_type == "JUMP":
             self.current_command_type = "C"
-            self.current_command_subtype = "JUMP"
-        elif self.regex_l_command.match(self.current_command):
-            self.current_command_type = "L"
+            self.current_command_subtype = command_type
         else:
-            self.current_command_type = "COMMAND TYPE NOT DETECTED"
+            self.current_command_type = command_type
 
     def translate_bin_hex(self, content, line):
         """Detect if the content of the command is written in binary or hexidecimal, then translate and redefine the
         content into decimal and return that value."""
-        if self.regex_binary.match(content):
-            print("Binary detected! Translating....")
-            stripped_content = content.replace('0b', '').replace('0B', '')
-            try:
-                return str(int(stripped_content, 2))
-            except ValueError:
-                record_invalid_bin_error(stripped_content, line)    # Record error if binary content is invalid.
-                return "ERROR"
-        elif self.regex_hex.match(self.current_command_content):
-            print("Hex detected! Translating....")
-            stripped_content = self.current_command_content.replace('0x', '').replace('0X', '')
-            try:
-                return str(int(stripped_content, 16))
-            except ValueError:
-                record_invalid_hex_error(stripped_content, line)    # Record error if hex content is invalid.
-                return "ERROR"
-
+        number, base, digits = translate_number(content)
         # No binary or hexadecimal is detected, so return the content unchanged.
-        else:
+        if base is None:
             return content
+        self.error_checker.trace(f"{'Binary' if base == 2 else 'Hex'} detected! Translating....", line)
+        if number is None:
+            # Record an error if the binary or hexadecimal content is invalid.
+            if base == 2:
+                self.error_checker.record_invalid_bin_error(digits, line)
+            else:
+                self.error_checker.record_invalid_hex_error(digits, line)
+            return "ERROR"
+        return number
 
     def symbol(self, line):
         """Set the symbol or decimal XXX of the current command, where the command is either an A_Command of the form
@@ -166,7 +228,7 @@ class Parser:
             self.current_command_content = self.current_command.replace("(", "").replace(")", "")
             self.current_command_content = self.translate_bin_hex(self.current_command_content, line)
         else:
-            print("ERROR!")
+            self.error_checker.trace(f"No symbol to read in '{self.current_command}'.", line)
 
     def dest(self):
         """Return the dest mnemonic string (one of 8 possible) in the current C_Command. Will only be called when
@@ -195,6 +257,71 @@ class Parser:
         # the jump portion of the command.
         self.current_command_jump = re.sub(self.regex_pre_jump, "", self.current_command)
 
+    def parse(self):
+        """Parse every line of the input exactly once and return the program as a tuple of immutable Instruction
+        records. Blank lines, comments, and undetected commands produce no record, and commands with formatting errors
+        are recorded as errors and dropped. The parser is reset afterward."""
+        instructions = tuple(self.parse_stream(self.command_list))
+        self.reset_parser()
+        return instructions
+
+    def parse_stream(self, lines, first_line=1):
+        """Lazily parse an iterable of XHAL source lines, yielding an Instruction record for each A, C, or L command
+        or EQU directive as soon as its line is read. Lines are numbered from first_line for error reporting, so a
+        range of lines from the middle of a file can be parsed on its own. This lets input be parsed without holding
+        the whole file in memory."""
+        stats = self.stats
+        for current_line, command in enumerate(lines, first_line):
+            self.current_command = command.strip()
+            self.error_checker.check_comment_formatting_warning(self.current_command, current_line)
+            if stats is None:
+                self.command_type()
+            else:
+                start_time = time.perf_counter()
+                self.command_type()
+                stats.add_time("command_type", time.perf_counter() - start_time)
+                command_type = self.current_command_type
+                if command_type == "C":
+                    stats.count("command_type_regex_tests", self.command_type_regex_tests[self.current_command_subtype])
+                else:
+                    stats.count("command_type_regex_tests", self.command_type_regex_tests[command_type])
+                stats.count(f"lines.{command_type}")
+            if self.current_command_type == "EQU":
+                self.error_checker.check_illegal_equ_format_error(self.current_command, current_line)
+                self.symbol(current_line)
+                # If a binary or hex format error was detected, the error has been recorded, so skip the line.
+                if self.current_command_content == "ERROR":
+                    continue
+                yield Instruction("EQU", current_line, self.current_command, operand=self.current_command_content,
+                                  equ_label=self.current_command_equ_label)
+            elif self.current_command_type == "A":
+                # A plain A-command has its address captured by the lexer. Anything else, such as one with an inline
+                # comment, is taken apart the general way.
+                address = self.current_command_match["address"]
+                if self.current_command_match["address_tail"]:
+                    self.strip_comments()
+                    address = self.current_command.replace("@", "")
+                if address.startswith(self.bin_hex_prefixes):
+                    address = self.translate_bin_hex(address, current_line)
+                    if address == "ERROR":
+                        continue
+                yield Instruction("A", current_line, self.current_command, operand=address)
+            elif self.current_command_type == "L":
+                label = self.current_command_match["label"]
+                if label is None or self.current_command_match["label_tail"]:
+                    if self.error_checker.check_l_type_text_after_paren_error(self.current_command, current_line):
+                        continue
+                    self.strip_comments()
+                    label = self.current_command.replace("(", "").replace(")", "")
+                if label.startswith(self.bin_hex_prefixes):
+                    label = self.translate_bin_hex(label, current_line)
+                    if label == "ERROR":
+                        continue
+                yield Instruction("L", current_line, self.current_command, operand=label)
+            elif self.current_command_type == "C":
+                text, dest, comp, jump, word = parse_c_command(self.current_command, self.current_command_subtype)
+                yield Instruction("C", current_line, text, dest=dest, comp=comp, jump=jump, word=word)
+
     def reset_parser(self):
         """Reset the command index of the parser so that the assembler can run through the XHAL code multiple times."""
         self.command_idx = 0
@@ -205,3 +332,65 @@ class Parser:
         comment_text = self.regex_comment.search(self.current_command)
         if comment_text is not None:
             self.current_command = self.current_command.replace(comment_text[0], "")
+
+
+# The code translator used to encode memoized C-commands. Its tables are only ever read, so it can be shared.
+_c_command_code = Code()
+
+
+@functools.lru_cache(maxsize=config.C_COMMAND_CACHE_SIZE)
+def parse_c_command(command, subtype):
+    """Split a whitespace-stripped C-command of the given subtype ("COMP" or "JUMP") into its fields and encode it.
+    Return a (text, dest, comp, jump, word) tuple, where text is the command with any inline comment removed and word
+    is None if any of the mnemonics is unsupported.
+
+    Real programs repeat a small set of C-commands thousands of times, so the results are kept in a bounded LRU memo
+    shared by every Parser in the process. A repeated command is then a single lookup, with no regular expressions
+    run at all. The memo's size is set by config.C_COMMAND_CACHE_SIZE.
+    """
+    comment_start = command.find("//")
+    if comment_start != -1:
+        command = command[:comment_start]
+    # The "=" or ";" that set the subtype may have been in the comment. Then both fields are the whole command.
+    if subtype == "COMP":
+        fields = Parser.regex_comp_fields.match(command)
+        dest, comp = (command, command) if fields is None else (fields["dest"], fields["comp"])
+        jump = "null"
+    else:
+        dest = "null"  # Dest fields for jumps are null and will translate to 000.
+        fields = Parser.regex_jump_fields.match(command)
+        comp, jump = (command, command) if fields is None else (fields["comp"], fields["jump"])
+    return command, dest, comp, jump, _c_command_code.c_word_table.get((dest, comp, jump))
+
+
+def c_command_cache_info():
+    """Return the hits, misses, maximum size, and current size of the parse_c_command memo, as a named tuple."""
+    return parse_c_command.cache_info()
+
+
+def translate_number(content):
+    """Return a (number, base, digits) tuple for an A-command address, label, or EQU value. number is the content
+    translated from binary or hexadecimal to decimal, the content itself if it is neither, or None if its binary or
+    hexadecimal digits are improper. base is 2 or 16, or None if the content is neither, and digits is the content
+    without its prefix. Parser.translate_bin_hex() and the linter both translate with this."""
+    if Parser.regex_binary.match(content):
+        base, digits = 2, content.replace('0b', '').replace('0B', '')
+    elif Parser.regex_hex.match(content):
+        base, digits = 16, content.replace('0x', '').replace('0X', '')
+    else:
+        return content, None, content
+    try:
+        return str(int(digits, base)), base, digits
+    except ValueError:
+        return None, base, digits
+
+
+# Idea from
+# https://stackoverflow.com/questions/1265665/how-can-i-check-if-a-string-represents-an-int-without-using-try-except
+def represents_int(string):
+    """Return true if the given string is translatable into an integer and false otherwise."""
+    try:
+        int(string)
+        return True
+    except ValueError:
+        return False
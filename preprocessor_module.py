@@ -0,0 +1,409 @@
+"""
+The preprocessor module exports the Preprocessor class, which expands .INCLUDE directives and macros while parsing.
+
+SourceLine class: A line number that also records the file and the macro use it came from.
+line_to_json: Returns a line number, SourceLine or not, as a value that can be saved as JSON.
+line_from_json: Returns the line number saved by line_to_json(), as a SourceLine again if it was one.
+Macro class: One macro defined with .MACRO and .ENDM.
+Preprocessor class: Parses an XHAL program into Instruction records, expanding includes and macros on the way.
+include_cache_info: Returns the hit and miss counts of the included-file cache.
+include_dependencies: Returns the files a program includes and their modification times, for build cache keys.
+has_directives: Returns true if any of a program's lines is an .INCLUDE or .MACRO directive.
+
+XHAL programs can share code with two directives, each on a line of its own:
+- .INCLUDE "file" parses another XHAL file into the program at that point. The path is relative to the directory of
+  the file that includes it.
+- .MACRO NAME param, param ... starts a macro, and .ENDM ends it. Each later line that starts with the macro's name,
+  such as NAME arg, arg, is replaced by the lines in between, with every %param replaced by its argument. %% is
+  replaced by a suffix unique to each use of the macro, for labels such as (LOOP%%).
+
+An included file is preprocessed on its own, with only the macros it defines or includes itself, and the macros it
+defines can be used after the .INCLUDE line. Each included file is parsed into Instruction records only once per
+process, and the records are reused by every program that includes it, for as long as neither the file nor anything
+it includes has been modified. A modified file replaces its old entry, and the cache holds at most
+config.INCLUDE_CACHE_SIZE files, dropping the least recently used, so a long-running process such as daemon.py does
+not keep every file it has ever seen. Lines from included files and macros keep their own line numbers, as SourceLine
+objects, so that errors are reported on the line and in the file where they are.
+
+Programs with neither directive are parsed by the Parser directly.
+"""
+import os
+import re
+import zlib
+from collections import OrderedDict
+
+import config
+from error_checker import ErrorChecker
+from instruction_module import Instruction
+from parser_module import LazyPattern, Parser
+
+# The deepest macros can be used inside other macros, to stop macros that use themselves.
+MAX_MACRO_DEPTH = 16
+
+# The most ordinary lines parsed at once between directives, which bounds the memory used by parse_stream().
+RUN_LENGTH = 4096
+
+# Included files parsed so far, by absolute path, least recently used first, and the cache's hit and miss counts.
+_include_cache = OrderedDict()
+_include_cache_counts = {"hits": 0, "misses": 0}
+
+
+class SourceLine(int):
+    """
+    The SourceLine class is the line number of a line from an included file or a macro. It is an int, so it compares,
+    sorts, and is saved to JSON like any other line number, but it is written with the name of its file and the line
+    the macro was used on.
+
+    Attributes:
+    file: The path of the included file the line is in, or None if it is in the program's own file.
+    expansion: The line number that the macro the line is in was used on, or None if it is not in a macro.
+    """
+
+    def __new__(cls, line, file=None, expansion=None):
+        source_line = super().__new__(cls, line)
+        source_line.file = file
+        source_line.expansion = expansion
+        return source_line
+
+    def __str__(self):
+        text = f"{int(self)}" if self.file is None else f"{int(self)} of {os.path.basename(self.file)}"
+        if self.expansion is not None:
+            text += f" (in a macro used on line {self.expansion})"
+        return text
+
+
+def line_to_json(line):
+    """Return the given line number as a value that can be saved as JSON: a plain int, or for a SourceLine, a dict of
+    its line number, file, and macro use, which is itself saved the same way."""
+    if not isinstance(line, SourceLine):
+        return line
+    return {"line": int(line), "file": line.file, "expansion": line_to_json(line.expansion)}
+
+
+def line_from_json(value):
+    """Return the line number saved by line_to_json(), rebuilding it as a SourceLine if it was one."""
+    if not isinstance(value, dict):
+        return value
+    return SourceLine(value["line"], value["file"], line_from_json(value["expansion"]))
+
+
+class Macro:
+    """
+    The Macro class is one macro defined with .MACRO and .ENDM.
+
+    Attributes:
+    name: The name the macro is used by.
+    params: The names of its parameters, in order.
+    body: The source lines between .MACRO and .ENDM.
+    first_line: The line number of the first line of the body.
+    file: The path of the included file the macro is defined in, or None if it is in the program's own file.
+    """
+
+    __slots__ = ("name", "params", "body", "first_line", "file")
+
+    def __init__(self, name, params, body, first_line, file):
+        self.name = name
+        self.params = params
+        self.body = body
+        self.first_line = first_line
+        self.file = file
+
+
+class IncludedFile:
+    """
+    The IncludedFile class is the cached result of preprocessing one included file.
+
+    Attributes:
+    instructions: The tuple of Instruction records the file parses into, with its includes and macros expanded.
+    diagnostics: The (severity, line, message) diagnostics found while preprocessing it.
+    macros: The macros it defines or includes, by name.
+    dependencies: A list of the (path, modification time) of the file and of every file it includes.
+    """
+
+    __slots__ = ("instructions", "diagnostics", "macros", "dependencies")
+
+    def __init__(self, instructions, diagnostics, macros, dependencies):
+        self.instructions = instructions
+        self.diagnostics = diagnostics
+        self.macros = macros
+        self.dependencies = dependencies
+
+
+def file_stamp(path):
+    """Return the modification time of the given file in nanoseconds, or None if it cannot be read."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def include_cache_info():
+    """Return a dict of the included-file cache's hits, misses, and the number of files in it."""
+    return dict(_include_cache_counts, files=len(_include_cache))
+
+
+class Preprocessor:
+    """
+    The Preprocessor class parses one XHAL program into Instruction records, like Parser.parse(), expanding .INCLUDE
+    directives and macros along the way. Lines without directives or macros are handed to a Parser in runs, so they
+    are parsed exactly as before.
+
+    Methods:
+    __init__: Constructs the preprocessor for a file or a list of source lines.
+    parse: Returns the program as a tuple of Instruction records.
+    parse_stream: Lazily parses an iterable of source lines, yielding Instruction records.
+    dependencies: Returns the (path, modification time) of every file the program includes.
+    """
+
+    # A directive, with its name and arguments, and the use of a macro, with its name and arguments. Either can have an
+    # inline comment after it. Programs without directives never compile these.
+    regex_directive = LazyPattern(r'\s*\.(?P<name>INCLUDE|MACRO|ENDM)\b\s*(?P<args>.*?)\s*(?://.*)?$')
+    regex_include_path = LazyPattern(r'"(?P<path>[^"]+)"')
+    regex_macro_use = LazyPattern(r'\s*(?P<name>[A-Za-z_.$:][\w.$:]*)(?:\s+(?P<args>.*?))?\s*(?://.*)?$')
+    regex_macro_param = LazyPattern(r'%(%|\w+)')
+
+    def __init__(self, input_file, error_checker=None, lines=None, stats=None, included=False):
+        """Construct the Preprocessor object.
+
+        Arguments:
+        input_file: The XHAL .asm file to parse. May be None if the source lines are given directly instead.
+        error_checker: The ErrorChecker that errors are recorded with. A new one is made if none is given.
+        lines: An optional iterable of XHAL source lines to parse instead of reading input_file.
+        stats: An optional AssemblyStats passed on to the Parser.
+        included: Whether the file is being included in another, so that its line numbers name it.
+        """
+        if lines is None:
+            with open(input_file, 'r') as file:
+                lines = list(file)
+        self.lines = lines if isinstance(lines, list) else list(lines)
+        self.input_file = input_file
+        self.error_checker = error_checker if error_checker is not None else ErrorChecker()
+        self.stats = stats
+        self.file = os.path.abspath(input_file) if included else None
+        self.base_dir = os.path.dirname(os.path.abspath(input_file)) if input_file is not None else os.getcwd()
+        self.macros = {}
+        self.included = []  # The IncludedFile records of the files included directly.
+        self.active_files = (self.file,) if included else (os.path.abspath(input_file) if input_file else None,)
+
+    def parse(self):
+        """Parse the whole program, expanding includes and macros, and return it as a tuple of Instruction records."""
+        if not has_directives(self.lines):
+            return Parser(None, self.error_checker, lines=self.lines, stats=self.stats).parse()
+        return tuple(self.expand(self.lines, 1, self.file, None, 0))
+
+    def parse_stream(self, lines):
+        """Lazily parse an iterable of XHAL source lines, like Parser.parse_stream(), yielding each Instruction record
+        with includes and macros expanded. Only the macros and a run of ordinary lines are held in memory at a time.
+        The lines given to the constructor are not used."""
+        return self.expand(lines, 1, self.file, None, 0)
+
+    def dependencies(self):
+        """Return a list of the (path, modification time) of every file the program includes, directly or not. It is
+        only complete once parse() has been called."""
+        return [dependency for included in self.included for dependency in included.dependencies]
+
+    def expand(self, lines, first_line, file, expansion, depth):
+        """Yield the Instruction records for the given lines, numbered from first_line, of the given file (None for the
+        program's own) and macro use (the line number the macro was used on, or None). lines may be any iterable, and
+        is read lazily, with ordinary lines parsed in runs of at most RUN_LENGTH lines, so that a program streamed in
+        is never held in memory whole."""
+        run = []
+        run_start = first_line
+        numbered_lines = enumerate(lines, first_line)
+        for line_number, line in numbered_lines:
+            directive = self.regex_directive.match(line) if line.lstrip().startswith(".") else None
+            macro_use = self.regex_macro_use.match(line) if self.macros and directive is None else None
+            if directive is None and (macro_use is None or macro_use["name"] not in self.macros):
+                if not run:
+                    run_start = line_number
+                run.append(line)
+                if len(run) >= RUN_LENGTH:
+                    yield from self.parse_run(run, run_start, file, expansion)
+                    run = []
+                continue
+
+            # Parse the ordinary lines before the directive or macro, then handle it.
+            yield from self.parse_run(run, run_start, file, expansion)
+            run = []
+            location = self.location(line_number, file, expansion)
+            if directive is None:
+                yield from self.expand_macro(macro_use["name"], macro_use["args"], location, depth)
+            elif directive["name"] == "INCLUDE":
+                if expansion is not None:
+                    self.error_checker.write_error(location, f"'{line.strip()}' is inside a macro.\nFiles can only be "
+                                                             f"included outside of macros.")
+                else:
+                    yield from self.include(directive["args"], line, location)
+            elif directive["name"] == "MACRO":
+                if expansion is not None:
+                    self.error_checker.write_error(location, "Macros cannot be defined inside other macros.")
+                # The body is every line up to the matching .ENDM.
+                body = []
+                ended = False
+                for _, body_line in numbered_lines:
+                    if body_line.lstrip().startswith(".ENDM"):
+                        ended = True
+                        break
+                    body.append(body_line)
+                if not ended:
+                    self.error_checker.write_error(location, f"'{line.strip()}' has no matching .ENDM.")
+                elif expansion is None:
+                    self.define_macro(directive["args"], body, line_number + 1, file, location)
+            else:
+                self.error_checker.write_error(location, ".ENDM does not end a macro, since there is no .MACRO "
+                                                         "before it.")
+        yield from self.parse_run(run, run_start, file, expansion)
+
+    @staticmethod
+    def location(line, file, expansion):
+        """Return the line number to report for the given line of the given file and macro use."""
+        if file is None and expansion is None:
+            return line
+        return SourceLine(line, file, expansion)
+
+    def parse_run(self, lines, first_line, file, expansion):
+        """Parse a run of ordinary lines with the Parser and return its Instruction records. Lines from included files
+        or macros are parsed with an error checker of their own, and their line numbers and diagnostics are then
+        changed to SourceLine numbers."""
+        if not lines:
+            return []
+        if file is None and expansion is None:
+            return list(Parser(None, self.error_checker, lines=(), stats=self.stats).parse_stream(lines, first_line))
+        run_checker = ErrorChecker(None, "silent", 0)
+        instructions = []
+        for instruction in Parser(None, run_checker, lines=()).parse_stream(lines, first_line):
+            instructions.append(Instruction(instruction.kind, SourceLine(instruction.line, file, expansion),
+                                            instruction.text, instruction.operand, instruction.equ_label,
+                                            instruction.dest, instruction.comp, instruction.jump, instruction.word))
+        self.replay(run_checker.diagnostics, file, expansion)
+        return instructions
+
+    def replay(self, diagnostics, file=None, expansion=None):
+        """Record the given diagnostics with this program's error checker, in order, changing their line numbers to
+        SourceLine numbers of the given file and macro use, if any."""
+        for severity, line, content in diagnostics:
+            if (file is not None or expansion is not None) and not isinstance(line, SourceLine):
+                line = SourceLine(line, file, expansion)
+            if severity == "ERROR":
+                self.error_checker.write_error(line, content)
+            else:
+                self.error_checker.write_warning(line, content)
+
+    def include(self, args, line, location):
+        """Return the Instruction records of the file named by an .INCLUDE directive's arguments, and add the macros it
+        defines. The file is preprocessed and cached the first time, and the cached records are reused after that."""
+        path_match = self.regex_include_path.fullmatch(args)
+        if path_match is None:
+            self.error_checker.write_error(location, f"'{line.strip()}' is not a properly-formatted .INCLUDE directive."
+                                                     f"\nA properly-formatted .INCLUDE directive is like .INCLUDE "
+                                                     f"\"file\", followed by an optional comment.")
+            return []
+        path = os.path.abspath(os.path.join(self.base_dir, path_match["path"]))
+        if path in self.active_files:
+            self.error_checker.write_error(location, f"'{line.strip()}' includes a file that is already being "
+                                                     f"included, which would never end.")
+            return []
+        included = load_include(path, self.active_files)
+        if included is None:
+            self.error_checker.write_error(location, f"'{line.strip()}' names a file that could not be read.")
+            return []
+        self.included.append(included)
+        self.macros.update(included.macros)
+        self.replay(included.diagnostics)
+        return list(included.instructions)
+
+    def define_macro(self, args, body, first_line, file, location):
+        """Define a macro from its .MACRO directive's arguments and its body lines."""
+        name, _, params = args.partition(" ")
+        params = [param.strip() for param in params.split(",")] if params.strip() else []
+        if not re.fullmatch(r'[A-Za-z_.$:][\w.$:]*', name) or not all(re.fullmatch(r'\w+', param) for param in params):
+            self.error_checker.write_error(location, f"'.MACRO {args}' is not a properly-formatted .MACRO directive.\n"
+                                                     f"A properly-formatted .MACRO directive is like .MACRO name param,"
+                                                     f" param, followed by an optional comment.")
+            return
+        self.macros[name] = Macro(name, params, body, first_line, file)
+
+    def expand_macro(self, name, args, location, depth):
+        """Return the Instruction records of one use of a macro, on the line numbered location."""
+        macro = self.macros[name]
+        args = [arg.strip() for arg in args.split(",")] if args else []
+        if len(args) != len(macro.params):
+            self.error_checker.write_error(location, f"{name} takes {len(macro.params)} argument(s), but was given "
+                                                     f"{len(args)}.")
+            return []
+        if depth >= MAX_MACRO_DEPTH:
+            self.error_checker.write_error(location, f"{name} is used inside more than {MAX_MACRO_DEPTH} other "
+                                                     f"macros, so it may be using itself.")
+            return []
+
+        # Each use of a macro gets its own %% suffix from where it was used, which is the same every time the
+        # program is assembled.
+        values = dict(zip(macro.params, args))
+        values["%"] = "$" + unique_suffix(location)
+
+        def substitute(param_match):
+            return values.get(param_match[1], param_match[0])
+        body = [self.regex_macro_param.sub(substitute, body_line) for body_line in macro.body]
+        return self.expand(body, macro.first_line, macro.file, location, depth + 1)
+
+
+def unique_suffix(location):
+    """Return a label suffix unique to the given line, from its line number and those of any macros it is in, and a
+    checksum of its file's path if it is in an included file."""
+    parts = []
+    while location is not None:
+        file = getattr(location, "file", None)
+        parts.append(f"{int(location)}" if file is None else f"{zlib.crc32(file.encode()):08x}:{int(location)}")
+        location = getattr(location, "expansion", None)
+    return ".".join(reversed(parts))
+
+
+def load_include(path, active_files=()):
+    """Return the IncludedFile for the file at the given absolute path, from the cache if neither it nor anything it
+    includes has been modified since it was cached, or else by preprocessing it and caching the result. Return None
+    if the file cannot be read."""
+    cached = _include_cache.get(path)
+    if cached is not None and all(file_stamp(dependency) == stamp for dependency, stamp in cached.dependencies):
+        _include_cache_counts["hits"] += 1
+        _include_cache.move_to_end(path)
+        return cached
+    _include_cache_counts["misses"] += 1
+    # The old entry is out of date, so it is dropped even if the file can no longer be read.
+    _include_cache.pop(path, None)
+    stamp = file_stamp(path)
+    try:
+        preprocessor = Preprocessor(path, ErrorChecker(None, "silent", 0), included=True)
+    except (OSError, UnicodeDecodeError):
+        return None
+    preprocessor.active_files = tuple(active_files) + (path,)
+    instructions = tuple(preprocessor.expand(preprocessor.lines, 1, path, None, 0))
+    included = IncludedFile(instructions, preprocessor.error_checker.diagnostics, preprocessor.macros,
+                            [(path, stamp)] + preprocessor.dependencies())
+    _include_cache[path] = included
+    while len(_include_cache) > config.INCLUDE_CACHE_SIZE:
+        _include_cache.popitem(last=False)
+    return included
+
+
+def include_dependencies(input_file, lines):
+    """Return a list of the (path, modification time) of every file that the given source lines include, directly or
+    not, for build cache keys. The included files are preprocessed and cached on the way, if they are not already."""
+    base_dir = os.path.dirname(os.path.abspath(input_file)) if input_file is not None else os.getcwd()
+    dependencies = []
+    for line in lines:
+        if not line.lstrip().startswith(".INCLUDE"):
+            continue
+        directive = Preprocessor.regex_directive.match(line)
+        path_match = Preprocessor.regex_include_path.fullmatch(directive["args"]) if directive is not None else None
+        if path_match is None:
+            continue
+        path = os.path.abspath(os.path.join(base_dir, path_match["path"]))
+        included = load_include(path)
+        dependencies.extend([(path, None)] if included is None else included.dependencies)
+    return dependencies
+
+
+def has_directives(lines):
+    """Return true if any of the given source lines is an .INCLUDE or .MACRO directive, which the Parser alone cannot
+    handle."""
+    return any(line.lstrip().startswith((".INCLUDE", ".MACRO")) for line in lines)
@@ -0,0 +1,296 @@
+"""
+The simulator module runs assembled Hack programs, to check that they behave as intended.
+
+The simulated computer has a 32K-word ROM, a 32K-word RAM, and the screen and keyboard memory maps at the SCREEN and
+KBD addresses of the predefined symbols. Programs are loaded from the assembler's words, a .hack file, or a ROM image.
+
+Every ROM word is decoded once, when the program is loaded, into a dispatch table. A-command words are kept in it as
+the int to load into A. Each C-command word becomes a handler function generated for that word alone, which computes
+its one comp, stores to its dest registers, and returns the next PC, so running the program does no bit-field
+extraction. Handlers are generated once per distinct word and shared between simulators.
+
+If the assembler wrote a debug map next to the program (see main.py --debug-map), or one is given with --debug-map,
+the source line the program stopped at is reported with its PC.
+
+Usage: python simulator.py <.hack or .rom file> [--cycles N | --until-halt [--max-cycles N]] [--dump START:END]
+                           [--byte-order little|big] [--debug-map FILE]
+"""
+import argparse
+import os
+import time
+
+import config
+from code_module import Code
+from output_module import read_program
+from symbol_table_module import PREDEFINED_SYMBOLS
+
+ROM_SIZE = 32768
+RAM_SIZE = 32768
+SCREEN = PREDEFINED_SYMBOLS["SCREEN"]
+KBD = PREDEFINED_SYMBOLS["KBD"]
+
+# Python expressions for the comp mnemonics of the Code class, in terms of the D register d, the A register a, and the
+# selected RAM word m, kept to 16 bits. Any other comp code is computed from the ALU control bits instead.
+COMP_EXPRESSIONS = {
+    "0": "0",
+    "1": "1",
+    "-1": "0xFFFF",
+    "D": "d",
+    "A": "a",
+    "!D": "d ^ 0xFFFF",
+    "!A": "a ^ 0xFFFF",
+    "-D": "-d & 0xFFFF",
+    "-A": "-a & 0xFFFF",
+    "D+1": "(d + 1) & 0xFFFF",
+    "A+1": "(a + 1) & 0xFFFF",
+    "D-1": "(d - 1) & 0xFFFF",
+    "A-1": "(a - 1) & 0xFFFF",
+    "D+A": "(d + a) & 0xFFFF",
+    "D-A": "(d - a) & 0xFFFF",
+    "A-D": "(a - d) & 0xFFFF",
+    "D&A": "d & a",
+    "D|A": "d | a"
+}
+COMP_EXPRESSIONS.update({mnemonic.replace("A", "M"): expression.replace("a", "m")
+                         for mnemonic, expression in list(COMP_EXPRESSIONS.items()) if "A" in mnemonic})
+
+# Python conditions on the 16-bit comp result, out, for each jump mnemonic. Results of 0x8000 and above are negative.
+JUMP_CONDITIONS = {
+    "JGT": "0 < out < 0x8000",
+    "JEQ": "out == 0",
+    "JGE": "out < 0x8000",
+    "JLT": "out >= 0x8000",
+    "JNE": "out != 0",
+    "JLE": "out == 0 or out >= 0x8000",
+    "JMP": "True"
+}
+
+# Handler functions generated so far, by C-command word, and the mnemonic codes they are decoded with.
+_handlers = {}
+_code = Code()
+
+
+class Halted(Exception):
+    """Raised by the handler placed on a halt loop to stop Simulator.run_until_halt()."""
+
+
+def alu_expression(comp_code):
+    """Return a Python expression for the Hack ALU with the given 7-bit comp code (a, zx, nx, zy, ny, f, no)."""
+    x = "d"
+    y = "m" if comp_code & 0b1000000 else "a"
+    if comp_code & 0b0100000:
+        x = "0"
+    if comp_code & 0b0010000:
+        x = f"({x} ^ 0xFFFF)"
+    if comp_code & 0b0001000:
+        y = "0"
+    if comp_code & 0b0000100:
+        y = f"({y} ^ 0xFFFF)"
+    out = f"(({x} + {y}) & 0xFFFF)" if comp_code & 0b0000010 else f"({x} & {y})"
+    if comp_code & 0b0000001:
+        out = f"({out} ^ 0xFFFF)"
+    return out
+
+
+def c_handler(word):
+    """Return the handler function for the given C-command word. A handler takes the RAM list and the A, D, and PC
+    registers, does the command, and returns the new (A, D, PC)."""
+    handler = _handlers.get(word)
+    if handler is not None:
+        return handler
+    comp_code = word >> 6 & 0b1111111
+    comp = next((mnemonic for mnemonic, bits in _code.comp_bits.items() if bits >> 6 == comp_code), None)
+    expression = COMP_EXPRESSIONS[comp] if comp is not None else alu_expression(comp_code)
+    jump = next(mnemonic for mnemonic, bits in _code.jump_bits.items() if bits == word & 0b111)
+
+    # The M register is the RAM word that A held the address of before the command, and a jump goes to that A too.
+    lines = []
+    if "m" in expression:
+        lines.append("m = ram[a & 0x7FFF]")
+    lines.append(f"out = {expression}")
+    if word & 0b001000:
+        lines.append("ram[a & 0x7FFF] = out")
+    if jump == "JMP":
+        lines.append("pc = a & 0x7FFF")
+    elif jump != "null":
+        lines.append(f"pc = a & 0x7FFF if {JUMP_CONDITIONS[jump]} else pc + 1")
+    else:
+        lines.append("pc += 1")
+    if word & 0b100000:
+        lines.append("a = out")
+    if word & 0b010000:
+        lines.append("d = out")
+    lines.append("return a, d, pc")
+    source = "def handler(ram, a, d, pc):\n" + "".join(f"    {line}\n" for line in lines)
+    namespace = {}
+    exec(source, namespace)
+    handler = _handlers[word] = namespace["handler"]
+    return handler
+
+
+def halt_handler(ram, a, d, pc):
+    """The handler placed on the first word of a halt loop."""
+    raise Halted()
+
+
+class Simulator:
+    """
+    The Simulator class is one Hack computer with a program loaded into its ROM.
+
+    A halt loop is the usual way a Hack program ends: an A-command that loads its own address, followed by an
+    unconditional jump, such as (END) @END 0;JMP.
+
+    Methods:
+    __init__: Constructs the Simulator and loads a program.
+    load: Loads a program into ROM, predecoding every word, and resets the computer.
+    reset: Clears the registers and RAM.
+    run: Runs a number of cycles.
+    run_until_halt: Runs until the program reaches a halt loop.
+    ram_dump: Returns a range of RAM words.
+    screen: Returns the screen memory map.
+    set_key: Sets the key code in the keyboard memory map.
+    """
+
+    def __init__(self, words=()):
+        """Construct the Simulator object and load the given 16-bit integer words, if any, into ROM."""
+        self.cycles = 0
+        self.load(words)
+
+    def load(self, words):
+        """Load the given 16-bit integer words into ROM, decode each one into the dispatch table, and reset the
+        computer. The rest of ROM is filled with zero words, which are @0."""
+        if len(words) > ROM_SIZE:
+            raise ValueError(f"The program has {len(words)} words, but the ROM only holds {ROM_SIZE}.")
+        program = [word if word < 0x8000 else c_handler(word) for word in words]
+        program.extend([0] * (ROM_SIZE - len(program)))
+
+        # Running off the end of ROM goes back to address 0, so one extra entry does the word at address 0.
+        def wrap(ram, a, d, pc):
+            op = program[0]
+            if op.__class__ is int:
+                return op, d, 1
+            return op(ram, a, d, 0)
+        program.append(wrap)
+        self.program = program
+
+        # The same table with the first word of each halt loop replaced, for run_until_halt().
+        self.halt_program = list(program)
+        for address, word in enumerate(words[:-1]):
+            if word == address and words[address + 1] >= 0x8000 and words[address + 1] & 0b111 == 0b111:
+                self.halt_program[address] = halt_handler
+        self.reset()
+
+    def reset(self):
+        """Clear the A, D, and PC registers and the RAM, and the cycle count."""
+        self.a = 0
+        self.d = 0
+        self.pc = 0
+        self.ram = [0] * RAM_SIZE
+        self.cycles = 0
+
+    def run(self, cycles, program=None):
+        """Run the given number of cycles, one instruction each, and return the number run."""
+        if program is None:
+            program = self.program
+        ram = self.ram
+        a, d, pc = self.a, self.d, self.pc
+        done = 0
+        try:
+            for done in range(1, cycles + 1):
+                op = program[pc]
+                if op.__class__ is int:
+                    a = op
+                    pc += 1
+                else:
+                    a, d, pc = op(ram, a, d, pc)
+        except Halted:
+            done -= 1
+            raise
+        finally:
+            # The PC is left on the extra entry past the end of ROM when it has just wrapped around.
+            self.a, self.d, self.pc = a, d, pc & 0x7FFF
+            self.cycles += done
+        return done
+
+    def run_until_halt(self, max_cycles=None):
+        """Run until the program reaches a halt loop, or for at most max_cycles cycles if it is given. Return a
+        (cycles, halted) tuple of the number of cycles run and whether the program halted."""
+        cycles_before = self.cycles
+        try:
+            # Run in large steps, which costs nothing extra per cycle, until the halt handler stops the run.
+            while max_cycles is None or self.cycles - cycles_before < max_cycles:
+                step = 1 << 20 if max_cycles is None else min(1 << 20, max_cycles - (self.cycles - cycles_before))
+                self.run(step, self.halt_program)
+        except Halted:
+            return self.cycles - cycles_before, True
+        return self.cycles - cycles_before, False
+
+    def ram_dump(self, start=0, end=RAM_SIZE):
+        """Return a list of the RAM words from address start up to, but not including, end."""
+        return self.ram[start:end]
+
+    def screen(self):
+        """Return a list of the words of the screen memory map, 32 words to each of 256 rows."""
+        return self.ram[SCREEN:KBD]
+
+    def set_key(self, key_code):
+        """Set the key code in the keyboard memory map, or 0 for no key."""
+        self.ram[KBD] = key_code
+
+
+def parse_range(text):
+    """Return a (start, end) tuple from a START:END argument, where either may be left out."""
+    start, _, end = text.partition(":")
+    return int(start or 0), int(end or RAM_SIZE)
+
+
+def source_location(options, pc):
+    """Return the source line of the given PC as text to follow it, from the debug map named in the options or the
+    one next to the input file, or an empty string if there is no debug map or it does not cover the PC."""
+    debug_map_file = options.debug_map
+    if debug_map_file is None:
+        from debug_map_module import DEBUG_MAP_EXTENSION
+        debug_map_file = os.path.splitext(options.input_file)[0] + DEBUG_MAP_EXTENSION
+        if not os.path.isfile(debug_map_file):
+            return ""
+    from debug_map_module import DebugMap
+    debug_map = DebugMap.load(debug_map_file)
+    if pc >= len(debug_map.lines):
+        return ""
+    file, line = debug_map.line_of(pc)
+    return f" (line {line} of {os.path.basename(file)})"
+
+
+def main(args=None):
+    """Parse the command-line arguments, run the program, and report the cycles run and how fast."""
+    arg_parser = argparse.ArgumentParser(description="Run an assembled Hack program.")
+    arg_parser.add_argument("input_file", help="the .hack or .rom file to run")
+    arg_parser.add_argument("--cycles", type=int, default=1000000, help="number of cycles to run (default 1000000)")
+    arg_parser.add_argument("--until-halt", action="store_true", help="run until the program reaches a halt loop")
+    arg_parser.add_argument("--max-cycles", type=int, default=None, help="stop --until-halt after this many cycles")
+    arg_parser.add_argument("--dump", default=None, metavar="START:END", help="print the RAM words in this range")
+    arg_parser.add_argument("--byte-order", choices=("little", "big"), default=config.ROM_BYTE_ORDER,
+                            help="byte order of the words in a .rom image")
+    arg_parser.add_argument("--debug-map", default=None, metavar="FILE",
+                            help="the program's .dbg debug map (default: the one next to the program, if any)")
+    options = arg_parser.parse_args(args)
+
+    simulator = Simulator(read_program(options.input_file, options.byte_order))
+    start_time = time.perf_counter()
+    if options.until_halt:
+        cycles, halted = simulator.run_until_halt(options.max_cycles)
+    else:
+        cycles, halted = simulator.run(options.cycles), False
+    elapsed = time.perf_counter() - start_time
+    print(f"Ran {cycles:,} cycles in {elapsed:.3f}s ({cycles / max(elapsed, 1e-9):,.0f} cycles/s)"
+          f"{', halted' if halted else ''}. PC={simulator.pc}{source_location(options, simulator.pc)} "
+          f"A={simulator.a} D={simulator.d}")
+    if options.dump is not None:
+        start, end = parse_range(options.dump)
+        for address, word in enumerate(simulator.ram_dump(start, end), start):
+            print(f"{address:>5}: {word:>5} ({word - 0x10000 if word & 0x8000 else word})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
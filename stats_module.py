@@ -0,0 +1,108 @@
+"""
+The stats module exports the AssemblyStats class.
+
+AssemblyStats class: Collects timings, counters, and peak memory for one assembly and saves them as JSON.
+"""
+import contextlib
+import cProfile
+import json
+import platform
+import time
+import tracemalloc
+from collections import Counter
+
+
+class AssemblyStats:
+    """
+    The AssemblyStats class is the instrumentation for one assembly. The assembler only collects stats when it is given
+    an AssemblyStats object, so normal runs pay nothing for it.
+
+    Timings are measured with the monotonic time.perf_counter() clock and summed per phase name, so a phase entered
+    more than once, such as Parser.command_type, reports its total time. Counters count anything else by name, such as
+    each command type, the regular expression tests made to classify commands, and symbol table hits against new RAM
+    variable allocations. Peak memory is measured with tracemalloc, and the whole assembly can also be profiled with
+    cProfile.
+
+    Methods:
+    __init__: Constructs the AssemblyStats object.
+    start: Starts the total timer, memory tracing, and the profiler, if it is on.
+    stop: Stops them and records the total time and peak memory.
+    phase: Returns a context manager that adds the time spent inside it to a phase.
+    add_time: Adds a number of seconds to a phase.
+    count: Adds to a named counter.
+    to_dict: Returns every stat as a JSON-serializable dict.
+    write: Saves the stats to a JSON file.
+    """
+
+    def __init__(self, trace_memory=True, profile_filename=None):
+        """Construct the AssemblyStats object.
+
+        Arguments:
+        trace_memory: Whether to measure peak memory with tracemalloc, which slows the assembly down noticeably.
+        profile_filename: A file to dump cProfile stats to once the assembly stops, or None to not profile.
+        """
+        self.trace_memory = trace_memory
+        self.profile_filename = profile_filename
+        self.timings = {}
+        self.counters = Counter()
+        self.total_seconds = None
+        self.peak_memory_bytes = None
+        self._start_time = None
+        self._profiler = None
+        self._started_tracemalloc = False
+
+    def start(self):
+        """Start timing the whole assembly, tracing memory, and profiling, as configured."""
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if self.profile_filename is not None:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._start_time = time.perf_counter()
+
+    def stop(self):
+        """Stop timing, tracing, and profiling, recording the total time and peak memory and writing the profile."""
+        self.total_seconds = time.perf_counter() - self._start_time
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_filename)
+            self._profiler = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            self.peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Return a context manager that adds the time spent inside it to the named phase."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start_time)
+
+    def add_time(self, name, seconds):
+        """Add the given number of seconds to the named phase."""
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def count(self, name, amount=1):
+        """Add the given amount to the named counter."""
+        self.counters[name] += amount
+
+    def to_dict(self):
+        """Return every stat as a dict that can be saved as JSON."""
+        return {
+            "python": platform.python_version(),
+            "total_seconds": self.total_seconds,
+            "peak_memory_bytes": self.peak_memory_bytes,
+            "timings": self.timings,
+            "counters": dict(sorted(self.counters.items())),
+            "profile": self.profile_filename
+        }
+
+    def write(self, filename):
+        """Save the stats to the given JSON file."""
+        with open(filename, "w") as stats_file:
+            json.dump(self.to_dict(), stats_file, indent=2)
@@ -0,0 +1,166 @@
+"""
+The stream module assembles XHAL programs that are too large to hold in memory.
+
+Source lines are read lazily from a file or stdin and parsed by Preprocessor.parse_stream(), which expands .INCLUDE
+directives and macros as they are reached and parses the other lines in runs. They are then translated by a single
+pass with forward-reference backpatching. Translated words are spooled to a temporary file as packed 16-bit integers,
+a chunk at a time, and then copied to the output as .hack text. Only the symbol table, the fixup list, the macros, and
+one chunk of words and of lines are kept in memory. Included files are relative to the input file's directory, or to
+the current directory for stdin.
+
+Usage: python stream.py <input .asm file or -> [-o <output .hack file or ->] [--name NAME]
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+from array import array
+
+import config
+from assembler_module import AssemblyContext
+from error_checker import ErrorChecker, TooManyErrorsError, create_error_file
+from output_module import format_hack_text
+from preprocessor_module import Preprocessor
+
+# The number of words kept in memory before they are spooled to disk.
+SPOOL_CHUNK = 4096
+
+# Marks a word that had an error and is left out of the output. No valid Hack word starts with 1 without also starting
+# with 111, so this value can never be mistaken for a real word.
+SKIPPED_WORD = 0x8000
+
+
+class WordSpool:
+    """
+    The WordSpool class is a list-like sink for translated words that keeps at most SPOOL_CHUNK of them in memory.
+    Full chunks are written to a temporary file as packed 16-bit integers. Backpatches to words that are still in
+    memory are applied directly, and backpatches to words already on disk are kept until the spool is written out.
+
+    Methods:
+    __init__: Constructs the spool and opens its temporary file.
+    __len__: Returns the number of words appended so far.
+    append: Adds a word (or None for a word with an error) to the end of the spool.
+    __setitem__: Backpatches the word at the given index.
+    write_to: Writes every word, with its backpatches applied, to an output stream as .hack text.
+    close: Closes and removes the temporary file.
+    """
+
+    def __init__(self):
+        """Construct the WordSpool object with an empty in-memory chunk and an empty temporary file."""
+        self.spool_file = tempfile.TemporaryFile()
+        self.chunk = array('H')
+        self.spooled_count = 0
+        self.patches = {}
+
+    def __len__(self):
+        return self.spooled_count + len(self.chunk)
+
+    def append(self, word):
+        """Add an integer word, or None for a word with an error, to the end of the spool."""
+        self.chunk.append(SKIPPED_WORD if word is None else word)
+        if len(self.chunk) >= SPOOL_CHUNK:
+            self.chunk.tofile(self.spool_file)
+            self.spooled_count += len(self.chunk)
+            self.chunk = array('H')
+
+    def __setitem__(self, index, word):
+        """Backpatch the word at the given index with an integer word, or None if the word had an error."""
+        packed_word = SKIPPED_WORD if word is None else word
+        if index >= self.spooled_count:
+            self.chunk[index - self.spooled_count] = packed_word
+        else:
+            self.patches[index] = packed_word
+
+    def write_to(self, output_stream):
+        """Write every word to the given text stream in .hack format, one chunk at a time, applying the backpatches
+        and leaving out words that had errors."""
+        self.chunk.tofile(self.spool_file)
+        self.spooled_count += len(self.chunk)
+        self.chunk = array('H')
+        self.spool_file.seek(0)
+
+        index = 0
+        while True:
+            chunk = array('H')
+            chunk.frombytes(self.spool_file.read(SPOOL_CHUNK * chunk.itemsize))
+            if not chunk:
+                break
+            for chunk_idx in range(len(chunk)):
+                if index + chunk_idx in self.patches:
+                    chunk[chunk_idx] = self.patches.pop(index + chunk_idx)
+            output_stream.write(format_hack_text(word for word in chunk if word != SKIPPED_WORD))
+            index += len(chunk)
+
+    def close(self):
+        """Close the spool's temporary file, which also removes it."""
+        self.spool_file.close()
+
+
+def stream_assemble(input_stream, output_stream, context=None, input_file=None):
+    """Assemble the XHAL lines read lazily from input_stream and write the .hack text to output_stream. Return the
+    AssemblyContext used, which holds the final symbol table and the recorded diagnostics.
+
+    Arguments:
+    input_stream: An iterable of XHAL source lines, such as an open file or sys.stdin.
+    output_stream: A text stream to write the binary words to.
+    context: The AssemblyContext to assemble with. A new one is made if none is given.
+    input_file: The path of the file being read, which included files are relative to, or None for the current
+        directory.
+    """
+    if context is None:
+        context = AssemblyContext()
+    preprocessor = Preprocessor(input_file, context.error_checker, lines=())
+    words = WordSpool()
+    try:
+        context.single_pass(preprocessor.parse_stream(input_stream), words)
+        words.write_to(output_stream)
+    finally:
+        words.close()
+    return context
+
+
+def main(args=None):
+    """Parse the command-line arguments and stream-assemble the input to the output. Diagnostics are printed to
+    stderr when the words are written to stdout. Return 1 if any errors were found, and 0 otherwise."""
+    arg_parser = argparse.ArgumentParser(description="Assemble an XHAL program without holding it in memory.")
+    arg_parser.add_argument("input", help="the .asm file to assemble, or - for stdin")
+    arg_parser.add_argument("-o", "--output", default="-", help="the .hack file to write, or - for stdout (default)")
+    arg_parser.add_argument("--name", default=None,
+                            help="name used for the error log and symbol tables (default: the input file's name)")
+    options = arg_parser.parse_args(args)
+
+    output_name = options.name
+    if output_name is None:
+        output_name = "stdin" if options.input == "-" else os.path.splitext(os.path.basename(options.input))[0]
+
+    # Create an empty error file if the option to is set.
+    log_filename = None
+    if config.WRITE_ERRORS_TO_LOG:
+        log_filename = create_error_file(output_name)
+        open(log_filename, "w").close()
+    context = AssemblyContext(ErrorChecker(log_filename))
+
+    with contextlib.ExitStack() as stack:
+        input_stream = sys.stdin if options.input == "-" else stack.enter_context(open(options.input, "r"))
+        if options.output == "-":
+            output_stream = sys.stdout
+            # Keep the assembler's own console output out of the words written to stdout.
+            stack.enter_context(contextlib.redirect_stdout(sys.stderr))
+        else:
+            output_stream = stack.enter_context(open(options.output, "w"))
+        try:
+            stream_assemble(input_stream, output_stream, context, None if options.input == "-" else options.input)
+        except TooManyErrorsError:
+            pass
+        else:
+            # Export symbol tables.
+            if config.EXPORT_SYMBOL_TABLES:
+                context.symbol_table.export_symbol_tables(output_name)
+        context.error_checker.flush()
+
+    return 1 if any(severity == "ERROR" for severity, line, message in context.error_checker.diagnostics) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
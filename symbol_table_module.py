@@ -1,139 +1,168 @@
 """
-The symbol table module exports the SymbolTable class.
+The symbol table module exports the SymbolTable class and the predefined symbols.
 
 SymbolTable class: Keeps a correspondence between symbolic labels and numeric addresses using a dictionary.
+PREDEFINED_SYMBOLS: The symbols every program starts with, and which may not be redefined, and their RAM addresses.
 """
-import os
+import json
+import sys
+
+import config
+from output_module import assembler_dir
+
+# The predefined symbols and their RAM addresses. The error checker uses the same dictionary as its list of reserved
+# labels.
+PREDEFINED_SYMBOLS = {
+    "SP": 0,
+    "LCL": 1,
+    "ARG": 2,
+    "THIS": 3,
+    "THAT": 4,
+    "R0": 0,
+    "R1": 1,
+    "R2": 2,
+    "R3": 3,
+    "R4": 4,
+    "R5": 5,
+    "R6": 6,
+    "R7": 7,
+    "R8": 8,
+    "R9": 9,
+    "R10": 10,
+    "R11": 11,
+    "R12": 12,
+    "R13": 13,
+    "R14": 14,
+    "R15": 15,
+    "SCREEN": 16384,
+    "KBD": 24576
+}
+
+# The kinds of symbol: RAM for predefined symbols and variables, ROM for labels, and EQU for EQU directives.
+SYMBOL_KINDS = ("RAM", "ROM", "EQU")
+
+# The version of the JSON symbol file written by export_json(), which readers should check.
+SYMBOL_FILE_VERSION = 1
+
 
 class SymbolTable:
     """
     The SymbolTable class is responsible for managing a symbol table (implemented as a dictionary) of symbols that the
     assembler can use to resolve symbols in the XHAL code.
 
+    Every symbol maps to one (address, kind, line) tuple, where the address is an int (or, for an EQU directive with a
+    value that is not a number, the value as written), the kind is one of SYMBOL_KINDS, and the line is the source line
+    the symbol was defined on, or 0 for the predefined symbols. The dictionary keeps the order symbols were added in, so
+    the RAM, ROM, and EQU tables are read off it in order. Symbol names are interned, so each name is stored once
+    however many instructions refer to it.
+
     Methods:
     __init__: Constructs the SymbolTable object and creates a symbol table empty except for predefined symbols.
     add_entry: Adds an entry consisting of a symol and an address to the table.
     contains: Determines if the symbol table contains a given symbol.
     get_address: Returns the address associated with a given symbol.
+    get_entry: Returns the (address, kind, line) entry of a given symbol.
+    entries: Returns the (symbol, address, line) entries of one kind of symbol, in the order they were added.
+    addresses: Returns a dict of every symbol and its address.
+    to_dict: Returns the contents of the symbol table as a JSON-serializable dict.
+    from_dict: Creates a SymbolTable from a dict made by to_dict().
+    load: Creates a SymbolTable from a JSON symbol file made by export_json().
+    export_symbol_tables: Writes the symbol tables to the file formats set in the config.
+    export_text: Writes the RAM, ROM, and EQU symbol tables to a text file.
+    export_json: Writes the symbol table to a compact JSON file.
+    to_json: Returns the symbol table as compact JSON text.
     """
 
     def __init__(self):
         """Construct the SymbolTable object and initialize a symbol table with only predefined symbols and their pre-
-        allocated RAM addresses. Then initialize three other symbol tables that will contain subsets of the main symbol
-        table, for reporting purposes.
+        allocated RAM addresses, each associated with the line number 0, to indicate they're initialized before the
+        assembly program is parsed.
         """
-        self.symbol_table = {
-            "SP": "0",
-            "LCL": "1",
-            "ARG": "2",
-            "THIS": "3",
-            "THAT": "4",
-            "R0": "0",
-            "R1": "1",
-            "R2": "2",
-            "R3": "3",
-            "R4": "4",
-            "R5": "5",
-            "R6": "6",
-            "R7": "7",
-            "R8": "8",
-            "R9": "9",
-            "R10": "10",
-            "R11": "11",
-            "R12": "12",
-            "R13": "13",
-            "R14": "14",
-            "R15": "15",
-            "SCREEN": "16384",
-            "KBD": "24576"
-        }
-
-        # The below symbol tables also hold line numbers as the second number in each tuple.
-
-        # Initialize the RAM symbol table to have the predefined symbols. Each will associated with the line number 0,
-        # to indicate they're initialized before the assembly program is parsed.
-        # Will later also hold copies of variables and associated RAM addresses and line numbers.
-        self.ram_symbol_table = {
-            "SP": ("0", "0"),
-            "LCL": ("1", "0"),
-            "ARG": ("2", "0"),
-            "THIS": ("3", "0"),
-            "THAT": ("4", "0"),
-            "R0": ("0", "0"),
-            "R1": ("1", "0"),
-            "R2": ("2", "0"),
-            "R3": ("3", "0"),
-            "R4": ("4", "0"),
-            "R5": ("5", "0"),
-            "R6": ("6", "0"),
-            "R7": ("7", "0"),
-            "R8": ("8", "0"),
-            "R9": ("9", "0"),
-            "R10": ("10", "0"),
-            "R11": ("11", "0"),
-            "R12": ("12", "0"),
-            "R13": ("13", "0"),
-            "R14": ("14", "0"),
-            "R15": ("15", "0"),
-            "SCREEN": ("16384", "0"),
-            "KBD": ("24576", "0")
-        }
-
-        # Initialize the ROM symbol table, which will hold copies of the labels and associated ROM addresses and line
-        # numbers.
-        self.rom_symbol_table = {}
-
-        # Initialize the EQU symbol table
-        self.equ_symbol_table = {}
+        self.symbols = {symbol: (address, "RAM", 0) for symbol, address in PREDEFINED_SYMBOLS.items()}
 
     def add_entry(self, symbol, address, memory_type, line):
-        """Add the arguments symbol and address to the symbol table as a new entry."""
-        self.symbol_table[symbol] = address
-        if memory_type == "ROM":
-            self.rom_symbol_table[symbol] = address, line
-        elif memory_type == "RAM":
-            self.ram_symbol_table[symbol] = address, line
-        elif memory_type == "EQU":
-            self.equ_symbol_table[symbol] = address, line
+        """Add the arguments symbol and address to the symbol table as a new entry. The address is an int, except for
+        an EQU value that is not a number, which is kept as written and reported wherever the symbol is used."""
+        self.symbols[sys.intern(symbol)] = address, memory_type, line
 
     def contains(self, symbol):
         """Look in the symbol table to determine if the symbol argument is inside it. Return true if it is and false
         otherwise."""
-        if symbol in self.symbol_table:
-            return True
-        else:
-            return False
+        return symbol in self.symbols
 
     def get_address(self, symbol):
-        """Return the int ROM address associated with the given symbol argument. Should only be called if contains()
-        has just returned true."""
-        return self.symbol_table[symbol]
+        """Return the int address associated with the given symbol argument. Should only be called if contains() has
+        just returned true."""
+        return self.symbols[symbol][0]
+
+    def get_entry(self, symbol):
+        """Return the (address, kind, line) entry of the given symbol, or None if it is not in the table."""
+        return self.symbols.get(symbol)
+
+    def entries(self, memory_type):
+        """Return a list of the (symbol, address, line) entries of the given kind, in the order they were added."""
+        return [(symbol, address, line) for symbol, (address, kind, line) in self.symbols.items()
+                if kind == memory_type]
+
+    def addresses(self):
+        """Return a dict of every symbol and its address."""
+        return {symbol: entry[0] for symbol, entry in self.symbols.items()}
+
+    def to_dict(self):
+        """Return the contents of the symbol table as a dict that can be saved as JSON. The symbols are a list of
+        [symbol, address, kind, line] rows, in the order they were added."""
+        return {
+            "version": SYMBOL_FILE_VERSION,
+            "symbols": [[symbol, address, kind, line] for symbol, (address, kind, line) in self.symbols.items()]
+        }
+
+    @classmethod
+    def from_dict(cls, tables):
+        """Create a SymbolTable holding the contents of a dict made by to_dict()."""
+        if tables.get("version") != SYMBOL_FILE_VERSION:
+            raise ValueError(f"Unsupported symbol file version {tables.get('version')!r}.")
+        symbol_table = cls()
+        symbol_table.symbols = {sys.intern(symbol): (address, kind, line)
+                                for symbol, address, kind, line in tables["symbols"]}
+        return symbol_table
+
+    @classmethod
+    def load(cls, filename):
+        """Create a SymbolTable from a JSON symbol file written by export_json()."""
+        with open(filename, "r") as symbol_file:
+            return cls.from_dict(json.load(symbol_file))
 
     def export_symbol_tables(self, io_file):
+        """Write the symbol tables to symbol_tables/, as text, JSON, or both, as set by config.SYMBOL_TABLE_FORMAT."""
+        if config.SYMBOL_TABLE_FORMAT in ("text", "both"):
+            self.export_text(io_file)
+        if config.SYMBOL_TABLE_FORMAT in ("json", "both"):
+            self.export_json(io_file)
+
+    def export_text(self, io_file):
         """Create a text file and record RAM, ROM, and EQU symbol tables in it."""
-        file_path = os.path.abspath(__file__)
-        filename = os.path.split(file_path)[0] + '/' 'symbol_tables' + '/' + io_file + '_sym_tables.txt'
+        filename = assembler_dir() + '/' 'symbol_tables' + '/' + io_file + '_sym_tables.txt'
         with open(filename, "w") as file:
             h_titles = "Entry", "Address", "Line"
-            header = f"RAM Symbol Table\n----------\n{h_titles[0]:<50}{h_titles[1]:<50}{h_titles[2]:<50}\n" \
-                     f"------------------------------------------------------------------------------------------" \
-                     f"----------------------\n"
-            file.write(header)
-            for entry in self.ram_symbol_table:
-                file.write(f"{entry:<50}{self.ram_symbol_table[entry][0]:<50}{self.ram_symbol_table[entry][1]}\n")
-            file.write("\n\n***********************************************************************************"
-                       "***********************************\n\n\n\n")
-            header = f"ROM Symbol Table\n----------\n{h_titles[0]:<50}{h_titles[1]:<50}{h_titles[2]:<50}\n" \
-                     f"------------------------------------------------------------------------------------------" \
-                     f"----------------------\n"
-            file.write(header)
-            for entry in self.rom_symbol_table:
-                file.write(f"{entry:<50}{self.rom_symbol_table[entry][0]:<50}{self.rom_symbol_table[entry][1]}\n")
-            file.write("\n\n***********************************************************************************"
-                       "***********************************\n\n\n\n")
-            header = f"EQU Symbol Table\n----------\n{h_titles[0]:<50}{h_titles[1]:<50}{h_titles[2]:<50}\n" \
-                     f"-----------------------------------------------------------------------------------------" \
-                     f"-----------------------\n"
-            file.write(header)
-            for entry in self.equ_symbol_table:
-                file.write(f"{entry:<50}{self.equ_symbol_table[entry][0]:<50}{self.equ_symbol_table[entry][1]}\n")
+            for index, memory_type in enumerate(SYMBOL_KINDS):
+                if index:
+                    file.write("\n\n***********************************************************************************"
+                               "***********************************\n\n\n\n")
+                header = f"{memory_type} Symbol Table\n----------\n" \
+                         f"{h_titles[0]:<50}{h_titles[1]:<50}{h_titles[2]:<50}\n" \
+                         f"------------------------------------------------------------------------------------------" \
+                         f"----------------------\n"
+                file.write(header)
+                for entry, address, line in self.entries(memory_type):
+                    file.write(f"{entry:<50}{address:<50}{line}\n")
+
+    def export_json(self, io_file):
+        """Create a JSON file, symbol_tables/<io_file>_symbols.json, holding the dict from to_dict() with no padding,
+        which tools can load with SymbolTable.load()."""
+        filename = assembler_dir() + '/' 'symbol_tables' + '/' + io_file + '_symbols.json'
+        with open(filename, "w") as file:
+            file.write(self.to_json())
+
+    def to_json(self):
+        """Return the dict from to_dict() as compact JSON text."""
+        return json.dumps(self.to_dict(), separators=(",", ":"))
@@ -0,0 +1,60 @@
+"""
+Tests that outputs restored from the build cache are the same as those of the build that stored them.
+
+Usage: python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import config  # noqa: E402
+from assembler_module import assemble_file  # noqa: E402
+from error_checker import format_diagnostic  # noqa: E402
+from output_module import assembler_dir  # noqa: E402
+
+OUTPUT_NAME = "test_build_cache"
+
+
+class CachedIncludeTest(unittest.TestCase):
+    """Diagnostics from included files and macros must name the same file and line when restored from the cache."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.saved_settings = config.BUILD_CACHE_DIR, config.WRITE_ERRORS_TO_LOG, config.EXPORT_SYMBOL_TABLES
+        config.BUILD_CACHE_DIR = os.path.join(self.temp_dir.name, "cache")
+        config.WRITE_ERRORS_TO_LOG = False
+        config.EXPORT_SYMBOL_TABLES = False
+
+    def tearDown(self):
+        config.BUILD_CACHE_DIR, config.WRITE_ERRORS_TO_LOG, config.EXPORT_SYMBOL_TABLES = self.saved_settings
+        self.temp_dir.cleanup()
+        hack_file = os.path.join(assembler_dir(), "binary_output", OUTPUT_NAME + ".hack")
+        if os.path.exists(hack_file):
+            os.remove(hack_file)
+
+    def write_file(self, name, text):
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, "w") as source_file:
+            source_file.write(text)
+        return path
+
+    def test_cache_hit_reports_included_file(self):
+        self.write_file("consts.asm", "(START)\n@1\n@0b102\nD=A\n.MACRO BAD\n@-1\n.ENDM\n")
+        program = self.write_file("main.asm", '.INCLUDE "consts.asm"\nBAD\n@START\n0;JMP\n')
+        miss = assemble_file(program, OUTPUT_NAME, level="silent", use_cache=True)
+        hit = assemble_file(program, OUTPUT_NAME, level="silent", use_cache=True)
+        self.assertEqual([format_diagnostic(*diagnostic) for diagnostic in hit[2]],
+                         [format_diagnostic(*diagnostic) for diagnostic in miss[2]])
+        self.assertIn("line 3 of consts.asm:", format_diagnostic(*hit[2][0]))
+        self.assertIn("line 6 of consts.asm (in a macro used on line 2):", format_diagnostic(*hit[2][1]))
+        self.assertEqual([(getattr(line, "file", None), getattr(line, "expansion", None)) for _, line, _ in hit[2]],
+                         [(getattr(line, "file", None), getattr(line, "expansion", None)) for _, line, _ in miss[2]])
+        self.assertEqual(list(hit[0]), list(miss[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
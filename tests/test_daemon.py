@@ -0,0 +1,71 @@
+"""
+Tests that the daemon answers requests with what the tools would have printed from the command line.
+
+Usage: python -m unittest discover tests
+"""
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from assembler_module import assemble  # noqa: E402
+from client import call_daemon  # noqa: E402
+from daemon import METHOD_NOT_FOUND, AssemblerDaemon  # noqa: E402
+from disassembler import disassemble  # noqa: E402
+from output_module import write_hack_text  # noqa: E402
+
+
+class DaemonTest(unittest.TestCase):
+    """Requests must give the same output and exit status as running the tool, over stdio or a socket."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        with open(os.path.join(REPO_DIR, "HAL_input", "Max.asm")) as source_file:
+            self.words = assemble(source_file.read(), level="silent")[0]
+        self.hack_file = os.path.join(self.temp_dir.name, "Max.hack")
+        write_hack_text(self.words, self.hack_file)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def request(self, daemon, method, params=None):
+        line = json.dumps({"jsonrpc": "2.0", "id": 7, "method": method, "params": params or {}})
+        return json.loads(daemon.handle_line(line))
+
+    def test_handle_line(self):
+        daemon = AssemblerDaemon()
+        result = self.request(daemon, "disassemble", {"args": ["Max.hack"], "cwd": self.temp_dir.name})["result"]
+        self.assertEqual(result, {"stdout": "".join(line + "\n" for line in disassemble(self.words)), "stderr": "",
+                                  "exit_code": 0})
+        lint_result = self.request(daemon, "lint", {"args": [os.path.join(REPO_DIR, "HAL_input", "Max.asm")]})
+        self.assertEqual(lint_result["result"]["exit_code"], 0)
+        self.assertEqual(self.request(daemon, "missing")["error"]["code"], METHOD_NOT_FOUND)
+        self.assertEqual(self.request(daemon, "status")["result"]["requests"], 4)
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix sockets are not supported on this platform.")
+    def test_socket(self):
+        socket_path = os.path.join(self.temp_dir.name, "daemon.sock")
+        daemon = AssemblerDaemon()
+        server = threading.Thread(target=daemon.serve_socket, args=(socket_path,))
+        server.start()
+        try:
+            # The socket is created once the server is listening.
+            while not os.path.exists(socket_path) and server.is_alive():
+                server.join(0.01)
+            result = call_daemon("disassemble", {"args": [self.hack_file]}, socket_path)
+            self.assertEqual(result["stdout"].splitlines(), list(disassemble(self.words)))
+        finally:
+            call_daemon("shutdown", {}, socket_path)
+            server.join(5)
+        self.assertFalse(server.is_alive())
+        self.assertFalse(os.path.exists(socket_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+Tests that disassembled programs assemble back into the same words.
+
+Usage: python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from assembler_module import assemble  # noqa: E402
+from disassembler import disassemble, load_labels  # noqa: E402
+
+
+def assemble_program(name):
+    """Assemble a sample program in HAL_input/ and return its (words, symbol_table, diagnostics)."""
+    with open(os.path.join(REPO_DIR, "HAL_input", name)) as source_file:
+        return assemble(source_file.read(), level="silent")
+
+
+class RoundTripTest(unittest.TestCase):
+    """Disassembling and then assembling again must give back the same words, with or without labels."""
+
+    PROGRAMS = ("Pong.asm", "Rect.asm", "Max.asm")
+
+    def test_round_trip(self):
+        for name in self.PROGRAMS:
+            words = assemble_program(name)[0]
+            with self.subTest(program=name):
+                self.assertEqual(list(assemble(list(disassemble(words)), level="silent")[0]), list(words))
+
+    def test_round_trip_with_labels(self):
+        for name in self.PROGRAMS:
+            words, symbol_table, diagnostics = assemble_program(name)
+            with self.subTest(program=name), tempfile.TemporaryDirectory() as temp_dir:
+                symbol_file = os.path.join(temp_dir, "symbols.json")
+                with open(symbol_file, "w") as output_file:
+                    output_file.write(symbol_table.to_json())
+                lines = list(disassemble(words, load_labels(symbol_file)))
+                self.assertEqual(list(assemble(lines, level="silent")[0]), list(words))
+                if symbol_table.entries("ROM"):
+                    self.assertIn(f"({symbol_table.entries('ROM')[0][0]})", lines)
+
+    def test_invalid_word(self):
+        # 1000... is neither an A-command nor a C-command, so it is written as a comment.
+        self.assertEqual(list(disassemble([0x8000, 7])), ["// invalid word: 1000000000000000", "@7"])
+
+
+if __name__ == "__main__":
+    unittest.main()
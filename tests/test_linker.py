@@ -0,0 +1,86 @@
+"""
+Tests that linking separately assembled modules gives the same program as assembling them as one file.
+
+Usage: python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import config  # noqa: E402
+from assembler_module import assemble, assemble_object_file  # noqa: E402
+from linker import link  # noqa: E402
+from object_module import ObjectModule  # noqa: E402
+
+
+class LinkTest(unittest.TestCase):
+    """A linked program must have the same words as the one file its modules were split from."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.saved_log_setting = config.WRITE_ERRORS_TO_LOG
+        config.WRITE_ERRORS_TO_LOG = False
+
+    def tearDown(self):
+        config.WRITE_ERRORS_TO_LOG = self.saved_log_setting
+        self.temp_dir.cleanup()
+
+    def write_file(self, name, text):
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, "w") as source_file:
+            source_file.write(text)
+        return path
+
+    def link_sources(self, sources):
+        """Write each (name, text) pair to a file, assemble each one as a module, and link them in order."""
+        modules = []
+        for name, text in sources:
+            path = self.write_file(name + ".asm", text)
+            module, diagnostics = assemble_object_file(path, name, level="silent",
+                                                       object_file=os.path.join(self.temp_dir.name, name + ".xobj"))
+            self.assertEqual(diagnostics, [])
+            modules.append(module)
+        return link(modules)
+
+    def test_split_programs(self):
+        for name in ("Pong.asm", "Rect.asm", "Max.asm"):
+            with open(os.path.join(REPO_DIR, "HAL_input", name)) as source_file:
+                source = source_file.read()
+            lines = source.splitlines(True)
+            # Five modules of about the same number of lines, so labels are used in modules other than their own.
+            bounds = [len(lines) * part // 5 for part in range(6)]
+            sources = [(f"part{part}", "".join(lines[bounds[part]:bounds[part + 1]])) for part in range(5)]
+            with self.subTest(program=name):
+                words, symbol_table, diagnostics = self.link_sources(sources)
+                self.assertEqual(diagnostics, [])
+                self.assertEqual(list(words), list(assemble(source, level="silent")[0]))
+
+    def test_object_file_round_trip(self):
+        path = self.write_file("loop.asm", ".EQU STEP 2\n(LOOP)\n@STEP\nD=A\n@count\nM=D+M\n@LOOP\n0;JMP\n")
+        object_file = os.path.join(self.temp_dir.name, "loop.xobj")
+        module, diagnostics = assemble_object_file(path, "loop", level="silent", object_file=object_file)
+        self.assertEqual(ObjectModule.load(object_file).to_dict(), module.to_dict())
+        self.assertEqual(module.relocations, [4])
+        self.assertEqual(module.imports, {"count": (5, [2])})
+
+    def test_modules_include_same_constants(self):
+        self.write_file("consts.asm", ".EQU SCALE 3\n.EQU LIMIT 16\n")
+        first = '.INCLUDE "consts.asm"\n@SCALE\nD=A\n@total\nM=D\n@SHOW\n0;JMP\n'
+        second = '.INCLUDE "consts.asm"\n(SHOW)\n@LIMIT\nD=A\n@total\nM=D+M\n(END)\n@END\n0;JMP\n'
+        words, symbol_table, diagnostics = self.link_sources([("first", first), ("second", second)])
+        self.assertEqual(diagnostics, [])
+        joined = ".EQU SCALE 3\n.EQU LIMIT 16\n" + first.split("\n", 1)[1] + second.split("\n", 1)[1]
+        self.assertEqual(list(words), list(assemble(joined, level="silent")[0]))
+
+    def test_different_equ_values(self):
+        words, symbol_table, diagnostics = self.link_sources([("first", ".EQU SCALE 3\n@SCALE\n"),
+                                                              ("second", ".EQU SCALE 4\n@SCALE\n")])
+        self.assertEqual([severity for severity, line, message in diagnostics], ["ERROR"])
+
+
+if __name__ == "__main__":
+    unittest.main()
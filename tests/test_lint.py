@@ -0,0 +1,41 @@
+"""
+Tests that the linter reports the same errors and warnings as the assembler.
+
+Usage: python -m unittest discover tests
+"""
+import glob
+import os
+import sys
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from assembler_module import assemble  # noqa: E402
+from lint_module import Linter  # noqa: E402
+
+
+class LintTest(unittest.TestCase):
+    """Linting a program must find exactly the diagnostics that assembling it does."""
+
+    def test_same_diagnostics_as_assembler(self):
+        paths = sorted(glob.glob(os.path.join(REPO_DIR, "HAL_input", "*.asm"))
+                       + glob.glob(os.path.join(REPO_DIR, "XHAL_input", "*.asm")))
+        for path in paths:
+            with open(path) as source_file:
+                source = source_file.read()
+            with self.subTest(program=os.path.basename(path)):
+                assembled = assemble(source, level="silent")[2]
+                linted = Linter().lint_lines(source.splitlines(True))
+                self.assertEqual(sorted((severity, int(line), message) for severity, line, message in assembled),
+                                 sorted((severity, line, message) for severity, line, message, rule in linted))
+
+    def test_rules_can_be_enabled_and_disabled(self):
+        lines = ["@5 // comment", "A", "@-1"]
+        self.assertEqual([rule for severity, line, message, rule in Linter().lint_lines(lines)], ["negative-address"])
+        linter = Linter(enable=("unrecognized-line",), disable=("negative-address",))
+        self.assertEqual([rule for severity, line, message, rule in linter.lint_lines(lines)], ["unrecognized-line"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Tests that the optimizer leaves the meaning of a program alone: the addresses of its RAM variables, and where its jumps
+go.
+
+Usage: python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from assembler_module import assemble  # noqa: E402
+from simulator import Simulator  # noqa: E402
+
+
+def ram_addresses(source, **options):
+    """Assemble the source with the given options and return a dict of each RAM variable to its address."""
+    words, symbol_table, diagnostics = assemble(source, level="silent", **options)
+    return {symbol: address for symbol, (address, kind, line) in symbol_table.symbols.items() if kind == "RAM"}
+
+
+class RamVariableOrderTest(unittest.TestCase):
+    """Optimizing must not change the address of any RAM variable."""
+
+    # The dead load of first is its first use, so removing it would allocate second first.
+    DEAD_FIRST_USE = "@first\n@second\nD=M\n@first\nM=D\n"
+    # Every use of unused is removed as unreachable, but the variables after it keep their addresses.
+    UNREACHABLE_USE = "@LOOP\n(LOOP)\n@x\nM=1\n@LOOP\n0;JMP\n@unused\nM=0\n(MORE)\n@MORE\n@y\nM=1\n"
+
+    def check_same_addresses(self, source):
+        for single_pass in (False, True):
+            with self.subTest(single_pass=single_pass):
+                self.assertEqual(ram_addresses(source, single_pass=single_pass, optimize=True),
+                                 ram_addresses(source, single_pass=single_pass))
+
+    def test_dead_load_of_first_use(self):
+        self.assertEqual(ram_addresses(self.DEAD_FIRST_USE, optimize=True)["first"], 16)
+        self.check_same_addresses(self.DEAD_FIRST_USE)
+
+    def test_removed_uses(self):
+        self.check_same_addresses(self.UNREACHABLE_USE)
+
+    def test_sample_programs(self):
+        for name in ("Pong.asm", "Rect.asm", "Max.asm"):
+            with open(os.path.join(REPO_DIR, "HAL_input", name)) as source_file:
+                source = source_file.read()
+            with self.subTest(program=name):
+                self.check_same_addresses(source)
+
+
+class JumpTargetTest(unittest.TestCase):
+    """The optimizer and the control-flow graph must agree on where every jump goes."""
+
+    # The label between @T and its jump makes the jump computed, so block T is reachable and must be kept.
+    LABEL_BEFORE_JUMP = ("@T\n(L)\n0;JMP\n(END)\n@END\n0;JMP\n(T)\n@7\nD=A\n@R0\nM=D\n(HALT)\n@HALT\n"
+                         "0;JMP\n")
+
+    def test_label_between_load_and_jump(self):
+        for single_pass in (False, True):
+            with self.subTest(single_pass=single_pass):
+                words, symbol_table, diagnostics = assemble(self.LABEL_BEFORE_JUMP, level="silent",
+                                                            single_pass=single_pass, optimize=True)
+                self.assertEqual(diagnostics, [])
+                self.assertEqual(symbol_table.get_entry("T")[1], "ROM")
+                simulator = Simulator(words)
+                self.assertEqual(simulator.run_until_halt(max_cycles=100)[1], True)
+                self.assertEqual(simulator.ram_dump(0, 1), [7])
+
+
+if __name__ == "__main__":
+    unittest.main()
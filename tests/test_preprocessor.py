@@ -0,0 +1,103 @@
+"""
+Tests that .INCLUDE directives and macros expand into the program they stand for, and that errors in them are reported
+where they are.
+
+Usage: python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import config  # noqa: E402
+from assembler_module import AssemblyContext, assemble  # noqa: E402
+from error_checker import ErrorChecker  # noqa: E402
+from preprocessor_module import Preprocessor, include_cache_info  # noqa: E402
+
+CONSTS = ".EQU STEP 2\n.MACRO ADD_TO var, amount\n@%amount\nD=A\n@%var\nM=D+M\n.ENDM\n"
+
+
+class PreprocessorTest(unittest.TestCase):
+    """A program with directives must assemble to the same words as the same program written out by hand."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_file(self, name, text):
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, "w") as source_file:
+            source_file.write(text)
+        return path
+
+    @staticmethod
+    def preprocess(path):
+        """Preprocess and assemble the program at the given path and return its (words, symbol_table, diagnostics)."""
+        context = AssemblyContext(ErrorChecker(None, "silent", 0))
+        context.assemble_program(Preprocessor(path, context.error_checker).parse())
+        return context.words, context.symbol_table, context.error_checker.diagnostics
+
+    def test_include_and_macro_expansion(self):
+        self.write_file("consts.asm", CONSTS)
+        path = self.write_file("main.asm", '.INCLUDE "consts.asm"\nADD_TO total, STEP\nADD_TO count, 1\n'
+                                           '(END)\n@END\n0;JMP\n')
+        expanded = ".EQU STEP 2\n@STEP\nD=A\n@total\nM=D+M\n@1\nD=A\n@count\nM=D+M\n(END)\n@END\n0;JMP\n"
+        words, symbol_table, diagnostics = self.preprocess(path)
+        expected_words, expected_table, expected_diagnostics = assemble(expanded, level="silent")
+        self.assertEqual(diagnostics, [])
+        self.assertEqual(list(words), list(expected_words))
+        self.assertEqual(symbol_table.addresses(), expected_table.addresses())
+
+    def test_unique_labels(self):
+        path = self.write_file("main.asm", ".MACRO WAIT\n(LOOP%%)\n@LOOP%%\nD;JGT\n.ENDM\nWAIT\nWAIT\n")
+        words, symbol_table, diagnostics = self.preprocess(path)
+        self.assertEqual(diagnostics, [])
+        labels = [(symbol, address) for symbol, address, line in symbol_table.entries("ROM")]
+        self.assertEqual([address for symbol, address in labels], [0, 2])
+        self.assertEqual(len({symbol for symbol, address in labels}), 2)
+        self.assertEqual(list(words)[::2], [0, 2])
+
+    def test_errors_name_their_file(self):
+        consts_file = self.write_file("consts.asm", CONSTS + "@0b12\n")
+        path = self.write_file("main.asm", '.INCLUDE "consts.asm"\nADD_TO total, -1\n')
+        words, symbol_table, diagnostics = self.preprocess(path)
+        self.assertEqual([str(line) for severity, line, message in diagnostics],
+                         ["8 of consts.asm", "3 of consts.asm (in a macro used on line 2)"])
+        self.assertEqual(diagnostics[0][1].file, consts_file)
+
+    def test_include_cache(self):
+        consts_file = self.write_file("consts.asm", CONSTS)
+        path = self.write_file("main.asm", '.INCLUDE "consts.asm"\nADD_TO total, STEP\n')
+        self.preprocess(path)
+        before = include_cache_info()
+        first_words = self.preprocess(path)[0]
+        self.assertEqual(include_cache_info()["hits"], before["hits"] + 1)
+
+        # A modified file is preprocessed again, and its new contents are used.
+        self.write_file("consts.asm", CONSTS.replace("STEP 2", "STEP 3"))
+        stamp = os.stat(consts_file).st_mtime_ns + 1000000000
+        os.utime(consts_file, ns=(stamp, stamp))
+        words = self.preprocess(path)[0]
+        self.assertEqual(include_cache_info()["misses"], before["misses"] + 1)
+        self.assertEqual((first_words[0], words[0]), (2, 3))
+
+    def test_include_cache_is_bounded(self):
+        saved_size = config.INCLUDE_CACHE_SIZE
+        config.INCLUDE_CACHE_SIZE = 2
+        try:
+            for part in range(4):
+                self.write_file(f"part{part}.asm", f"@{part}\n")
+                path = self.write_file("main.asm", f'.INCLUDE "part{part}.asm"\n')
+                self.assertEqual(list(self.preprocess(path)[0]), [part])
+                self.assertLessEqual(include_cache_info()["files"], 2)
+        finally:
+            config.INCLUDE_CACHE_SIZE = saved_size
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+"""
+Tests that the command-line tools start quickly: main.py and client.py import nothing they do not need to, and
+main.py assembles a small file within the startup budget of benchmarks/bench_startup.py.
+
+Usage: python -m unittest discover tests
+"""
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+
+import bench_startup  # noqa: E402
+
+# Modules that only some options need, which are imported when those options are used.
+LAZY_MODULES = ("numpy", "optimizer_module", "cfg_module", "debug_map_module", "stats_module", "object_module",
+                "build_cache", "linker", "lint_module", "simulator")
+
+
+def imported_modules(module_name):
+    """Import the given module in a fresh interpreter, as the command line would, and return the set of every module
+    that was imported along with it."""
+    code = f"import json, sys\nimport {module_name}\nprint(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True, cwd=REPO_DIR)
+    return set(json.loads(result.stdout))
+
+
+class StartupTest(unittest.TestCase):
+    """Starting a tool must not import the modules of options that are not used."""
+
+    def test_main_imports(self):
+        self.assertEqual(imported_modules("main").intersection(LAZY_MODULES), set())
+
+    def test_client_imports(self):
+        # A call answered by the daemon never needs the assembler itself.
+        modules = imported_modules("client")
+        self.assertEqual(modules.intersection(LAZY_MODULES + ("assembler_module", "parser_module")), set())
+
+    def test_startup_budget(self):
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            status = bench_startup.main(["--repeat", "5"])
+        self.assertEqual(status, 0, output.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+Tests that the symbol table keeps symbols in the order the passes add them, and that its JSON export loads back into
+the same table.
+
+Usage: python -m unittest discover tests
+"""
+import json
+import os
+import sys
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from assembler_module import assemble  # noqa: E402
+from symbol_table_module import PREDEFINED_SYMBOLS, SymbolTable  # noqa: E402
+
+
+def assembled_symbol_table(path):
+    """Assemble the given program, relative to the repository, and return its symbol table."""
+    with open(os.path.join(REPO_DIR, path)) as source_file:
+        return assemble(source_file.read(), level="silent")[1]
+
+
+class SymbolTableTest(unittest.TestCase):
+    """The table must keep every symbol's address, kind, and line, in order, through a JSON round trip."""
+
+    PROGRAMS = ("HAL_input/Pong.asm", "HAL_input/Rect.asm", "XHAL_input/c.asm")
+
+    def test_json_round_trip(self):
+        for path in self.PROGRAMS:
+            symbol_table = assembled_symbol_table(path)
+            with self.subTest(program=path):
+                loaded = SymbolTable.from_dict(json.loads(symbol_table.to_json()))
+                self.assertEqual(list(loaded.symbols.items()), list(symbol_table.symbols.items()))
+                for kind in ("RAM", "ROM", "EQU"):
+                    self.assertEqual(loaded.entries(kind), symbol_table.entries(kind))
+
+    def test_variables_follow_predefined_symbols(self):
+        symbol_table = assembled_symbol_table("HAL_input/Rect.asm")
+        ram_entries = symbol_table.entries("RAM")
+        self.assertEqual([symbol for symbol, address, line in ram_entries[:len(PREDEFINED_SYMBOLS)]],
+                         list(PREDEFINED_SYMBOLS))
+        variables = ram_entries[len(PREDEFINED_SYMBOLS):]
+        self.assertEqual([address for symbol, address, line in variables], list(range(16, 16 + len(variables))))
+        self.assertEqual([symbol for symbol, address, line in variables], ["counter", "address"])
+
+    def test_unsupported_version(self):
+        tables = SymbolTable().to_dict()
+        tables["version"] += 1
+        with self.assertRaises(ValueError):
+            SymbolTable.from_dict(tables)
+
+
+if __name__ == "__main__":
+    unittest.main()
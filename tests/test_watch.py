@@ -0,0 +1,89 @@
+"""
+Tests that the incremental builds of watch.py give the same words, symbols, and diagnostics as assembling from scratch.
+
+Usage: python -m unittest discover tests
+"""
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from assembler_module import assemble  # noqa: E402
+from watch import IncrementalAssembler  # noqa: E402
+
+# Lines that random edits insert: labels, jumps to them and to labels of earlier edits, RAM variables, and comments.
+# Each edit's labels are numbered after it, since a label defined twice is an error, after which every build is a full
+# one until the error is edited away.
+EDIT_LINES = ["(LOOP{edit})", "@LOOP{edit}", "@LOOP{earlier}", "D;JGT", "0;JMP", "@counter", "M=M+1", "@total", "D=M",
+              "@17", "@R2", "M=D", "// comment", ""]
+
+
+def read_lines(name):
+    """Return the lines of a sample program in HAL_input/."""
+    with open(os.path.join(REPO_DIR, "HAL_input", name)) as source_file:
+        return source_file.read().splitlines()
+
+
+class IncrementalBuildTest(unittest.TestCase):
+    """Every edit must leave the same build as a full assembly of the edited lines."""
+
+    def check_same_build(self, assembler, lines):
+        words, symbol_table, diagnostics = assemble(lines, level="silent")
+        self.assertEqual(list(assembler.words), list(words))
+        self.assertEqual(assembler.symbol_table.symbols, symbol_table.symbols)
+        self.assertEqual(assembler.diagnostics(), diagnostics)
+
+    def test_edit_defines_and_uses_label(self):
+        lines = read_lines("Max.asm")
+        assembler = IncrementalAssembler(lines)
+        lines = lines[:14] + ["(LOOP)", "@LOOP", "D;JGT"] + lines[14:]
+        self.assertEqual(assembler.update(lines), "incremental")
+        self.check_same_build(assembler, lines)
+
+    def test_random_edits(self):
+        randomizer = random.Random(2024)
+        for name in ("Max.asm", "Rect.asm"):
+            lines = read_lines(name)
+            assembler = IncrementalAssembler(lines)
+            for edit in range(200):
+                position = randomizer.randrange(len(lines) + 1)
+                action = randomizer.choice(("insert", "delete", "replace"))
+                new_lines = [line.format(edit=edit, earlier=randomizer.randrange(edit + 1))
+                             for line in randomizer.sample(EDIT_LINES, randomizer.randint(1, 3))]
+                if action == "insert":
+                    lines = lines[:position] + new_lines + lines[position:]
+                elif action == "delete":
+                    lines = lines[:position] + lines[position + randomizer.randint(1, 3):]
+                else:
+                    lines = lines[:position] + new_lines[:1] + lines[position + 1:]
+                with self.subTest(program=name, edit=edit):
+                    assembler.update(lines)
+                    self.check_same_build(assembler, lines)
+
+    def test_included_file_changes(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            consts_file = os.path.join(temp_dir, "consts.asm")
+            input_file = os.path.join(temp_dir, "main.asm")
+            with open(consts_file, "w") as source_file:
+                source_file.write(".EQU LIMIT 5\n")
+            lines = ['.INCLUDE "consts.asm"', "@LIMIT", "D=A", "@R0", "M=D"]
+            assembler = IncrementalAssembler(lines, input_file)
+            self.assertEqual(list(assembler.words), list(assemble([".EQU LIMIT 5"] + lines[1:], level="silent")[0]))
+            self.assertEqual(assembler.update(lines), "unchanged")
+
+            # Editing only the included file rebuilds the program with its new contents.
+            with open(consts_file, "w") as source_file:
+                source_file.write(".EQU LIMIT 9\n")
+            stamp = os.stat(consts_file).st_mtime_ns + 1000000000
+            os.utime(consts_file, ns=(stamp, stamp))
+            self.assertTrue(assembler.dependencies_changed())
+            self.assertEqual(assembler.update(lines), "full")
+            self.assertEqual(list(assembler.words), list(assemble([".EQU LIMIT 9"] + lines[1:], level="silent")[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
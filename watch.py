@@ -0,0 +1,415 @@
+"""
+The watch module re-assembles an XHAL file every time it is saved, keeping the previous build in memory so that small
+edits to large programs are turned around in milliseconds.
+
+IncrementalAssembler class: Holds the parsed program, symbol table, and words of one file and updates them after edits.
+
+After an edit, only the lines between the unchanged start and end of the file are parsed again. If the edit leaves the
+RAM variables alone and adds no errors, the new words are spliced into the word array, ROM labels after the edit are
+shifted by the change in length, and only the A-commands that refer to moved labels are encoded again. Any other edit
+re-runs both passes over the already-parsed program, which still skips the parser for all the unchanged lines.
+
+A program with .INCLUDE or .MACRO directives is preprocessed whole after every edit instead, since a macro can change
+the meaning of any line after it. Included files come from the Preprocessor's cache, so only those that changed are
+parsed again. The included files are watched too, and the program is rebuilt when any of them changes.
+
+Usage: python watch.py <input .asm file> <output name> [--interval SECONDS] [--format hack|rom|both]
+                       [--byte-order little|big] [--level silent|errors|warnings|trace]
+"""
+import argparse
+import os
+import time
+from array import array
+from collections import Counter
+
+import config
+from assembler_module import AssemblyContext, represents_int
+from error_checker import DIAGNOSTIC_LEVELS, ErrorChecker, create_error_file
+from instruction_module import Instruction
+from output_module import assembler_dir, write_hack_text, write_rom_image
+from parser_module import Parser
+from preprocessor_module import Preprocessor, file_stamp, has_directives
+
+
+# The number of lines compared at once when looking for the start and end of an edit.
+COMPARE_CHUNK = 256
+
+
+def common_prefix_length(first, second):
+    """Return the number of items at the start of two lists that are equal. Whole chunks are compared first, since
+    comparing list slices runs at C speed."""
+    length = 0
+    shortest = min(len(first), len(second))
+    while length + COMPARE_CHUNK <= shortest and \
+            first[length:length + COMPARE_CHUNK] == second[length:length + COMPARE_CHUNK]:
+        length += COMPARE_CHUNK
+    while length < shortest and first[length] == second[length]:
+        length += 1
+    return length
+
+
+class IncrementalAssembler:
+    """
+    The IncrementalAssembler class keeps everything from the last build of one XHAL program: its source lines, the
+    Instruction parsed from each line, the parse diagnostics, the symbol table, and the words. When the previous build
+    had no assembly errors, it also keeps the symbol each word refers to and how often each symbol is referred to, which
+    is what lets an edit be applied without running the passes again.
+
+    Instruction records are immutable, so the records after an edit that adds or removes lines keep their old line
+    numbers until a full pass needs them, and are only then rebuilt with the right ones.
+
+    A program with .INCLUDE or .MACRO directives is kept as the whole preprocessed program instead of one record per
+    line, and every edit to it, or to a file it includes, is a full build.
+
+    Methods:
+    __init__: Constructs the IncrementalAssembler and does a full build of the given source lines.
+    update: Brings the build up to date with a new version of the source lines.
+    dependencies_changed: Returns true if a file the program includes has changed since the last build.
+    program: Returns the parsed program as a tuple of Instruction records with up-to-date line numbers.
+    diagnostics: Returns the diagnostics of the current build, in the same order a full assembly would give them.
+    """
+
+    def __init__(self, lines, input_file=None):
+        """Construct the IncrementalAssembler object and build the given source lines from scratch.
+
+        Arguments:
+        lines: The XHAL source, as an iterable of lines.
+        input_file: The path of the file the lines are from, which included files are relative to, or None for the
+            current directory.
+        """
+        self.input_file = input_file
+        self.lines = [line.strip() for line in lines]
+        self.parse_all()
+        self.full_build()
+
+    def parse_all(self):
+        """Parse every source line from scratch, preprocessing the whole program if it has any directives."""
+        if has_directives(self.lines):
+            error_checker = ErrorChecker(None, "silent")
+            preprocessor = Preprocessor(self.input_file, error_checker, lines=self.lines)
+            self.preprocessed_program = preprocessor.parse()
+            self.dependencies = preprocessor.dependencies()
+            self.line_instructions = None
+            self.parse_diagnostics = error_checker.diagnostics
+        else:
+            self.preprocessed_program = None
+            self.dependencies = []
+            self.line_instructions, self.parse_diagnostics = self.parse_lines(self.lines, 1)
+
+    def dependencies_changed(self):
+        """Return true if any file the program includes, directly or not, has been modified or removed since the
+        last build."""
+        return any(file_stamp(path) != stamp for path, stamp in self.dependencies)
+
+    @staticmethod
+    def parse_lines(lines, first_line):
+        """Parse a range of source lines that starts at the given line number. Return a list with the Instruction
+        parsed from each line (or None for lines that produce none) and the list of parse diagnostics."""
+        error_checker = ErrorChecker(None, "silent")
+        line_instructions = [None] * len(lines)
+        for instruction in Parser(None, error_checker, lines=()).parse_stream(lines, first_line):
+            line_instructions[instruction.line - first_line] = instruction
+        return line_instructions, error_checker.diagnostics
+
+    def program(self):
+        """Return the parsed program as a tuple of Instruction records, first rebuilding any record whose line number
+        is out of date."""
+        if self.preprocessed_program is not None:
+            return self.preprocessed_program
+        program = []
+        for line_idx, instruction in enumerate(self.line_instructions):
+            if instruction is None:
+                continue
+            if instruction.line != line_idx + 1:
+                instruction = Instruction(instruction.kind, line_idx + 1, instruction.text, instruction.operand,
+                                          instruction.equ_label, instruction.dest, instruction.comp, instruction.jump,
+                                          instruction.word)
+                self.line_instructions[line_idx] = instruction
+            program.append(instruction)
+        return tuple(program)
+
+    def diagnostics(self):
+        """Return the (severity, line, message) diagnostics of the current build: the parse diagnostics in line order,
+        followed by the diagnostics of the passes."""
+        return self.parse_diagnostics + self.pass_diagnostics
+
+    def full_build(self):
+        """Run both assembler passes over the parsed program and keep the results."""
+        program = self.program()
+        context = AssemblyContext(ErrorChecker(None, "silent"))
+        context.assemble_program(program)
+        self.symbol_table = context.symbol_table
+        self.words = context.words
+        self.pass_diagnostics = context.error_checker.diagnostics
+
+        # Words with errors are left out of the output, so a word's index is only its ROM address if there were none.
+        self.clean = not self.pass_diagnostics
+        self.word_symbols = []
+        self.reference_counts = Counter()
+        if self.clean:
+            for instruction in program:
+                if instruction.kind == "A":
+                    symbol = None if represents_int(instruction.operand) else instruction.operand
+                    self.word_symbols.append(symbol)
+                    if symbol is not None:
+                        self.reference_counts[symbol] += 1
+                elif instruction.kind == "C":
+                    self.word_symbols.append(None)
+
+    def update(self, lines):
+        """Bring the build up to date with the given new version of the source lines. Return "unchanged", "incremental"
+        if the edit was applied directly, or "full" if both passes had to be run again."""
+        lines = [line.strip() for line in lines]
+        old_lines = self.lines
+        if lines == old_lines and not self.dependencies_changed():
+            return "unchanged"
+
+        # Programs with directives, before or after the edit, are preprocessed and built again from scratch.
+        if self.line_instructions is None or has_directives(lines):
+            self.lines = lines
+            self.parse_all()
+            self.full_build()
+            return "full"
+
+        # Find the range of lines that changed by skipping over the lines that are the same at the start and the end.
+        start = common_prefix_length(lines, old_lines)
+        end_offset = common_prefix_length(lines[start:][::-1], old_lines[start:][::-1])
+        old_end = len(old_lines) - end_offset
+        new_end = len(lines) - end_offset
+
+        # Parse only the changed lines, and move the parse diagnostics of the lines after them.
+        new_instructions, new_diagnostics = self.parse_lines(lines[start:new_end], start + 1)
+        old_instructions = self.line_instructions[start:old_end]
+        line_delta = new_end - old_end
+        self.lines = lines
+        self.line_instructions[start:old_end] = new_instructions
+        self.parse_diagnostics = [diagnostic for diagnostic in self.parse_diagnostics if diagnostic[1] <= start] \
+            + new_diagnostics \
+            + [(severity, line + line_delta, message) for severity, line, message in self.parse_diagnostics
+               if line > old_end]
+
+        if self.clean and self.apply_edit(start, old_end, line_delta,
+                                          [instruction for instruction in old_instructions if instruction is not None],
+                                          [instruction for instruction in new_instructions if instruction is not None]):
+            return "incremental"
+        self.full_build()
+        return "full"
+
+    def apply_edit(self, start, old_end, line_delta, old_instructions, new_instructions):
+        """Apply an edit that replaced the instructions of lines start + 1 to old_end with new ones, without running
+        the passes again. Return false, having changed nothing, if the edit could change the RAM variables or has
+        assembly errors of its own, in which case the passes have to be run again.
+
+        Arguments:
+        start: The number of unchanged lines before the edit.
+        old_end: The line number of the last line that was replaced.
+        line_delta: The number of lines added by the edit (negative if lines were removed).
+        old_instructions: The Instruction records of the replaced lines.
+        new_instructions: The Instruction records of the new lines, with their line numbers set.
+        """
+        symbol_table = self.symbol_table
+        # EQU directives can change the meaning of any symbol in the program.
+        if any(instruction.kind == "EQU" for instruction in old_instructions + new_instructions):
+            return False
+
+        # Work out the new reference counts and which labels are removed and added.
+        reference_counts = Counter(self.reference_counts)
+        removed_labels = set()
+        for instruction in old_instructions:
+            if instruction.kind == "L":
+                removed_labels.add(instruction.operand)
+            elif instruction.kind == "A" and not represents_int(instruction.operand):
+                reference_counts[instruction.operand] -= 1
+                # Removing the first use of a RAM variable could change the order the variables are allocated in.
+                entry = symbol_table.get_entry(instruction.operand)
+                if entry is not None and entry[1] == "RAM" and entry[2] > start:
+                    return False
+
+        # Check the new lines for errors the same way the passes would, with a scratch error checker.
+        error_checker = ErrorChecker(None, "silent")
+        rom_start = sum(1 for instruction in self.line_instructions[:start]
+                        if instruction is not None and instruction.kind in ("A", "C"))
+        added_labels = {}
+        rom_address = rom_start
+        for instruction in new_instructions:
+            if instruction.kind == "L":
+                label = instruction.operand
+                if error_checker.check_illegal_symbol_error(label, instruction.line) or label in added_labels \
+                        or (symbol_table.contains(label) and label not in removed_labels):
+                    return False
+                added_labels[label] = rom_address, instruction.line
+            else:
+                rom_address += 1
+                if instruction.kind == "A" and not represents_int(instruction.operand):
+                    reference_counts[instruction.operand] += 1
+                elif instruction.kind == "C" and instruction.word is None:
+                    return False
+        new_count = rom_address - rom_start
+        old_count = sum(1 for instruction in old_instructions if instruction.kind != "L")
+        rom_delta = new_count - old_count
+
+        # A removed label that is still referred to would become a RAM variable.
+        for label in removed_labels:
+            if label not in added_labels and reference_counts[label] > 0:
+                return False
+
+        # Encode the new words, looking symbols up in the symbol table as it will be after the edit.
+        def resolve(symbol):
+            if symbol in added_labels:
+                return added_labels[symbol][0]
+            if symbol in removed_labels or not symbol_table.contains(symbol):
+                return None
+            address, kind, line = symbol_table.get_entry(symbol)
+            if kind == "ROM" and line > old_end:
+                address += rom_delta
+            return address
+
+        new_words = array('H')
+        new_word_symbols = []
+        for instruction in new_instructions:
+            if instruction.kind == "A":
+                if represents_int(instruction.operand):
+                    if error_checker.check_a_type_int_command(instruction.operand, instruction.line):
+                        return False
+                    symbol, address = None, instruction.operand
+                else:
+                    symbol, address = instruction.operand, resolve(instruction.operand)
+                    # A symbol that is not defined anywhere would be a new RAM variable, and a RAM variable first used
+                    # after the edit would now be first used earlier, which could change the order they are allocated.
+                    if address is None:
+                        return False
+                    # A label added by the edit itself has no entry yet.
+                    entry = symbol_table.get_entry(symbol)
+                    if entry is not None and entry[1] == "RAM" and entry[2] > start:
+                        return False
+                if error_checker.check_a_type_bin_command(address, instruction.line):
+                    return False
+                new_words.append(int(address))
+                new_word_symbols.append(symbol)
+            elif instruction.kind == "C":
+                new_words.append(instruction.word)
+                new_word_symbols.append(None)
+
+        # Every check passed, so update the symbol table, moving the labels and line numbers after the edit.
+        moved_labels = {label: address for label, (address, line) in added_labels.items()
+                        if label in removed_labels and symbol_table.get_address(label) != address}
+        predefined_symbols = []
+        first_pass_symbols = [(label, (address, "ROM", line)) for label, (address, line) in added_labels.items()]
+        variables = []
+        for symbol, (address, kind, line) in symbol_table.symbols.items():
+            if symbol in removed_labels:
+                continue
+            if line > old_end:
+                if kind == "ROM" and rom_delta:
+                    address += rom_delta
+                    moved_labels[symbol] = address
+                line += line_delta
+            if kind != "RAM":
+                first_pass_symbols.append((symbol, (address, kind, line)))
+            elif line == 0:
+                predefined_symbols.append((symbol, (address, kind, line)))
+            else:
+                variables.append((symbol, (address, kind, line)))
+        # Keep the entries in the order the passes add them: the predefined symbols, then the labels and EQU symbols in
+        # line order, then the RAM variables.
+        first_pass_symbols.sort(key=lambda item: item[1][2])
+        symbol_table.symbols = dict(predefined_symbols + first_pass_symbols + variables)
+
+        # Splice the new words in, then encode again only the words that refer to labels that moved.
+        self.words[rom_start:rom_start + old_count] = new_words
+        self.word_symbols[rom_start:rom_start + old_count] = new_word_symbols
+        if moved_labels:
+            for word_idx, symbol in enumerate(self.word_symbols):
+                if symbol in moved_labels:
+                    self.words[word_idx] = moved_labels[symbol]
+        self.reference_counts = +reference_counts
+        return True
+
+
+def watch(input_file, output_name, interval=None, output_format=None, byte_order=None, level=None):
+    """Assemble input_file into binary_output/<output_name>, then poll its modification time and rebuild it every time
+    it changes, until interrupted. Diagnostics are reported after every build, and appended to one error log for the
+    whole session if logs are turned on.
+
+    Arguments:
+    input_file: The XHAL .asm file to watch.
+    output_name: The name of the output files, minus their extensions.
+    interval: The number of seconds between checks of the file. Defaults to config.WATCH_POLL_INTERVAL.
+    output_format: "hack", "rom", or "both". Defaults to config.OUTPUT_FORMAT.
+    byte_order: "little" or "big", the byte order of a ROM image. Defaults to config.ROM_BYTE_ORDER.
+    level: The console diagnostic level. Defaults to the config setting.
+    """
+    if interval is None:
+        interval = config.WATCH_POLL_INTERVAL
+    if output_format is None:
+        output_format = config.OUTPUT_FORMAT
+    if byte_order is None:
+        byte_order = config.ROM_BYTE_ORDER
+    file_dir = assembler_dir()
+    output_file_path = os.path.join(file_dir, "binary_output", output_name)
+    log_filename = None
+    if config.WRITE_ERRORS_TO_LOG:
+        log_filename = create_error_file(output_name)
+        open(log_filename, "w").close()
+
+    assembler = None
+    last_mtime = None
+    while True:
+        try:
+            mtime = os.stat(input_file).st_mtime_ns
+        except OSError:
+            # The file may be missing for a moment while an editor saves it.
+            mtime = None
+        # An edit to an included file rebuilds the program too.
+        if mtime is not None and (mtime != last_mtime or assembler is not None and assembler.dependencies_changed()):
+            last_mtime = mtime
+            start_time = time.perf_counter()
+            with open(input_file, "r") as source_file:
+                lines = source_file.read().splitlines()
+            if assembler is None:
+                assembler = IncrementalAssembler(lines, input_file)
+                build = "full"
+            else:
+                build = assembler.update(lines)
+
+            if build != "unchanged":
+                if output_format in ("hack", "both"):
+                    write_hack_text(assembler.words, output_file_path + ".hack")
+                if output_format in ("rom", "both"):
+                    write_rom_image(assembler.words, output_file_path + ".rom", byte_order)
+                if config.EXPORT_SYMBOL_TABLES:
+                    assembler.symbol_table.export_symbol_tables(output_name)
+                elapsed = time.perf_counter() - start_time
+
+                error_checker = ErrorChecker(log_filename, level)
+                error_checker.diagnostics = assembler.diagnostics()
+                error_checker.flush()
+                print(f"{time.strftime('%H:%M:%S')} {build} build of {input_file}: {len(assembler.words)} words, "
+                      f"{error_checker.error_count()} error(s) in {elapsed * 1000:.1f} ms")
+        time.sleep(interval)
+
+
+def main(args=None):
+    """Parse the command-line arguments and watch the input file until interrupted with Ctrl+C."""
+    arg_parser = argparse.ArgumentParser(description="Re-assemble an XHAL file every time it changes.")
+    arg_parser.add_argument("input_file", help="the .asm file to watch")
+    arg_parser.add_argument("output_name", help="the name of the output files, minus their extensions")
+    arg_parser.add_argument("--interval", type=float, default=config.WATCH_POLL_INTERVAL,
+                            help="seconds between checks of the file's modification time")
+    arg_parser.add_argument("--format", choices=("hack", "rom", "both"), default=config.OUTPUT_FORMAT,
+                            help="write .hack text, a raw .rom image, or both")
+    arg_parser.add_argument("--byte-order", choices=("little", "big"), default=config.ROM_BYTE_ORDER,
+                            help="byte order of the words in a .rom image")
+    arg_parser.add_argument("--level", choices=tuple(DIAGNOSTIC_LEVELS), default=None,
+                            help="how much to print to the console (default: config.DIAGNOSTIC_LEVEL)")
+    options = arg_parser.parse_args(args)
+    try:
+        watch(options.input_file, options.output_name, options.interval, options.format, options.byte_order,
+              options.level)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())